@@ -1,3 +1,8 @@
 from django.contrib import admin
 
+from .models import MeshJob, Scan, ScanArtifact
+
 # Register your models here.
+admin.site.register(MeshJob)
+admin.site.register(Scan)
+admin.site.register(ScanArtifact)
@@ -0,0 +1,280 @@
+import json
+import os
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_http_methods
+from rest_framework import status
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import Scan
+from .renderers import PointCloudBinaryRenderer, PointCloudQuantizedRenderer
+from .utils.lod import load_lod_hierarchy, load_lod_node
+from .utils.mesh_3d import MESH_CONTENT_TYPES, is_3d_mesh, load_3d_mesh, mesh_3d_info, mesh_format
+from .utils.mesh_lod import load_mesh_lod, mesh_lod_path
+from .utils.metrics import record_cache
+from .utils.offload import OffloadBusyError, heavy_work, iter_file, iter_sync
+from .utils.plan_view import load_plan_view, plan_raster_path, plan_tile_path, PlanViewError
+from .utils.point_cloud import is_point_cloud, load_point_cloud, point_cloud_info
+from .utils.reconstruction import MESH_ALGORITHMS, mesh_result
+from .utils.spatial import load_spatial_index, query_points, SpatialQueryError
+from .utils.thumbnail import THUMBNAIL_MAX_SIZE, THUMBNAIL_SIZE, render_thumbnail, thumbnail_path
+from .utils.transport import encode_points_binary, binary_points_size, encode_points_quantized, QUANTIZATION_PRECISION
+from .views import catalog_page, quantization_bbox, spatial_query
+
+# Versiones asíncronas (ASGI) de los endpoints de nubes de puntos y mallas, bajo /api/async/.
+#
+# Responden lo mismo que las vistas de api/views.py, pero no bloquean el bucle de eventos:
+# - la lectura y el procesamiento de archivos (y la generación de mallas) corren en el pool
+#   acotado de api/utils/offload.py; si el proceso ya tiene su máximo de trabajos pesados, la
+#   petición se rechaza con 503 y Retry-After;
+# - la codificación de los puntos (JSON y qbin) también corre en ese pool, y el formato bin se
+#   codifica por fragmentos fuera del bucle (ver iter_sync);
+# - los artefactos ya cacheados (vistas previas, teselas, niveles LOD) se leen sin pasar por
+#   ese pool y se envían por fragmentos leídos de forma asíncrona;
+# - los listados consultan el catálogo con sync_to_async, en el hilo de la base de datos: son
+#   solo lecturas paginadas, ya que los archivos FARO* se registran en un hilo de fondo (ver
+#   api/catalog.py).
+# Con `uvicorn django_backend.asgi:application` un solo proceso atiende muchas peticiones
+# livianas mientras las pesadas esperan su hilo. El formato binario se elige con `?format=`.
+
+RETRY_AFTER_SECONDS = 5
+
+
+def json_response(data, status=status.HTTP_200_OK):
+	"""JSON response encoded like the REST framework ones (numpy arrays included)."""
+	return JsonResponse(data, encoder=JSONEncoder, safe=False, status=status)
+
+
+async def points_json_response(data):
+	"""JSON response with point data, encoded in the heavy pool (a full cloud takes seconds)."""
+	body = await heavy_work.run(json.dumps, data, cls=JSONEncoder)
+	return HttpResponse(body, content_type="application/json", status=status.HTTP_200_OK)
+
+
+def file_response(path, content_type):
+	"""Streams a file in chunks read without blocking the event loop."""
+	response = StreamingHttpResponse(iter_file(path), content_type=content_type, status=status.HTTP_200_OK)
+	response["Content-Length"] = os.path.getsize(path)
+	return response
+
+
+def async_endpoint(view):
+	"""Maps the offload and generic errors of an async view to HTTP responses."""
+	@wraps(view)
+	async def wrapper(request, *args, **kwargs):
+		try:
+			return await view(request, *args, **kwargs)
+		except OffloadBusyError:
+			response = json_response("Servidor ocupado, intente nuevamente", status=status.HTTP_503_SERVICE_UNAVAILABLE)
+			response["Retry-After"] = RETRY_AFTER_SECONDS
+			return response
+		except Exception as e: # Excepción en caso de error
+			return json_response("Exception: " + str(e), status=status.HTTP_400_BAD_REQUEST)
+	return wrapper
+
+
+async def cached_or_built(load, *args):
+	"""Reads a cached artifact outside the heavy pool, building it there only when it is missing."""
+	result = await sync_to_async(load, thread_sensitive=False)(*args, build=False)
+	if result is None:
+		result = await heavy_work.run(load, *args)
+	return result
+
+
+def _read_points(file_path, query):
+	if query is not None:
+		data, matches = query_points(file_path, **query)
+		return data, matches, load_spatial_index(file_path)["intensity_range"]
+	data = load_point_cloud(file_path)
+	return data, len(data), None
+
+
+async def points_response(request, data, intensity_range, bbox):
+	"""Points in the format of `?format=` (bin or qbin), encoded off the event loop, or None for JSON."""
+	response_format = request.GET.get("format")
+	if response_format == PointCloudBinaryRenderer.format:
+		response = StreamingHttpResponse(
+			iter_sync(encode_points_binary(data, intensity_range)),
+			content_type=PointCloudBinaryRenderer.media_type,
+			status=status.HTTP_200_OK,
+		)
+		response["Content-Length"] = binary_points_size(len(data))
+		return response
+	if response_format == PointCloudQuantizedRenderer.format:
+		precision = float(request.GET.get("precision") or QUANTIZATION_PRECISION)
+		return HttpResponse(
+			await heavy_work.run(encode_points_quantized, data, bbox[0], bbox[1], precision),
+			content_type=PointCloudQuantizedRenderer.media_type,
+			status=status.HTTP_200_OK,
+		)
+	return None
+
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+@async_endpoint
+async def point_cloud_view(request):
+	"""Versión asíncrona de PointCloudView: listado, puntos de un archivo y generación de mallas (POST)."""
+	if request.method == "POST":
+		data = json.loads(request.body or b"{}")
+		file_path, algorithm = data["filepath"], data["algorithm"]
+		if algorithm not in MESH_ALGORITHMS:
+			return json_response("Algoritmo no reconocido", status=status.HTTP_400_BAD_REQUEST)
+		print(f"Generando malla {algorithm} de {file_path}")
+		result = await heavy_work.run(
+			mesh_result, file_path, algorithm, data.get("params"), data.get("preprocessing"),
+			output_format=data.get("output_format"),
+		)
+		return json_response(
+			{"message": "Nube de puntos procesada y malla generada.", **result},
+			status=status.HTTP_201_CREATED,
+		)
+
+	file_path = request.GET.get("filepath") or None
+	if not file_path:
+		page = await sync_to_async(catalog_page)(request, Scan.POINT_CLOUD)
+		return json_response({
+			"message": "Nubes de puntos leídos correctamente",
+			"point_clouds": page.pop("results"),
+			**page,
+		})
+
+	try:
+		query = spatial_query(request)
+	except SpatialQueryError as e:
+		return json_response("Consulta espacial inválida: " + str(e), status=status.HTTP_400_BAD_REQUEST)
+	data, matches, intensity_range = await heavy_work.run(_read_points, file_path, query)
+	if intensity_range is None and request.GET.get("format") == PointCloudBinaryRenderer.format:
+		intensity_range = (await heavy_work.run(point_cloud_info, data))["rango_intensidad"]
+	bbox = None
+	if request.GET.get("format") == PointCloudQuantizedRenderer.format:
+		bbox = await heavy_work.run(quantization_bbox, file_path, data, query)
+	response = await points_response(request, data, intensity_range, bbox)
+	if response is not None:
+		if matches is not None:
+			response["X-Matching-Points"] = matches
+		return response
+	return await points_json_response({
+		"message": "Nube de puntos leída correctamente",
+		"point_clouds": [{"name": file_path, "point_cloud": data}],
+		"matches": matches,
+	})
+
+
+def _mesh_summary(file_path):
+	# La lectura no construye la pirámide: "lod" es None si aún no existe
+	return {
+		"name": file_path,
+		"mesh_info": mesh_3d_info(load_3d_mesh(file_path)),
+		"lod": load_mesh_lod(file_path, build=False),
+	}
+
+
+@require_GET
+@async_endpoint
+async def mesh_3d_view(request):
+	"""Versión asíncrona de Mesh3DView: listado del catálogo o información y niveles LOD de una malla."""
+	file_path = request.GET.get("filepath") or None
+	if not file_path:
+		page = await sync_to_async(catalog_page)(request, Scan.MESH)
+		return json_response({
+			"message": "Archivos de malla 3D leídos correctamente",
+			"meshs": page.pop("results"),
+			**page,
+		})
+	return json_response({
+		"message": "Malla 3D leída correctamente",
+		"meshs": [await heavy_work.run(_mesh_summary, file_path)],
+	})
+
+
+@require_GET
+@async_endpoint
+async def point_cloud_lod_view(request):
+	"""Versión asíncrona de PointCloudLODView: jerarquía LOD o puntos de un nodo (`?node=`)."""
+	file_path = request.GET.get("filepath") or None
+	node_id = request.GET.get("node") or None
+	if not file_path:
+		return json_response("Se requiere filepath", status=status.HTTP_400_BAD_REQUEST)
+
+	hierarchy = await cached_or_built(load_lod_hierarchy, file_path)
+	if not node_id:
+		return json_response({"message": "Jerarquía LOD leída correctamente", "hierarchy": hierarchy})
+	if node_id not in hierarchy["nodes"]:
+		return json_response("Nodo LOD no encontrado", status=status.HTTP_404_NOT_FOUND)
+	# Los nodos ya están en la caché: se leen fuera del pool de trabajo pesado
+	points = await sync_to_async(load_lod_node, thread_sensitive=False)(file_path, node_id, hierarchy)
+	response = await points_response(request, points, hierarchy["intensity_range"], hierarchy["nodes"][node_id]["bbox"])
+	if response is not None:
+		return response
+	return await points_json_response({"message": "Nodo LOD leído correctamente", "node": node_id, "points": points})
+
+
+@require_GET
+@async_endpoint
+async def point_cloud_plan_view(request):
+	"""Versión asíncrona de PointCloudPlanView: descripción, teselas PNG y rásters de la vista en planta."""
+	file_path = request.GET.get("filepath") or None
+	if not file_path:
+		return json_response("Se requiere filepath", status=status.HTTP_400_BAD_REQUEST)
+	if not is_point_cloud(file_path) or not os.path.exists(file_path):
+		return json_response("Archivo de nube de puntos no encontrado", status=status.HTTP_404_NOT_FOUND)
+
+	try:
+		cell_size = float(request.GET["cell_size"]) if request.GET.get("cell_size") else None
+		plan = await cached_or_built(load_plan_view, file_path, cell_size)
+		if request.GET.get("layer"):
+			path = plan_tile_path(
+				file_path, request.GET["layer"],
+				request.GET.get("level", ""), request.GET.get("x", ""), request.GET.get("y", ""),
+			)
+			return file_response(path, "image/png")
+		if request.GET.get("raster"):
+			return file_response(plan_raster_path(file_path, request.GET["raster"]), "application/octet-stream")
+	except KeyError:
+		return json_response("Tesela no encontrada", status=status.HTTP_404_NOT_FOUND)
+	except (PlanViewError, ValueError) as e:
+		return json_response("Vista en planta inválida: " + str(e), status=status.HTTP_400_BAD_REQUEST)
+	return json_response({"message": "Vista en planta leída correctamente", "plan": plan})
+
+
+@require_GET
+@async_endpoint
+async def mesh_3d_lod_view(request):
+	"""Versión asíncrona de Mesh3DLODView: pirámide LOD de una malla o el archivo de un nivel (`?level=`)."""
+	file_path = request.GET.get("filepath") or None
+	level = request.GET.get("level") or None
+	if not file_path:
+		return json_response("Se requiere filepath", status=status.HTTP_400_BAD_REQUEST)
+	if not is_3d_mesh(file_path) or not os.path.exists(file_path):
+		return json_response("Archivo de malla 3D no encontrado", status=status.HTTP_404_NOT_FOUND)
+
+	pyramid = await cached_or_built(load_mesh_lod, file_path)
+	if level is None:
+		return json_response({"message": "Pirámide LOD leída correctamente", "lod": pyramid})
+	try:
+		path = mesh_lod_path(file_path, level)
+	except KeyError:
+		return json_response("Nivel LOD no encontrado", status=status.HTTP_404_NOT_FOUND)
+	return file_response(path, MESH_CONTENT_TYPES[mesh_format(path)])
+
+
+@require_GET
+@async_endpoint
+async def thumbnail_view(request):
+	"""Versión asíncrona de ThumbnailView: vista previa PNG, renderizada en el pool solo si no está en la caché."""
+	file_path = request.GET.get("filepath") or None
+	if not file_path:
+		return json_response("Se requiere filepath", status=status.HTTP_400_BAD_REQUEST)
+	if not (is_point_cloud(file_path) or is_3d_mesh(file_path)) or not os.path.exists(file_path):
+		return json_response("Archivo no encontrado", status=status.HTTP_404_NOT_FOUND)
+	size = int(request.GET.get("size") or THUMBNAIL_SIZE)
+	path = thumbnail_path(file_path, size)
+	if 16 <= size <= THUMBNAIL_MAX_SIZE and os.path.exists(path):
+		record_cache("thumbnail", True)
+	else:
+		path = await heavy_work.run(render_thumbnail, file_path, size)
+	return file_response(path, "image/png")
@@ -0,0 +1,315 @@
+import json
+import os
+import threading
+
+from django.core.paginator import Paginator
+from django.db import DatabaseError, close_old_connections, transaction
+
+from .models import Scan, ScanArtifact
+from .utils.cache import CACHE_DIR_NAME, cache_dir, file_signature
+from .utils.mesh_3d import is_3d_mesh
+from .utils.mesh_cache import ENTRY_FILE, mesh_cache_root
+from .utils.metadata import batch_metadata, scan_routes
+from .utils.point_cloud import is_point_cloud
+
+# Catálogo de escaneos.
+#
+# Los archivos de nubes de puntos y mallas se registran en la base de datos (Scan) con su
+# tamaño, fecha de modificación y metadatos (puntos, bounding box, intensidad), junto con sus
+# archivos derivados (ScanArtifact): cachés binarias, normales, jerarquías LOD y mallas
+# generadas. Los listados consultan el catálogo por páginas, sin abrir los archivos.
+#
+# El catálogo se llena con `python manage.py index_scans <directorio>`. La indexación es
+# incremental: un archivo cuyo tamaño y fecha no cambiaron no se vuelve a leer, y los
+# metadatos de los archivos nuevos o modificados se calculan en paralelo (ver
+# api/utils/metadata.py). Los archivos de las variables de entorno FARO* se registran con
+# `index_scans` sin argumentos y, en el servidor, en un hilo de fondo cada
+# CATALOG_REFRESH_SECONDS (ver start_environment_refresh); los listados solo leen el catálogo.
+
+SCAN_PAGE_SIZE = 50
+SCAN_MAX_PAGE_SIZE = 500
+# Intervalo del registro en segundo plano de los archivos FARO* (0: solo al iniciar el servidor)
+CATALOG_REFRESH_SECONDS = float(os.environ.get("CATALOG_REFRESH_SECONDS") or 300)
+
+# Tamaño de los lotes de consultas path__in (bajo el límite de variables de SQLite)
+_QUERY_BATCH = 500
+
+
+def scan_format(file_path):
+	"""Returns the catalog format of a file ("pts" or "obj"), or None if it is not a scan."""
+	if is_point_cloud(file_path):
+		return Scan.POINT_CLOUD
+	if is_3d_mesh(file_path):
+		return Scan.MESH
+	return None
+
+
+def discover_files(roots):
+	"""Yields the absolute paths of the scan files under roots, skipping cache and hidden directories."""
+	for root in roots:
+		if os.path.isfile(root):
+			if scan_format(root):
+				yield os.path.abspath(root)
+			continue
+		for directory, subdirectories, files in os.walk(root):
+			subdirectories[:] = sorted(
+				name for name in subdirectories if name != CACHE_DIR_NAME and not name.startswith(".")
+			)
+			for name in sorted(files):
+				if scan_format(name):
+					yield os.path.abspath(os.path.join(directory, name))
+
+
+def _path_size(path):
+	if os.path.isdir(path):
+		return sum(
+			os.path.getsize(os.path.join(directory, name))
+			for directory, _, files in os.walk(path) for name in files
+		)
+	return os.path.getsize(path)
+
+
+class _ArtifactFinder:
+	"""Finds the derived files of scans, listing each cache directory only once per indexing run."""
+
+	def __init__(self):
+		self._listings = {}
+		self._meshes = {}
+
+	def _listing(self, directory):
+		if directory not in self._listings:
+			try:
+				self._listings[directory] = os.listdir(directory)
+			except OSError:
+				self._listings[directory] = []
+		return self._listings[directory]
+
+	def _mesh_entries(self, root):
+		if root not in self._meshes:
+			entries = {}
+			for name in self._listing(root):
+				try:
+					with open(os.path.join(root, name, ENTRY_FILE)) as f:
+						entry = json.load(f)
+				except (OSError, ValueError):
+					continue
+				entries.setdefault(os.path.abspath(entry["input"]), []).append(entry)
+			self._meshes[root] = entries
+		return self._meshes[root]
+
+	def find(self, file_path):
+		"""Returns [(kind, path, size)] of the artifacts of the current version of file_path."""
+		try:
+			size, mtime_ns = file_signature(file_path)
+		except OSError:
+			return []
+
+		artifacts = []
+		# Artefactos de la caché del archivo: "<nombre>.<tamaño>-<mtime>.<tipo><extensión>"
+		directory = cache_dir(file_path)
+		prefix = f"{os.path.basename(file_path)}.{size}-{mtime_ns}."
+		for name in self._listing(directory):
+			if not name.startswith(prefix) or ".tmp-" in name:
+				continue
+			path = os.path.join(directory, name)
+			kind = name[len(prefix):]
+			if not os.path.isdir(path):
+				kind = os.path.splitext(kind)[0]
+			try:
+				artifacts.append((kind, path, _path_size(path)))
+			except OSError:
+				pass
+
+		# Mallas generadas a partir del archivo (ver api/utils/mesh_cache.py)
+		root = mesh_cache_root()
+		for entry in self._mesh_entries(root).get(file_path, []):
+			try:
+				artifacts.append((
+					f"mesh-{entry.get('algorithm', 'unknown')}",
+					entry["output"],
+					_path_size(os.path.dirname(entry["output"])),
+				))
+			except OSError:
+				pass
+		return artifacts
+
+
+def _scan_fields(file_path, metadata):
+	"""Model fields of a scan from its listing metadata (see api/utils/metadata.py)."""
+	# Los campos propios de cada formato (intensidad, triángulos) quedan en metadata
+	extra = {
+		name: value for name, value in metadata.items()
+		if name not in ("key", "path", "size", "modified", "points", "vertices", "bbox", "error")
+	}
+	try:
+		size, mtime_ns = file_signature(file_path)
+	except OSError:
+		size, mtime_ns = 0, 0
+	return {
+		"format": scan_format(file_path),
+		"extension": file_path.split(".")[-1],
+		"size": size,
+		"mtime_ns": mtime_ns,
+		"points": metadata.get("points", metadata.get("vertices")),
+		"bbox": metadata.get("bbox"),
+		"metadata": extra,
+		"error": metadata.get("error", ""),
+	}
+
+
+def index_paths(paths, keys=None, force=False):
+	"""
+	Registers or refreshes scan files in the catalog.
+
+	Files whose size and modification time match their catalog entry are not read again,
+	unless force is set; the metadata of the others is computed in parallel. The artifacts
+	of every given file are refreshed, since meshes and caches appear independently of the
+	file itself.
+
+	Args:
+		paths (list): Scan file paths.
+		keys (dict, optional): {path: key} labels of the scans, e.g. environment variable names.
+		force (bool): Whether to recompute the metadata of unchanged files.
+
+	Returns:
+		dict: Number of "added", "updated" and "unchanged" scans.
+	"""
+	paths = list(dict.fromkeys(os.path.abspath(path) for path in paths))
+	keys = {os.path.abspath(path): key for path, key in (keys or {}).items()}
+	existing = {}
+	for start in range(0, len(paths), _QUERY_BATCH):
+		for scan in Scan.objects.filter(path__in=paths[start:start + _QUERY_BATCH]).prefetch_related("artifacts"):
+			existing[scan.path] = scan
+
+	changed = []
+	for path in paths:
+		scan = existing.get(path)
+		try:
+			signature = file_signature(path)
+		except OSError:
+			signature = None
+		if force or scan is None or scan.error or signature != (scan.size, scan.mtime_ns):
+			changed.append(path)
+
+	metadata = {item["key"]: item for item in batch_metadata({path: path for path in changed})}
+	summary = {"added": 0, "updated": 0, "unchanged": len(paths) - len(changed)}
+	finder = _ArtifactFinder()
+	with transaction.atomic():
+		for path in paths:
+			scan = existing.get(path)
+			if scan is None:
+				scan = Scan(path=path)
+				summary["added"] += 1
+			elif path in metadata:
+				summary["updated"] += 1
+			dirty = scan.pk is None or path in metadata
+			if path in metadata:
+				for name, value in _scan_fields(path, metadata[path]).items():
+					setattr(scan, name, value)
+			if path in keys and scan.key != keys[path]:
+				scan.key = keys[path]
+				dirty = True
+			if dirty:
+				scan.save()
+
+			# Solo se escriben los artefactos que cambiaron
+			found = {artifact_path: (kind, size) for kind, artifact_path, size in finder.find(path)}
+			known = {artifact.path: artifact for artifact in scan.artifacts.all()} if path in existing else {}
+			stale = [artifact.pk for artifact_path, artifact in known.items() if artifact_path not in found]
+			if stale:
+				ScanArtifact.objects.filter(pk__in=stale).delete()
+			for artifact_path, (kind, size) in found.items():
+				artifact = known.get(artifact_path)
+				if artifact is None:
+					ScanArtifact.objects.create(scan=scan, path=artifact_path, kind=kind, size=size)
+				elif (artifact.kind, artifact.size) != (kind, size):
+					artifact.kind, artifact.size = kind, size
+					artifact.save()
+	return summary
+
+
+def index_scans(roots, prune=True, force=False):
+	"""
+	Indexes the scan files found under one or more directories.
+
+	Args:
+		roots (list): Directories (or single files) to walk.
+		prune (bool): Whether to remove catalog entries under roots whose file no longer exists.
+		force (bool): Whether to recompute the metadata of unchanged files.
+
+	Returns:
+		dict: Number of "added", "updated", "unchanged" and "removed" scans.
+	"""
+	found = list(discover_files(roots))
+	summary = {**index_paths(found, force=force), "removed": 0}
+	if prune:
+		found = set(found)
+		for root in roots:
+			root = os.path.abspath(root)
+			prefix = root if os.path.isfile(root) else os.path.join(root, "")
+			stale = Scan.objects.filter(path__startswith=prefix).exclude(key__gt="").values_list("path", flat=True)
+			removed = [path for path in stale if path not in found]
+			for start in range(0, len(removed), _QUERY_BATCH):
+				Scan.objects.filter(path__in=removed[start:start + _QUERY_BATCH]).delete()
+			summary["removed"] += len(removed)
+	return summary
+
+
+def sync_environment(force=False):
+	"""Registers the scan files of the FARO* environment variables, labeled with the variable name."""
+	routes = scan_routes(scan_format)
+	return index_paths(list(routes.values()), keys={path: key for key, path in routes.items()}, force=force)
+
+
+def _refresh_environment(interval, stop):
+	while True:
+		try:
+			sync_environment()
+		except (DatabaseError, OSError) as e:
+			print(f"No se pudo actualizar el catálogo: {e}")
+		finally:
+			close_old_connections()
+		if interval <= 0 or stop.wait(interval):
+			return
+
+
+def start_environment_refresh(interval=CATALOG_REFRESH_SECONDS):
+	"""
+	Registers the FARO* scan files in a background thread, now and every interval seconds.
+
+	Returns:
+		threading.Event: Set it to stop the refresh.
+	"""
+	stop = threading.Event()
+	threading.Thread(
+		target=_refresh_environment, args=(interval, stop), name="catalog-refresh", daemon=True
+	).start()
+	return stop
+
+
+def list_scans(file_format=None, page=1, page_size=SCAN_PAGE_SIZE, search=None):
+	"""
+	Returns one page of the catalog.
+
+	Args:
+		file_format (str, optional): Only scans of this format ("pts" or "obj").
+		page (int): Page number, starting at 1.
+		page_size (int): Scans per page, at most SCAN_MAX_PAGE_SIZE.
+		search (str, optional): Only scans whose path contains this text.
+
+	Returns:
+		dict: {"count", "page", "pages", "results"} with the scans as dicts.
+	"""
+	scans = Scan.objects.prefetch_related("artifacts")
+	if file_format:
+		scans = scans.filter(format=file_format)
+	if search:
+		scans = scans.filter(path__icontains=search)
+	paginator = Paginator(scans, max(1, min(int(page_size), SCAN_MAX_PAGE_SIZE)))
+	current = paginator.get_page(page)
+	return {
+		"count": paginator.count,
+		"page": current.number,
+		"pages": paginator.num_pages,
+		"results": [scan.as_dict() for scan in current],
+	}
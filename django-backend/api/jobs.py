@@ -0,0 +1,218 @@
+import os
+import queue
+import socket
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from django.db import DatabaseError, close_old_connections
+from django.utils import timezone
+
+from .models import MeshJob
+from .utils.applications import preprocessing_stages
+from .utils.reconstruction import mesh_output_format, mesh_parameters, run_mesh_job
+from .utils.workers import default_workers, process_pool
+
+# Cola de generación de mallas en segundo plano.
+#
+# Los trabajos se guardan en la base de datos (MeshJob) y se ejecutan en un pool de procesos
+# de MESH_JOB_WORKERS procesos. Un hilo despachador entrega un trabajo al pool solo cuando hay
+# un proceso libre, de modo que el estado "running" es exacto y los trabajos pendientes se
+# pueden cancelar sin haber comenzado. Un trabajo en ejecución no se puede interrumpir: al
+# cancelarlo se marca como cancelado y su resultado se descarta al terminar.
+#
+# El límite de MESH_JOB_WORKERS es por proceso del servidor: con N procesos (p. ej. N workers
+# de gunicorn o uvicorn) pueden ejecutarse hasta N * MESH_JOB_WORKERS trabajos a la vez, y
+# MESH_JOB_WORKERS debe elegirse en consecuencia. Cada trabajo lo inicia un solo proceso: el
+# paso de "pending" a "running" es una actualización condicional en la base de datos.
+#
+# Al iniciar el servidor (ver django_backend/wsgi.py y asgi.py) la cola se recupera: los
+# trabajos pendientes de la base de datos se vuelven a encolar, y los que figuran en ejecución
+# en un proceso de este mismo equipo que ya no existe (el servidor se detuvo o el proceso
+# murió) se marcan como fallidos.
+
+MESH_JOB_WORKERS = int(os.environ.get("MESH_JOB_WORKERS") or default_workers(limit=2))
+
+
+def worker_id():
+	"""Identifies the current server process as "<host>:<pid>"."""
+	return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _process_alive(pid):
+	try:
+		os.kill(pid, 0)
+	except ProcessLookupError:
+		return False
+	except PermissionError:
+		# Existe, pero pertenece a otro usuario
+		return True
+	return True
+
+
+def _stale_worker(worker):
+	"""Whether worker ("<host>:<pid>") is a process of this host that no longer runs jobs."""
+	host, _, pid = worker.rpartition(":")
+	if not worker or host != socket.gethostname():
+		# Sin dueño registrado se considera huérfano; los de otros equipos no se pueden comprobar
+		return not worker
+	return not pid.isdigit() or int(pid) == os.getpid() or not _process_alive(int(pid))
+
+
+class MeshJobQueue:
+	"""
+	Background mesh job queue of one server process.
+
+	At most max_workers jobs run at a time in this process; the bound is not shared
+	between processes (see the module comment).
+	"""
+
+	def __init__(self, max_workers=MESH_JOB_WORKERS):
+		self.max_workers = max_workers
+		self._slots = threading.BoundedSemaphore(max_workers)
+		self._pending = queue.Queue()
+		self._lock = threading.Lock()
+		self._pool = None
+		self._dispatcher = None
+
+	def submit(self, file_path, algorithm, params=None, preprocessing=None, output_format=None):
+		"""
+		Registers a mesh job and queues it for execution.
+
+		Raises:
+			UnknownAlgorithmError: If the algorithm, a parameter or the output format is not recognized.
+			UnknownStageError: If a preprocessing stage or parameter is not recognized.
+
+		Returns:
+			MeshJob: The pending job.
+		"""
+		job = MeshJob.objects.create(
+			filepath=file_path,
+			algorithm=algorithm,
+			params=mesh_parameters(algorithm, params),
+			preprocessing=preprocessing_stages(preprocessing),
+			output_format=mesh_output_format(output_format),
+		)
+		self.start()
+		self._pending.put(job.id)
+		return job
+
+	def cancel(self, job_id):
+		"""Cancels a pending or running job. Returns False if it had already finished."""
+		return MeshJob.objects.filter(id=job_id, status__in=[MeshJob.PENDING, MeshJob.RUNNING]).update(
+			status=MeshJob.CANCELLED, finished_at=timezone.now()
+		) > 0
+
+	def start(self):
+		"""Starts the dispatcher of this process, recovering the jobs left by a previous run the first time."""
+		with self._lock:
+			if self._dispatcher is not None:
+				return
+			# Antes de despachar: ningún trabajo de este proceso figura aún en ejecución
+			try:
+				self.recover()
+			except DatabaseError as e:
+				print(f"No se pudieron recuperar los trabajos de malla: {e}")
+			self._pool = process_pool(self.max_workers)
+			self._dispatcher = threading.Thread(target=self._dispatch, name="mesh-jobs", daemon=True)
+			self._dispatcher.start()
+
+	def recover(self):
+		"""
+		Fails the running jobs of dead processes of this host and queues the pending jobs.
+
+		Returns:
+			tuple: (number of jobs marked as failed, number of jobs queued).
+		"""
+		stale = [
+			job_id for job_id, worker in MeshJob.objects.filter(status=MeshJob.RUNNING).values_list("id", "worker")
+			if _stale_worker(worker)
+		]
+		failed = MeshJob.objects.filter(id__in=stale, status=MeshJob.RUNNING).update(
+			status=MeshJob.FAILED, error="Interrupted: the server process running the job stopped.",
+			finished_at=timezone.now(),
+		)
+		# Los trabajos ya encolados en este proceso se omiten al despacharlos por segunda vez
+		pending = list(MeshJob.objects.filter(status=MeshJob.PENDING).order_by("created_at").values_list("id", flat=True))
+		for job_id in pending:
+			self._pending.put(job_id)
+		if failed or pending:
+			print(f"Trabajos de malla recuperados: {len(pending)} pendientes, {failed} interrumpidos")
+		return failed, len(pending)
+
+	def _submit(self, job):
+		"""Submits a job to the pool, rebuilding the pool once if a dead worker broke it."""
+		for attempt in range(2):
+			pool = self._pool
+			try:
+				future = pool.submit(
+					run_mesh_job, job.filepath, job.algorithm, job.params, job.preprocessing, job.output_format
+				)
+			except BrokenProcessPool:
+				if attempt:
+					raise
+				self._replace_pool(pool)
+				continue
+			future.add_done_callback(partial(self._finish, job.id, pool))
+			return
+
+	def _replace_pool(self, broken):
+		"""Replaces a broken pool (a worker process died, e.g. out of memory) by a new one."""
+		with self._lock:
+			if self._pool is broken:
+				broken.shutdown(wait=False, cancel_futures=True)
+				self._pool = process_pool(self.max_workers)
+				print("Pool de trabajos de malla recreado")
+
+	def _dispatch(self):
+		while True:
+			job_id = self._pending.get()
+			self._slots.acquire()
+			try:
+				# Solo se inicia si sigue pendiente (no fue cancelado mientras esperaba)
+				started = MeshJob.objects.filter(id=job_id, status=MeshJob.PENDING).update(
+					status=MeshJob.RUNNING, started_at=timezone.now(), worker=worker_id()
+				)
+				if not started:
+					self._slots.release()
+					continue
+				self._submit(MeshJob.objects.get(id=job_id))
+			except Exception as e:
+				self._slots.release()
+				self._fail(job_id, e)
+			finally:
+				close_old_connections()
+
+	def _fail(self, job_id, error):
+		"""Marks a job that could not be started as failed, without ever stopping the dispatcher."""
+		try:
+			MeshJob.objects.filter(id=job_id).update(
+				status=MeshJob.FAILED, error=str(error), finished_at=timezone.now()
+			)
+		except Exception as e:
+			# Base de datos bloqueada o sin conexión: el trabajo queda en "running" y se
+			# recupera como interrumpido al reiniciar (ver recover)
+			print(f"No se pudo marcar como fallido el trabajo de malla {job_id}: {e}")
+
+	def _finish(self, job_id, pool, future):
+		self._slots.release()
+		try:
+			try:
+				result = future.result()
+			except BrokenProcessPool as e:
+				# El proceso murió: el trabajo falla y los siguientes usan un pool nuevo
+				self._replace_pool(pool)
+				changes = {"status": MeshJob.FAILED, "error": f"{type(e).__name__}: {e}"}
+			except Exception as e:
+				changes = {"status": MeshJob.FAILED, "error": f"{type(e).__name__}: {e}"}
+			else:
+				changes = {"status": MeshJob.SUCCEEDED, "output": result["output"], "result": result}
+			# No se sobrescribe un trabajo cancelado durante la ejecución
+			MeshJob.objects.filter(id=job_id, status=MeshJob.RUNNING).update(
+				finished_at=timezone.now(), **changes
+			)
+		finally:
+			close_old_connections()
+
+
+mesh_jobs = MeshJobQueue()
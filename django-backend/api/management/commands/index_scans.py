@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from api.catalog import index_scans, sync_environment
+
+
+class Command(BaseCommand):
+	help = (
+		"Indexa en el catálogo los archivos de escaneo (.pts, .obj) de uno o más directorios, "
+		"o de las variables de entorno FARO* si no se indica ninguno."
+	)
+
+	def add_arguments(self, parser):
+		parser.add_argument("roots", nargs="*", help="Directorios o archivos a indexar.")
+		parser.add_argument(
+			"--no-prune", action="store_true",
+			help="No eliminar del catálogo los archivos que ya no existen en los directorios.",
+		)
+		parser.add_argument(
+			"--force", action="store_true",
+			help="Recalcular los metadatos de todos los archivos, aunque no hayan cambiado.",
+		)
+
+	def handle(self, *args, **options):
+		if options["roots"]:
+			summary = index_scans(options["roots"], prune=not options["no_prune"], force=options["force"])
+		else:
+			summary = sync_environment(force=options["force"])
+		self.stdout.write(self.style.SUCCESS(
+			", ".join(f"{name}: {count}" for name, count in summary.items())
+		))
@@ -0,0 +1,64 @@
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .utils import metrics
+
+# Una línea de log JSON por petición (logger "api.requests") con el método, la ruta, el
+# estado, la duración y las etapas y contadores registrados durante la petición (ver
+# api/utils/metrics.py), además de los contadores y la duración HTTP expuestos en /metrics.
+# La duración llega hasta que la vista retorna la respuesta: el envío de las respuestas por
+# fragmentos (StreamingHttpResponse) no se incluye. Funciona tanto en WSGI como en ASGI.
+
+logger = logging.getLogger("api.requests")
+
+
+class RequestMetricsMiddleware:
+	sync_capable = True
+	async_capable = True
+
+	def __init__(self, get_response):
+		self.get_response = get_response
+		self.is_async = iscoroutinefunction(get_response)
+		if self.is_async:
+			markcoroutinefunction(self)
+
+	def __call__(self, request):
+		if self.is_async:
+			return self._acall(request)
+		if not metrics.METRICS_ENABLED:
+			return self.get_response(request)
+		token, start = metrics.begin_request(), time.perf_counter()
+		response = None
+		try:
+			response = self.get_response(request)
+			return response
+		finally:
+			self._finish(request, response, metrics.end_request(token), start)
+
+	async def _acall(self, request):
+		if not metrics.METRICS_ENABLED:
+			return await self.get_response(request)
+		token, start = metrics.begin_request(), time.perf_counter()
+		response = None
+		try:
+			response = await self.get_response(request)
+			return response
+		finally:
+			self._finish(request, response, metrics.end_request(token), start)
+
+	def _finish(self, request, response, collected, start):
+		seconds = time.perf_counter() - start
+		status_code = response.status_code if response is not None else 500
+		metrics.registry.increment("http_requests_total", method=request.method, status=status_code)
+		metrics.registry.observe("http_request_seconds", seconds, method=request.method)
+		logger.info(json.dumps({
+			"method": request.method,
+			"path": request.path,
+			"status": status_code,
+			"seconds": round(seconds, 4),
+			"spans": {stage: round(value, 4) for stage, value in collected["spans"].items()},
+			"counters": collected["counters"],
+		}))
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_meshjob_preprocessing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Scan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=1024, unique=True)),
+                ('key', models.CharField(blank=True, max_length=255)),
+                ('format', models.CharField(choices=[('pts', 'Nube de puntos'), ('obj', 'Malla 3D')], db_index=True, max_length=8)),
+                ('size', models.BigIntegerField()),
+                ('mtime_ns', models.BigIntegerField()),
+                ('points', models.BigIntegerField(blank=True, null=True)),
+                ('bbox', models.JSONField(blank=True, null=True)),
+                ('metadata', models.JSONField(default=dict)),
+                ('error', models.TextField(blank=True)),
+                ('indexed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['path'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ScanArtifact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=64)),
+                ('path', models.CharField(max_length=1024)),
+                ('size', models.BigIntegerField()),
+                ('scan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='artifacts', to='api.scan')),
+            ],
+            options={
+                'ordering': ['kind', 'path'],
+                'constraints': [models.UniqueConstraint(fields=('scan', 'path'), name='unique_scan_artifact_path')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_scan_catalog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meshjob',
+            name='output_format',
+            field=models.CharField(default='obj', max_length=8),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:26
+
+from django.db import migrations, models
+
+
+def fill_extension(apps, schema_editor):
+    Scan = apps.get_model('api', 'Scan')
+    for scan in Scan.objects.only('id', 'path').iterator():
+        Scan.objects.filter(id=scan.id).update(extension=scan.path.split('.')[-1])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_meshjob_worker'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scan',
+            name='extension',
+            field=models.CharField(blank=True, max_length=8),
+        ),
+        migrations.RunPython(fill_extension, migrations.RunPython.noop),
+    ]
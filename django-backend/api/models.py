@@ -1,3 +1,126 @@
+import uuid
+
 from django.db import models
 
-# Create your models here.
+
+class MeshJob(models.Model):
+	"""Generación de malla 3D ejecutada en segundo plano (ver api/jobs.py)."""
+
+	PENDING = "pending"
+	RUNNING = "running"
+	SUCCEEDED = "succeeded"
+	FAILED = "failed"
+	CANCELLED = "cancelled"
+	STATUS_CHOICES = [
+		(PENDING, "Pendiente"),
+		(RUNNING, "En ejecución"),
+		(SUCCEEDED, "Completado"),
+		(FAILED, "Fallido"),
+		(CANCELLED, "Cancelado"),
+	]
+	FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+	id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+	filepath = models.CharField(max_length=1024)
+	algorithm = models.CharField(max_length=32)
+	params = models.JSONField(default=dict)
+	preprocessing = models.JSONField(default=list)
+	output_format = models.CharField(max_length=8, default="obj")
+	status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+	output = models.CharField(max_length=1024, blank=True)
+	result = models.JSONField(null=True, blank=True)
+	error = models.TextField(blank=True)
+	# Proceso que ejecuta el trabajo ("<host>:<pid>"), para recuperar los trabajos de un proceso caído
+	worker = models.CharField(max_length=128, blank=True)
+	created_at = models.DateTimeField(auto_now_add=True)
+	started_at = models.DateTimeField(null=True, blank=True)
+	finished_at = models.DateTimeField(null=True, blank=True)
+
+	class Meta:
+		ordering = ["-created_at"]
+
+	def __str__(self):
+		return f"{self.algorithm} {self.filepath} ({self.status})"
+
+	def as_dict(self):
+		return {
+			"id": str(self.id),
+			"filepath": self.filepath,
+			"algorithm": self.algorithm,
+			"params": self.params,
+			"preprocessing": self.preprocessing,
+			"output_format": self.output_format,
+			"status": self.status,
+			"output": self.output,
+			"error": self.error,
+			"created_at": self.created_at,
+			"started_at": self.started_at,
+			"finished_at": self.finished_at,
+		}
+
+
+class Scan(models.Model):
+	"""Archivo de escaneo (nube de puntos o malla) registrado en el catálogo (ver api/catalog.py)."""
+
+	# Tipo de escaneo, usado para filtrar los listados; la extensión real del archivo
+	# (p. ej. "obj" o "glb" en las mallas) se guarda en extension
+	POINT_CLOUD = "pts"
+	MESH = "obj"
+	FORMAT_CHOICES = [
+		(POINT_CLOUD, "Nube de puntos"),
+		(MESH, "Malla 3D"),
+	]
+
+	path = models.CharField(max_length=1024, unique=True)
+	key = models.CharField(max_length=255, blank=True)
+	format = models.CharField(max_length=8, choices=FORMAT_CHOICES, db_index=True)
+	extension = models.CharField(max_length=8, blank=True)
+	size = models.BigIntegerField()
+	mtime_ns = models.BigIntegerField()
+	points = models.BigIntegerField(null=True, blank=True)
+	bbox = models.JSONField(null=True, blank=True)
+	metadata = models.JSONField(default=dict)
+	error = models.TextField(blank=True)
+	indexed_at = models.DateTimeField(auto_now=True)
+
+	class Meta:
+		ordering = ["path"]
+
+	def __str__(self):
+		return self.path
+
+	def as_dict(self):
+		return {
+			"id": self.id,
+			"key": self.key,
+			"path": self.path,
+			"format": self.extension or self.format,
+			"size": self.size,
+			"modified": self.mtime_ns / 1e9,
+			"points": self.points,
+			"bbox": self.bbox,
+			**self.metadata,
+			"error": self.error,
+			"artifacts": [artifact.as_dict() for artifact in self.artifacts.all()],
+		}
+
+
+class ScanArtifact(models.Model):
+	"""Archivo derivado de un escaneo: caché binaria, normales, jerarquía LOD, malla generada, etc."""
+
+	scan = models.ForeignKey(Scan, on_delete=models.CASCADE, related_name="artifacts")
+	kind = models.CharField(max_length=64)
+	path = models.CharField(max_length=1024)
+	size = models.BigIntegerField()
+
+	class Meta:
+		ordering = ["kind", "path"]
+		constraints = [
+			models.UniqueConstraint(fields=["scan", "path"], name="unique_scan_artifact_path"),
+		]
+
+	def __str__(self):
+		return f"{self.kind} {self.path}"
+
+	def as_dict(self):
+		return {"kind": self.kind, "path": self.path, "size": self.size}
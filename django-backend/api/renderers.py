@@ -0,0 +1,32 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class PointCloudBinaryRenderer(BaseRenderer):
+	"""
+	Renderer del formato binario de nubes de puntos (ver api/utils/transport.py).
+
+	Se selecciona con `?format=bin` o con `Accept: application/octet-stream`. Las vistas
+	retornan el contenido binario directamente en una StreamingHttpResponse, por lo que
+	este renderer solo procesa respuestas de error.
+	"""
+	media_type = "application/octet-stream"
+	format = "bin"
+	charset = None
+	render_style = "binary"
+
+	def render(self, data, accepted_media_type=None, renderer_context=None):
+		if isinstance(data, bytes):
+			return data
+		return json.dumps(data).encode("utf-8")
+
+
+class PointCloudQuantizedRenderer(PointCloudBinaryRenderer):
+	"""
+	Renderer del formato cuantizado y comprimido de nubes de puntos (ver api/utils/transport.py).
+
+	Se selecciona con `?format=qbin` o con `Accept: application/x-point-cloud-quantized`.
+	"""
+	media_type = "application/x-point-cloud-quantized"
+	format = "qbin"
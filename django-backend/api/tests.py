@@ -1,9 +1,57 @@
-from django.test import TestCase
-from unittest.mock import patch, mock_open
+import asyncio
+import hashlib
+import json
+import socket
+import subprocess
+import threading
+import time
+import zlib
+from django.test import TestCase, TransactionTestCase
+import os
+import tempfile
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import MagicMock, patch, mock_open
 import numpy as np
+import open3d as o3d
+from django.db import DatabaseError
+
+from .utils.mesh_3d import is_3d_mesh, load_3d_mesh, save_mesh, simplify_poisson_mesh
+from .utils.gltf import decode_glb, encode_glb, InvalidGLBError
+from .models import MeshJob, Scan
+from .catalog import index_scans, list_scans, sync_environment
+from .jobs import MeshJobQueue, mesh_jobs
+from .utils.cache import cache_dir, cache_path, file_digest, publish_directory, temporary_path
+from .utils.colormap import apply_colormap, colormap_lut, normalize_values, UnknownColormapError
+from .utils.reconstruction import mesh_parameters, mesh_result, reconstruct_mesh, UnknownAlgorithmError
+from .utils.applications import is_deterministic, preprocess_cloud, preprocessing_stages, UnknownStageError
+from .utils.mesh_cache import evict_mesh_cache, mesh_cache_root
+from .utils.metadata import batch_metadata, cached_metadata, file_metadata
+from .utils.spatial import build_spatial_index, query_points
+from .utils.tiled_poisson import create_tiled_poisson_mesh, plan_tiles
+from .utils.workers import WORKER_CORES_VAR, worker_budget
+from .utils.lod import build_lod_octree, load_lod_hierarchy, load_lod_node
+from .utils import metrics
+from .utils.offload import OffloadBusyError, WorkOffloader, heavy_work
+from .utils.mesh_lod import build_mesh_lod, load_mesh_lod, mesh_lod_path
+from .utils.plan_view import build_plan_view, load_plan_raster, load_plan_view, plan_tile_path
+from .utils.thumbnail import encode_png, render_mesh, render_points, render_thumbnail, thumbnail_path
+from .utils.transport import decode_points_binary, binary_points_size, decode_points_quantized, encode_points_quantized
+from .utils.point_cloud import to_vector3d, generate_cloud, estimate_cloud_normals, load_point_cloud, read_pts, iter_point_cloud_chunks, point_cloud_info, streaming_point_cloud_info, PointCloudStats, CloudDescriptor, InvalidPointCloudError, UnsupportedFileFormatError
+
+_mesh_cache = None
+
+
+def setUpModule():
+	# La caché de mallas es global (ver api/utils/mesh_cache.py): las pruebas usan una temporal
+	global _mesh_cache
+	_mesh_cache = tempfile.TemporaryDirectory()
+	patch.dict(os.environ, {"MESH_CACHE_DIR": _mesh_cache.name}).start()
+
+
+def tearDownModule():
+	patch.stopall()
+	_mesh_cache.cleanup()
 
-from .utils.mesh_3d import is_3d_mesh
-from .utils.point_cloud import load_point_cloud, InvalidPointCloudError, UnsupportedFileFormatError
 
 class TestIs3DMesh(TestCase):
 	def test_is_3d_mesh_with_obj_file(self):
@@ -24,15 +72,22 @@ class TestIs3DMesh(TestCase):
 		result = is_3d_mesh(file_path)
 		self.assertFalse(result)
 
+def write_pts(directory, rows, header=True, name="cloud.pts"):
+	"""Writes rows to a .pts file inside directory and returns its path."""
+	file_path = os.path.join(directory, name)
+	with open(file_path, "w") as f:
+		if header:
+			f.write(f"{len(rows)}\n")
+		for row in rows:
+			f.write(" ".join(str(value) for value in row) + "\n")
+	return file_path
+
 class TestLoadPointCloud(TestCase):
-	@patch("api.utils.point_cloud.is_point_cloud", return_value=True)
-	@patch("numpy.loadtxt", return_value=np.array([[1, 2, 3, 0.5, 255, 255, 255]]))
-	def test_load_point_cloud_valid_file(self, mock_loadtxt, mock_is_point_cloud):
+	def test_load_point_cloud_valid_file(self):
 		"""Test loading a valid point cloud file."""
-		file_path = "valid_file.pts"
-		result = load_point_cloud(file_path)
-		# Verifica que se llamó a np.loadtxt con el archivo proporcionado
-		mock_loadtxt.assert_called_once_with(file_path, skiprows=1)
+		with tempfile.TemporaryDirectory() as directory:
+			file_path = write_pts(directory, [[1, 2, 3, 0.5, 255, 255, 255]])
+			result = load_point_cloud(file_path)
 		# Valida la salida
 		self.assertEqual(result.shape, (1, 7))  # Una fila, siete columnas
 		self.assertTrue((result == np.array([[1, 2, 3, 0.5, 255, 255, 255]])).all())
@@ -51,3 +106,1199 @@ class TestLoadPointCloud(TestCase):
 		file_path = "invalid_data.txt"
 		with self.assertRaises(InvalidPointCloudError):
 			load_point_cloud(file_path)
+
+
+class TestReadPts(TestCase):
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.rows = np.arange(70, dtype=np.float64).reshape(10, 7) / 4
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def test_read_pts_across_block_boundaries(self):
+		"""Test that rows split between blocks are parsed correctly."""
+		file_path = write_pts(self.directory.name, self.rows)
+		result = read_pts(file_path, block_size=17)
+		self.assertTrue(np.array_equal(result, self.rows))
+
+	def test_read_pts_without_header_count(self):
+		"""Test that a file whose first line is not a point count is still parsed."""
+		file_path = write_pts(self.directory.name, self.rows, header=False)
+		with open(file_path) as f:
+			content = f.read()
+		with open(file_path, "w") as f:
+			f.write("x y z intensity r g b\n" + content)
+		result = read_pts(file_path, dtype=np.float32, block_size=64)
+		self.assertEqual(result.dtype, np.float32)
+		self.assertTrue(np.allclose(result, self.rows))
+
+	def test_read_pts_header_mismatch(self):
+		"""Test that a point count differing from the header raises InvalidPointCloudError."""
+		file_path = write_pts(self.directory.name, self.rows)
+		with open(file_path, "a") as f:
+			f.write("1 2 3 4 5 6 7\n")
+		with self.assertRaises(InvalidPointCloudError):
+			read_pts(file_path)
+
+	def test_read_pts_wrong_column_count(self):
+		"""Test that rows without 7 columns raise InvalidPointCloudError."""
+		file_path = write_pts(self.directory.name, self.rows[:, :6])
+		with self.assertRaises(InvalidPointCloudError):
+			read_pts(file_path)
+
+	@patch("api.utils.point_cloud.PTS_TOKENIZER", "vectorized")
+	def test_read_pts_vectorized_tokenizer(self):
+		"""Test that the vectorized tokenizer matches np.loadtxt and falls back on irregular rows."""
+		file_path = write_pts(self.directory.name, self.rows)
+		self.assertTrue(np.array_equal(read_pts(file_path, block_size=17), self.rows))
+
+		# Filas de 6 y 8 columnas suman un múltiplo de 7 tokens: deben rechazarse igual
+		with open(file_path, "w") as f:
+			f.write("2\n1 2 3 4 5 6\n1 2 3 4 5 6 7 8\n")
+		with self.assertRaises(InvalidPointCloudError):
+			read_pts(file_path)
+
+		# Las líneas en blanco pasan por np.loadtxt, que las ignora
+		with open(file_path, "w") as f:
+			f.write("2\n1 2 3 4 5 6 7\n\n8 9 10 11 12 13 14\n")
+		self.assertTrue(np.array_equal(read_pts(file_path), np.arange(1, 15).reshape(2, 7)))
+
+
+class TestPointCloudCache(TestCase):
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.rows = np.arange(21, dtype=np.float64).reshape(3, 7)
+		self.file_path = write_pts(self.directory.name, self.rows)
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def test_load_point_cloud_reuses_binary_cache(self):
+		"""Test that a second load memory-maps the sidecar instead of parsing the text file."""
+		load_point_cloud(self.file_path)
+		with patch("api.utils.point_cloud.read_pts") as mock_read_pts:
+			result = load_point_cloud(self.file_path)
+		mock_read_pts.assert_not_called()
+		self.assertIsInstance(result, np.memmap)
+		self.assertTrue(np.array_equal(result, self.rows))
+
+	def test_load_point_cloud_invalidates_cache_on_change(self):
+		"""Test that modifying the file replaces its cached copy."""
+		load_point_cloud(self.file_path)
+		changed = self.rows + 1
+		write_pts(self.directory.name, changed)
+		os.utime(self.file_path, ns=(0, 10**9))
+		result = load_point_cloud(self.file_path)
+		self.assertTrue(np.array_equal(result, changed))
+		self.assertEqual(len(os.listdir(cache_dir(self.file_path))), 1)
+
+	def test_load_point_cloud_cache_dir_from_environment(self):
+		"""Test that POINT_CLOUD_CACHE_DIR moves the sidecars out of the scan directory."""
+		with tempfile.TemporaryDirectory() as root, patch.dict(os.environ, {"POINT_CLOUD_CACHE_DIR": root}):
+			load_point_cloud(self.file_path)
+			self.assertTrue(cache_dir(self.file_path).startswith(root))
+			self.assertEqual(len(os.listdir(cache_dir(self.file_path))), 1)
+
+	def test_file_digest_rewrites_invalid_memo(self):
+		"""Test that an empty or truncated digest memo is recomputed instead of trusted."""
+		expected = hashlib.sha256(open(self.file_path, "rb").read()).hexdigest()
+		self.assertEqual(file_digest(self.file_path), expected)
+		memo = cache_path(self.file_path, "sha256", ".txt")
+		for content in ("", expected[:20]):
+			with open(memo, "w") as f:
+				f.write(content)
+			self.assertEqual(file_digest(self.file_path), expected)
+			with open(memo) as f:
+				self.assertEqual(f.read(), expected)
+
+	def test_publish_directory_keeps_concurrent_winner(self):
+		"""Test that a published artifact directory is kept when current and replaced when outdated."""
+		destination = os.path.join(self.directory.name, "artifact")
+		names = []
+		for content in ("first", "second", "third"):
+			temporary = temporary_path(destination)
+			self.assertNotIn(temporary, names)
+			names.append(temporary)
+			os.makedirs(temporary)
+			with open(os.path.join(temporary, "content.txt"), "w") as f:
+				f.write(content)
+			current = content != "third"
+			publish_directory(temporary, destination, lambda path: current)
+			self.assertFalse(os.path.exists(temporary))
+		with open(os.path.join(destination, "content.txt")) as f:
+			# "second" encontró a "first" vigente; "third" lo consideró obsoleto y lo reemplazó
+			self.assertEqual(f.read(), "third")
+		self.assertEqual(sorted(os.listdir(self.directory.name)), ["artifact", "cloud.pts"])
+
+		# Si nada vigente quedó publicado, el error no se reporta como una construcción concurrente
+		temporary = temporary_path(destination)
+		os.makedirs(temporary)
+		replace = os.replace
+		def failing_replace(source, target):
+			if source == temporary:
+				raise PermissionError(target)
+			return replace(source, target)
+		with patch("api.utils.cache.os.replace", side_effect=failing_replace), self.assertRaises(PermissionError):
+			publish_directory(temporary, destination, lambda path: False)
+
+
+class TestStreamingPointCloud(TestCase):
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		rng = np.random.default_rng(0)
+		self.rows = np.round(rng.normal(size=(103, 7)) * 100, 3)
+		self.file_path = write_pts(self.directory.name, self.rows)
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def test_iter_point_cloud_chunks_fixed_size(self):
+		"""Test that the file is yielded in fixed-size blocks that cover every row."""
+		for _ in range(2):  # Sin caché y luego desde la caché binaria
+			chunks = list(iter_point_cloud_chunks(self.file_path, chunk_points=25))
+			self.assertEqual([len(chunk) for chunk in chunks], [25, 25, 25, 25, 3])
+			self.assertTrue(np.array_equal(np.concatenate(chunks), self.rows))
+			load_point_cloud(self.file_path)
+
+	def test_point_cloud_stats_match_numpy(self):
+		"""Test that merged per-block statistics equal whole-array statistics."""
+		stats = PointCloudStats()
+		for start in range(0, len(self.rows), 10):
+			stats.update(self.rows[start:start + 10])
+		self.assertEqual(stats.count, len(self.rows))
+		self.assertTrue(np.allclose(stats.min, self.rows.min(axis=0)))
+		self.assertTrue(np.allclose(stats.max, self.rows.max(axis=0)))
+		self.assertTrue(np.allclose(stats.mean, self.rows.mean(axis=0)))
+		self.assertTrue(np.allclose(stats.std, self.rows.std(axis=0)))
+
+	def test_streaming_point_cloud_info_matches_point_cloud_info(self):
+		"""Test that file statistics computed chunk by chunk match the in-memory ones."""
+		info = streaming_point_cloud_info(self.file_path, chunk_points=7)
+		expected = point_cloud_info(self.rows)
+		self.assertEqual(info["numero_puntos"], 103)
+		self.assertEqual(info["ejemplo_fila"], self.rows[:5].tolist())
+		self.assertEqual(info["rango_z"], (self.rows[:, 2].min(), self.rows[:, 2].max()))
+		self.assertAlmostEqual(info["desviacion_estandar_intensidad"], self.rows[:, 3].std())
+		self.assertAlmostEqual(info["media_intensidad"], expected["media_intensidad"])
+
+
+class TestPointCloudBinaryTransport(TestCase):
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.rows = np.array([
+			[1.5, -2.0, 3.25, -100, 255, 0, 10],
+			[0.0, 4.0, -1.0, 100, 20, 30, 40],
+			[2.0, 2.0, 2.0, 0, 7, 8, 9],
+		])
+		self.file_path = write_pts(self.directory.name, self.rows)
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def assert_binary_payload(self, response):
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response["Content-Type"], "application/octet-stream")
+		payload = b"".join(response.streaming_content)
+		self.assertEqual(len(payload), binary_points_size(3))
+		points = decode_points_binary(payload)
+		self.assertTrue(np.allclose(points["xyz"], self.rows[:, :3]))
+		self.assertEqual(points["rgb"].tolist(), self.rows[:, 4:7].tolist())
+		self.assertEqual(points["intensity"].tolist(), [0, 255, 127])
+
+	def test_point_cloud_view_binary_format_query(self):
+		"""Test that ?format=bin streams the binary point format."""
+		response = self.client.get("/api/test/point-cloud", {"filepath": self.file_path, "format": "bin"})
+		self.assert_binary_payload(response)
+
+	def test_point_cloud_view_binary_accept_header(self):
+		"""Test that the binary format is selected through the Accept header."""
+		response = self.client.get(
+			"/api/test/point-cloud", {"filepath": self.file_path}, HTTP_ACCEPT="application/octet-stream"
+		)
+		self.assert_binary_payload(response)
+
+
+class TestPointCloudQuantizedTransport(TestCase):
+	def setUp(self):
+		rng = np.random.default_rng(1)
+		xyz = np.cumsum(rng.normal(scale=0.01, size=(500, 3)), axis=0) * 100
+		colors = rng.integers(0, 256, size=(500, 3))
+		intensity = rng.integers(-2048, 2048, size=(500, 1))
+		self.rows = np.hstack([xyz, intensity, colors]).astype(np.float64)
+
+	def test_quantized_round_trip_within_precision(self):
+		"""Test that decoded coordinates are within half a quantization step."""
+		payload = encode_points_quantized(self.rows, self.rows[:, :3].min(axis=0), self.rows[:, :3].max(axis=0), precision=0.001)
+		xyz, rgb, intensity = decode_points_quantized(payload)
+		self.assertLessEqual(np.abs(xyz - self.rows[:, :3]).max(), 0.0005 + 1e-9)
+		self.assertEqual(rgb.tolist(), self.rows[:, 4:7].astype(int).tolist())
+		self.assertEqual((intensity.min(), intensity.max()), (0, 255))
+		self.assertLess(len(payload), self.rows.nbytes / 4)
+
+	def test_point_cloud_view_quantized_format(self):
+		"""Test that ?format=qbin returns a decodable payload at the requested precision."""
+		with tempfile.TemporaryDirectory() as directory:
+			file_path = write_pts(directory, np.round(self.rows, 4))
+			response = self.client.get("/api/test/point-cloud", {"filepath": file_path, "format": "qbin", "precision": "0.01"})
+			# Con una consulta espacial el bounding box sale del índice, sin recorrer los puntos
+			low, high = np.median(self.rows[:, :3], axis=0), self.rows[:, :3].max(axis=0)
+			box = ",".join(str(value) for value in [*low, *high])
+			with patch("api.views.point_cloud_info") as info:
+				queried = self.client.get("/api/test/point-cloud", {"filepath": file_path, "format": "qbin", "bbox": box})
+				info.assert_not_called()
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response["Content-Type"], "application/x-point-cloud-quantized")
+		xyz, _, _ = decode_points_quantized(response.content)
+		self.assertLessEqual(np.abs(xyz - self.rows[:, :3]).max(), 0.005 + 1e-4)
+		xyz, _, _ = decode_points_quantized(queried.content)
+		inside = self.rows[np.all((np.round(self.rows[:, :3], 4) >= low) & (np.round(self.rows[:, :3], 4) <= high), axis=1)]
+		self.assertEqual(len(xyz), len(inside))
+		self.assertLessEqual(np.abs(np.sort(xyz, axis=0) - np.sort(inside[:, :3], axis=0)).max(), 0.0006)
+
+
+class TestLODOctree(TestCase):
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		rng = np.random.default_rng(2)
+		self.rows = np.round(np.hstack([rng.uniform(0, 10, size=(2000, 3)), rng.integers(0, 256, size=(2000, 4))]), 3)
+		self.file_path = write_pts(self.directory.name, self.rows)
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def test_build_lod_octree_partitions_points(self):
+		"""Test that every point is stored in exactly one node and nodes respect their capacity."""
+		hierarchy = build_lod_octree(self.file_path, node_capacity=300, grid_size=8)
+		self.assertGreater(len(hierarchy["nodes"]), 1)
+		stored = np.concatenate([load_lod_node(self.file_path, node_id) for node_id in hierarchy["nodes"]])
+		self.assertEqual(len(stored), len(self.rows))
+		# Las coordenadas se guardan relativas al nodo: se recuperan con el redondeo original
+		self.assertTrue(np.array_equal(np.unique(np.round(stored, 3), axis=0), np.unique(self.rows, axis=0)))
+		for node_id, node in hierarchy["nodes"].items():
+			self.assertLessEqual(node["points"], 300)
+			for child in node["children"]:
+				self.assertTrue(child.startswith(node_id))
+		self.assertEqual(load_lod_hierarchy(self.file_path, build=False)["nodes"].keys(), hierarchy["nodes"].keys())
+
+	def test_load_lod_node_rejects_invalid_ids(self):
+		"""Test that node ids that are not octree paths are rejected."""
+		build_lod_octree(self.file_path, node_capacity=300)
+		with self.assertRaises(KeyError):
+			load_lod_node(self.file_path, "../hierarchy")
+
+	def test_point_cloud_lod_view_serves_nodes(self):
+		"""Test that the LOD endpoint returns the hierarchy and the root node in binary format."""
+		response = self.client.get("/api/point-cloud/lod", {"filepath": self.file_path})
+		self.assertEqual(response.status_code, 200)
+		root = response.json()["hierarchy"]["nodes"]["r"]
+		response = self.client.get("/api/point-cloud/lod", {"filepath": self.file_path, "node": "r", "format": "bin"})
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(len(decode_points_binary(b"".join(response.streaming_content))), root["points"])
+
+
+def sphere_rows(num_points=400, seed=3):
+	"""Points on a unit sphere with intensity and color columns."""
+	rng = np.random.default_rng(seed)
+	xyz = rng.normal(size=(num_points, 3))
+	xyz /= np.linalg.norm(xyz, axis=1, keepdims=True)
+	return np.round(np.hstack([xyz, rng.integers(0, 100, size=(num_points, 1)), rng.integers(0, 256, size=(num_points, 3))]), 5)
+
+class TestMeshParameters(TestCase):
+	def test_mesh_parameters_merges_defaults(self):
+		"""Test that request parameters override the defaults with their types."""
+		self.assertEqual(
+			mesh_parameters("poisson", {"depth": "6"}),
+			{"radius": 0.025, "max_nn": 30, "depth": 6, "density_quantile": 0.05, "target_triangles": 0, "max_error": 0.0},
+		)
+
+	def test_mesh_parameters_rejects_unknown(self):
+		"""Test that unknown algorithms and parameters raise UnknownAlgorithmError."""
+		with self.assertRaises(UnknownAlgorithmError):
+			mesh_parameters("marching_cubes")
+		with self.assertRaises(UnknownAlgorithmError):
+			mesh_parameters("delaunay", {"depth": 9})
+
+class TestMeshJobs(TransactionTestCase):
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.file_path = write_pts(self.directory.name, sphere_rows())
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def test_mesh_job_runs_in_background(self):
+		"""Test that a submitted job returns 202 at once and its result can be polled."""
+		response = self.client.post(
+			"/api/3d-mesh/jobs",
+			{"filepath": self.file_path, "algorithm": "delaunay", "params": {"alpha": 2.0}},
+			content_type="application/json",
+		)
+		self.assertEqual(response.status_code, 202)
+		job_id = response.json()["job"]["id"]
+
+		deadline = time.monotonic() + 120
+		while time.monotonic() < deadline:
+			response = self.client.get(f"/api/3d-mesh/jobs/{job_id}/result")
+			if response.status_code != 202:
+				break
+			time.sleep(0.2)
+		self.assertEqual(response.status_code, 200, response.content)
+		self.assertTrue(os.path.exists(response.json()["output"]))
+		self.assertGreater(response.json()["mesh_info"]["triangles"], 0)
+
+	def test_cancel_pending_mesh_job(self):
+		"""Test that a pending job can be cancelled once and is never started."""
+		job = MeshJob.objects.create(filepath=self.file_path, algorithm="delaunay", params={"alpha": 1.0})
+		response = self.client.post(f"/api/3d-mesh/jobs/{job.id}/cancel")
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.json()["job"]["status"], MeshJob.CANCELLED)
+		response = self.client.post(f"/api/3d-mesh/jobs/{job.id}/cancel")
+		self.assertEqual(response.status_code, 409)
+
+	def test_mesh_job_rejects_unknown_algorithm(self):
+		"""Test that submitting an unknown algorithm returns 400 without creating a job."""
+		response = self.client.post(
+			"/api/3d-mesh/jobs", {"filepath": self.file_path, "algorithm": "marching_cubes"}, content_type="application/json"
+		)
+		self.assertEqual(response.status_code, 400)
+		self.assertFalse(MeshJob.objects.exists())
+
+	def test_recover_requeues_pending_and_fails_stale_jobs(self):
+		"""Test that recovery queues pending jobs and fails only the running jobs of dead local processes."""
+		process = subprocess.Popen(["true"])
+		process.wait()
+		create = lambda **fields: MeshJob.objects.create(filepath=self.file_path, algorithm="delaunay", **fields)
+		pending = create()
+		dead = create(status=MeshJob.RUNNING, worker=f"{socket.gethostname()}:{process.pid}")
+		alive = create(status=MeshJob.RUNNING, worker=f"{socket.gethostname()}:{os.getppid()}")
+		remote = create(status=MeshJob.RUNNING, worker="other-host:1")
+
+		queue = MeshJobQueue(max_workers=1)
+		self.assertEqual(queue.recover(), (1, 1))
+		self.assertEqual(queue._pending.get_nowait(), pending.id)
+		statuses = dict(MeshJob.objects.values_list("id", "status"))
+		self.assertEqual(statuses[dead.id], MeshJob.FAILED)
+		self.assertEqual(statuses[alive.id], MeshJob.RUNNING)
+		self.assertEqual(statuses[remote.id], MeshJob.RUNNING)
+
+	def test_broken_pool_is_rebuilt(self):
+		"""Test that a pool broken by a dead worker is replaced and the job is submitted to the new one."""
+		broken, replacement = MagicMock(), MagicMock()
+		broken.submit.side_effect = BrokenProcessPool("worker died")
+		job = MeshJob.objects.create(filepath=self.file_path, algorithm="delaunay")
+		queue = MeshJobQueue(max_workers=1)
+		queue._pool = broken
+		with patch("api.jobs.process_pool", return_value=replacement):
+			queue._submit(job)
+		broken.shutdown.assert_called_once()
+		self.assertIs(queue._pool, replacement)
+		replacement.submit.assert_called_once()
+
+
+	def test_dispatcher_survives_failed_bookkeeping(self):
+		"""Test that the dispatcher keeps running when marking a job as failed also fails."""
+		first, second = (MeshJob.objects.create(filepath=self.file_path, algorithm="delaunay") for _ in range(2))
+		queue = MeshJobQueue(max_workers=1)
+		submitted = []
+		def submit(job):
+			submitted.append(job.id)
+			raise RuntimeError("pool unavailable")
+		real_filter = MeshJob.objects.filter
+		def filter(**lookups):
+			if lookups.get("status") != MeshJob.PENDING:
+				raise DatabaseError("database is locked")
+			return real_filter(**lookups)
+		with patch.object(queue, "_submit", side_effect=submit), patch("api.jobs.MeshJob.objects.filter", side_effect=filter):
+			dispatcher = threading.Thread(target=queue._dispatch, daemon=True)
+			dispatcher.start()
+			queue._pending.put(first.id)
+			queue._pending.put(second.id)
+			for _ in range(100):
+				if len(submitted) == 2:
+					break
+				time.sleep(0.05)
+		self.assertEqual(submitted, [first.id, second.id])
+		self.assertTrue(dispatcher.is_alive())
+
+
+class TestMeshResultCache(TestCase):
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.file_path = write_pts(self.directory.name, sphere_rows())
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def test_identical_request_is_served_from_cache(self):
+		"""Test that the same algorithm and parameters reuse the stored mesh."""
+		first = mesh_result(self.file_path, "delaunay", {"alpha": 2.0})
+		with patch("api.utils.reconstruction._generate_mesh") as mock_generate:
+			second = mesh_result(self.file_path, "delaunay", {"alpha": 2.0})
+		mock_generate.assert_not_called()
+		self.assertFalse(first["cached"])
+		self.assertTrue(second["cached"])
+		self.assertEqual(first["output"], second["output"])
+		self.assertEqual(first["mesh_info"], second["mesh_info"])
+
+	def test_parameter_sets_do_not_clobber_outputs(self):
+		"""Test that different parameters are written to different files."""
+		first = mesh_result(self.file_path, "delaunay", {"alpha": 2.0})
+		second = mesh_result(self.file_path, "delaunay", {"alpha": 3.0})
+		self.assertNotEqual(first["output"], second["output"])
+		self.assertTrue(os.path.exists(first["output"]) and os.path.exists(second["output"]))
+
+	def test_evict_mesh_cache_removes_least_recently_used(self):
+		"""Test that eviction keeps the most recently used entries within the size bound."""
+		old = mesh_result(self.file_path, "delaunay", {"alpha": 2.0})
+		new = mesh_result(self.file_path, "delaunay", {"alpha": 3.0})
+		os.utime(os.path.join(os.path.dirname(old["output"]), "entry.json"), (0, 0))
+		evict_mesh_cache(mesh_cache_root(), max_bytes=os.path.getsize(new["output"]) + 4096)
+		self.assertFalse(os.path.exists(old["output"]))
+		self.assertTrue(os.path.exists(new["output"]))
+
+	def test_evict_mesh_cache_spares_recently_used_entries(self):
+		"""Test that entries used within the grace period survive eviction even over the size bound."""
+		result = mesh_result(self.file_path, "delaunay", {"alpha": 2.0})
+		evict_mesh_cache(mesh_cache_root(), max_bytes=0, grace_seconds=60)
+		self.assertTrue(os.path.exists(result["output"]))
+		evict_mesh_cache(mesh_cache_root(), max_bytes=0, grace_seconds=0)
+		self.assertFalse(os.path.exists(result["output"]))
+
+
+class TestNormalsCache(TestCase):
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.file_path = write_pts(self.directory.name, sphere_rows())
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def test_estimate_cloud_normals_reuses_cache(self):
+		"""Test that a second estimation with the same parameters loads the cached normals."""
+		point_cloud = load_point_cloud(self.file_path)
+		first = generate_cloud(point_cloud)
+		self.assertFalse(estimate_cloud_normals(first, self.file_path, radius=0.5, max_nn=10))
+		second = generate_cloud(point_cloud)
+		self.assertTrue(estimate_cloud_normals(second, self.file_path, radius=0.5, max_nn=10))
+		self.assertTrue(np.allclose(np.asarray(first.normals), np.asarray(second.normals), atol=1e-6))
+
+	def test_estimate_cloud_normals_keyed_by_parameters(self):
+		"""Test that other search parameters do not reuse the cached normals."""
+		point_cloud = load_point_cloud(self.file_path)
+		estimate_cloud_normals(generate_cloud(point_cloud), self.file_path, radius=0.5, max_nn=10)
+		self.assertFalse(estimate_cloud_normals(generate_cloud(point_cloud), self.file_path, radius=0.5, max_nn=20))
+		self.assertFalse(estimate_cloud_normals(generate_cloud(point_cloud), self.file_path, radius=0.5, max_nn=10, variant="voxel"))
+
+
+class TestPreprocessing(TestCase):
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.file_path = write_pts(self.directory.name, sphere_rows())
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def test_preprocess_cloud_reports_each_stage(self):
+		"""Test that stages run in order and report their point counts."""
+		cloud = generate_cloud(load_point_cloud(self.file_path))
+		cloud, report = preprocess_cloud(cloud, ["remove_statistical_outlier", {"stage": "voxel_down_sample", "voxel_size": 0.5}])
+		self.assertEqual([stage["stage"] for stage in report], ["remove_statistical_outlier", "voxel_down_sample"])
+		self.assertEqual(report[0]["points_before"], 400)
+		self.assertEqual(report[1]["points_before"], report[0]["points_after"])
+		self.assertLess(report[1]["points_after"], report[1]["points_before"])
+		self.assertEqual(len(cloud.points), report[1]["points_after"])
+
+	def test_unknown_stage_or_parameter_raises(self):
+		"""Test that unknown stages and parameters are rejected."""
+		with self.assertRaises(UnknownStageError):
+			preprocessing_stages(["smooth"])
+		with self.assertRaises(UnknownStageError):
+			preprocessing_stages([{"stage": "voxel_down_sample", "size": 0.1}])
+
+	def test_preprocessing_is_part_of_the_mesh_cache_key(self):
+		"""Test that a preprocessed request does not reuse the mesh of the raw cloud."""
+		raw = mesh_result(self.file_path, "delaunay", {"alpha": 2.0})
+		voxel = mesh_result(self.file_path, "delaunay", {"alpha": 2.0}, [{"stage": "voxel_down_sample", "voxel_size": 0.2}])
+		self.assertFalse(voxel["cached"])
+		self.assertNotEqual(raw["output"], voxel["output"])
+		self.assertEqual(voxel["preprocessing"][0]["stage"], "voxel_down_sample")
+
+	def test_random_stages_skip_the_normals_cache(self):
+		"""Test that normals of a cloud processed by a RANSAC stage are neither read from nor written to the cache."""
+		self.assertFalse(is_deterministic(preprocessing_stages(["voxel_down_sample", "segment_plane"])))
+		self.assertTrue(is_deterministic(preprocessing_stages(["voxel_down_sample"])))
+		params = {"depth": 5, "radius": 0.5, "max_nn": 10}
+		with patch("api.utils.reconstruction.estimate_cloud_normals", wraps=estimate_cloud_normals) as mock_estimate:
+			mesh_result(self.file_path, "poisson", params, [{"stage": "segment_plane", "distance_threshold": 2.0}])
+		self.assertIsNone(mock_estimate.call_args.args[1])
+		self.assertFalse(any("normals" in name for name in os.listdir(cache_dir(self.file_path))))
+
+	def test_random_stages_skip_the_mesh_cache(self):
+		"""Test that a mesh generated after a RANSAC stage is regenerated instead of replayed from the cache."""
+		preprocessing = [{"stage": "segment_plane", "distance_threshold": 2.0}]
+		first = mesh_result(self.file_path, "delaunay", {"alpha": 2.0}, preprocessing)
+		second = mesh_result(self.file_path, "delaunay", {"alpha": 2.0}, preprocessing)
+		self.assertFalse(first["cached"])
+		self.assertFalse(second["cached"])
+		self.assertFalse(second["output"].startswith(mesh_cache_root()))
+
+
+class TestColormap(TestCase):
+	def test_apply_colormap_indexes_the_lut(self):
+		"""Test that normalized values pick the LUT entries floor(x * 256), clipped to 0-255."""
+		lut = colormap_lut("inferno")
+		colors = apply_colormap(np.array([0.0, 0.5, 1.0, -1.0, 2.0]), "inferno")
+		self.assertEqual(colors.dtype, np.uint8)
+		self.assertTrue(np.array_equal(colors, lut[[0, 128, 255, 0, 255]]))
+		self.assertEqual(lut[0].tolist(), [0, 0, 4])
+		self.assertEqual(lut[255].tolist(), [252, 255, 164])
+
+	def test_float_colors_and_unknown_colormap(self):
+		"""Test the float32 output used by Open3D and the error for unknown names."""
+		colors = apply_colormap(np.linspace(0, 1, 10), "viridis", np.float32)
+		self.assertEqual(colors.dtype, np.float32)
+		self.assertTrue(np.allclose(colors * 255, apply_colormap(np.linspace(0, 1, 10), "viridis"), atol=1e-3))
+		with self.assertRaises(UnknownColormapError):
+			apply_colormap(np.zeros(3), "jet")
+
+	def test_generate_cloud_with_constant_intensity(self):
+		"""Test that a constant intensity takes the first color instead of NaN."""
+		rows = sphere_rows(50)
+		rows[:, 3] = 7
+		self.assertTrue(np.array_equal(normalize_values(rows[:, 3]), np.zeros(50, dtype=np.float32)))
+		cloud = generate_cloud(rows)
+		self.assertTrue(np.allclose(np.asarray(cloud.colors), colormap_lut("inferno", np.float32)[0]))
+
+
+class TestCloudDescriptor(TestCase):
+	def test_descriptor_matches_point_cloud_info(self):
+		"""Test that the chunked descriptor gives the same statistics and a float32 normalized intensity."""
+		point_cloud = sphere_rows(1000)
+		descriptor = CloudDescriptor(point_cloud, chunk_points=128)
+		self.assertEqual(descriptor.info(), point_cloud_info(point_cloud, chunk_points=128))
+		intensity = point_cloud[:, 3]
+		expected = (intensity - intensity.min()) / (intensity.max() - intensity.min())
+		self.assertEqual(descriptor.normalized_intensity.dtype, np.float32)
+		self.assertTrue(np.allclose(descriptor.normalized_intensity, expected, atol=1e-6))
+
+	def test_generate_cloud_reuses_descriptor(self):
+		"""Test that generate_cloud takes its colors from the descriptor's normalized intensity."""
+		point_cloud = sphere_rows(200)
+		descriptor = CloudDescriptor(point_cloud)
+		normalized = descriptor.normalized_intensity
+		self.assertIs(descriptor.normalized_intensity, normalized)
+		with patch("api.utils.point_cloud.normalize_values") as mock_normalize:
+			cloud = generate_cloud(point_cloud, descriptor)
+		mock_normalize.assert_not_called()
+		self.assertTrue(np.allclose(np.asarray(cloud.colors), apply_colormap(normalized, "inferno", np.float32)))
+
+	def test_backend_view_scans_the_cloud_once(self):
+		"""Test that PointCloudBackendView.get builds one descriptor and passes it to generate_cloud."""
+		with tempfile.TemporaryDirectory() as directory:
+			file_path = write_pts(directory, sphere_rows(200))
+			with patch("api.views.HEADLESS_RENDERING", False), patch("api.views.plot_cloud"), \
+				patch("api.views.point_cloud_info") as info, patch("api.views.generate_cloud") as generate:
+				response = self.client.get("/api/point-cloud", {"filepath": file_path})
+		self.assertEqual(response.status_code, 200)
+		info.assert_not_called()
+		self.assertIsInstance(generate.call_args.args[1], CloudDescriptor)
+
+	def test_to_vector3d_packs_strided_and_float32_input(self):
+		"""Test that strided and float32 arrays are converted to the same Open3D vectors."""
+		point_cloud = sphere_rows(100)
+		expected = np.ascontiguousarray(point_cloud[:, :3])
+		self.assertTrue(np.array_equal(np.asarray(to_vector3d(point_cloud[:, :3])), expected))
+		self.assertTrue(np.allclose(np.asarray(to_vector3d(expected.astype(np.float32))), expected, atol=1e-6))
+
+
+class TestScanMetadata(TestCase):
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.file_path = write_pts(self.directory.name, sphere_rows())
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def test_file_metadata_is_cached_until_the_file_changes(self):
+		"""Test that metadata is served from the cache and recomputed after a modification."""
+		metadata = file_metadata(self.file_path)
+		self.assertEqual(metadata["points"], 400)
+		self.assertEqual(len(metadata["bbox"]), 2)
+		with patch("api.utils.metadata.point_cloud_metadata") as mock_metadata:
+			self.assertEqual(file_metadata(self.file_path), metadata)
+		mock_metadata.assert_not_called()
+		write_pts(self.directory.name, sphere_rows(50))
+		self.assertIsNone(cached_metadata(self.file_path))
+		self.assertEqual(file_metadata(self.file_path)["points"], 50)
+
+	def test_listing_returns_metadata_in_parallel(self):
+		"""Test that the listing returns per-file metadata, with errors reported per file."""
+		other = write_pts(self.directory.name, sphere_rows(100), name="other.pts")
+		missing = os.path.join(self.directory.name, "missing.pts")
+		routes = {"FARO_A": self.file_path, "FARO_B": other, "FARO_C": missing}
+		with patch.dict(os.environ, routes):
+			sync_environment()
+			response = self.client.get("/api/test/point-cloud")
+		self.assertEqual(response.status_code, 200)
+		listing = {item["key"]: item for item in response.json()["point_clouds"] if item["key"] in routes}
+		self.assertEqual(listing["FARO_A"]["points"], 400)
+		self.assertEqual(listing["FARO_B"]["points"], 100)
+		self.assertTrue(listing["FARO_C"]["error"])
+		self.assertIsNotNone(cached_metadata(other))
+
+
+class TestScanCatalog(TestCase):
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.file_path = write_pts(self.directory.name, sphere_rows())
+		os.makedirs(os.path.join(self.directory.name, "site"))
+		self.other = write_pts(os.path.join(self.directory.name, "site"), sphere_rows(100), name="other.pts")
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def test_index_scans_is_incremental(self):
+		"""Test that unchanged files are skipped, modified ones refreshed and deleted ones removed."""
+		self.assertEqual(index_scans([self.directory.name]), {"added": 2, "updated": 0, "unchanged": 0, "removed": 0})
+		self.assertEqual(index_scans([self.directory.name]), {"added": 0, "updated": 0, "unchanged": 2, "removed": 0})
+		write_pts(self.directory.name, sphere_rows(50))
+		os.remove(self.other)
+		self.assertEqual(index_scans([self.directory.name]), {"added": 0, "updated": 1, "unchanged": 0, "removed": 1})
+		self.assertEqual(Scan.objects.get().points, 50)
+
+	def test_index_scans_records_artifacts(self):
+		"""Test that caches of the current file version are registered as artifacts."""
+		load_point_cloud(self.file_path)
+		index_scans([self.directory.name])
+		scan = Scan.objects.get(path=os.path.abspath(self.file_path))
+		self.assertIn("points-float64", [artifact.kind for artifact in scan.artifacts.all()])
+
+	def test_list_scans_paginates(self):
+		"""Test that listings are served from the catalog one page at a time."""
+		index_scans([self.directory.name])
+		page = list_scans("pts", page=2, page_size=1)
+		self.assertEqual((page["count"], page["page"], page["pages"]), (2, 2, 2))
+		self.assertEqual(page["results"][0]["path"], os.path.abspath(self.other))
+
+	def test_meshes_report_their_real_format(self):
+		"""Test that .glb and .obj meshes are listed together as meshes, each with its own format."""
+		mesh = o3d.geometry.TriangleMesh.create_sphere(1.0, 10)
+		mesh.compute_vertex_normals()
+		for name in ("sphere.obj", "sphere.glb"):
+			save_mesh(mesh, os.path.join(self.directory.name, name))
+		index_scans([self.directory.name])
+		page = list_scans(Scan.MESH)
+		self.assertEqual([scan["format"] for scan in page["results"]], ["glb", "obj"])
+		self.assertEqual(list_scans(Scan.POINT_CLOUD)["results"][0]["format"], "pts")
+
+	def test_listing_reads_only_the_catalog(self):
+		"""Test that listings do not index FARO* files, which the environment sync registers."""
+		with patch.dict(os.environ, {"FARO_SITE": self.file_path}):
+			with patch("api.catalog.batch_metadata") as mock_metadata:
+				response = self.client.get("/api/test/point-cloud")
+			self.assertEqual(response.status_code, 200)
+			self.assertEqual(response.json()["count"], 0)
+			mock_metadata.assert_not_called()
+			# Lo que ejecutan el hilo de fondo y `index_scans` sin argumentos
+			sync_environment()
+		self.assertEqual(self.client.get("/api/test/point-cloud").json()["point_clouds"][0]["key"], "FARO_SITE")
+
+
+class TestSpatialIndex(TestCase):
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		rng = np.random.default_rng(5)
+		xyz = rng.uniform(0, 10, size=(3000, 3))
+		self.rows = np.round(np.hstack([xyz, rng.integers(0, 100, size=(3000, 1)), rng.integers(0, 256, size=(3000, 3))]), 4)
+		self.file_path = write_pts(self.directory.name, self.rows)
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def test_queries_match_brute_force(self):
+		"""Test that box and sphere queries through the grid return exactly the points inside."""
+		build_spatial_index(self.file_path, cell_points=50, chunk_points=700)
+		xyz = self.rows[:, :3]
+		low, high = np.array([2.0, 3.0, 1.0]), np.array([5.0, 7.5, 4.0])
+		points, matches = query_points(self.file_path, box=(low, high))
+		self.assertEqual(matches, np.all((xyz >= low) & (xyz <= high), axis=1).sum())
+		self.assertEqual(
+			sorted(map(tuple, np.round(points[:, :3], 4))),
+			sorted(map(tuple, xyz[np.all((xyz >= low) & (xyz <= high), axis=1)])),
+		)
+		center = np.array([5.0, 5.0, 5.0])
+		points, matches = query_points(self.file_path, sphere=(center, 2.0))
+		self.assertEqual(matches, (np.sum((xyz - center) ** 2, axis=1) <= 4.0).sum())
+
+	def test_grid_keeps_precision_of_large_coordinates(self):
+		"""Test that georeferenced coordinates survive the float32 grid, stored relative to the bbox."""
+		rows = self.rows.copy()
+		rows[:, :3] += [500000.0, 4200000.0, 100.0]
+		file_path = write_pts(self.directory.name, rows, name="utm.pts")
+		points, _ = query_points(file_path)
+		self.assertEqual(sorted(map(tuple, np.round(points[:, :3], 4))), sorted(map(tuple, np.round(rows[:, :3], 4))))
+
+	def test_max_points_and_paging(self):
+		"""Test that large results are thinned to the budget and paged with offset and limit."""
+		points, matches = query_points(self.file_path, max_points=100)
+		self.assertEqual((len(points), matches), (100, 3000))
+		# El raleo se calcula sobre las coincidencias: una caja ajustada dentro de celdas grandes llena el presupuesto
+		build_spatial_index(self.file_path, cell_points=1000)
+		box = ([1, 1, 1], [6, 6, 6])
+		inside = np.all((self.rows[:, :3] >= 1) & (self.rows[:, :3] <= 6), axis=1).sum()
+		points, matches = query_points(self.file_path, box=box, max_points=100)
+		self.assertEqual(matches, inside)
+		self.assertEqual(len(points), -(-inside // -(-inside // 100)))
+		self.assertGreater(len(points), 50)
+		points, matches = query_points(self.file_path, box=box, max_points=inside)
+		self.assertEqual(len(points), inside)
+		page, matches = query_points(self.file_path, offset=10, limit=5)
+		everything, _ = query_points(self.file_path)
+		self.assertTrue(np.array_equal(page, everything[10:15]))
+		page, matches = query_points(self.file_path, box=([0, 0, 0], [9, 9, 9]), offset=10, limit=5)
+		inside = everything[np.all(everything[:, :3] <= 9, axis=1)]
+		self.assertTrue(np.array_equal(page, inside[10:15]))
+		self.assertIsNone(matches)
+
+	def test_point_cloud_view_filters_by_bbox(self):
+		"""Test that PointCloudView.get returns only the points in the requested box."""
+		response = self.client.get("/api/test/point-cloud", {"filepath": self.file_path, "bbox": "0,0,0,5,5,5", "format": "bin"})
+		self.assertEqual(response.status_code, 200)
+		records = decode_points_binary(b"".join(response.streaming_content))
+		self.assertEqual(len(records), int(response["X-Matching-Points"]))
+		self.assertTrue(np.all(records["xyz"] <= 5))
+		response = self.client.get("/api/test/point-cloud", {"filepath": self.file_path, "bbox": "1,2,3"})
+		self.assertEqual(response.status_code, 400)
+
+
+class TestTiledPoisson(TestCase):
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		rng = np.random.default_rng(9)
+		xy = rng.uniform(0, 4, size=(4000, 2))
+		z = 0.2 * np.sin(xy[:, 0]) * np.cos(xy[:, 1])
+		self.rows = np.round(np.column_stack([xy, z, rng.integers(0, 100, 4000), rng.integers(0, 256, size=(4000, 3))]), 5)
+		self.file_path = write_pts(self.directory.name, self.rows)
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def test_plan_tiles_covers_the_plane(self):
+		"""Test that tiles form a regular x-y grid whose outer cores are unbounded."""
+		grid = {"points": 4000, "bbox": [[0, 0, 0], [4, 4, 1]]}
+		tiles, tile_size = plan_tiles(grid, tile_size=2.0)
+		self.assertEqual((len(tiles), tile_size), (4, 2.0))
+		self.assertEqual(tiles[0], ((-np.inf, -np.inf), (2.0, 2.0)))
+		tiles, tile_size = plan_tiles(grid, tile_points=1000)
+		self.assertEqual(len(tiles), 4)
+
+	def test_tiled_mesh_is_stitched_from_tiles(self):
+		"""Test that tiles are reconstructed, trimmed and merged into one mesh."""
+		output = os.path.join(self.directory.name, "tiled.obj")
+		mesh, result, report, postprocessing = create_tiled_poisson_mesh(
+			self.file_path, radius=0.3, depth=5, tile_size=2.0, density_quantile=0.05, target_triangles=500,
+			output_path=output, preprocessing=preprocessing_stages(["voxel_down_sample"]), workers=1,
+		)
+		self.assertEqual(result, output)
+		self.assertTrue(os.path.exists(output))
+		self.assertGreater(len(mesh.triangles), 0)
+		self.assertEqual(report[0]["stage"], "voxel_down_sample")
+		# Con el margen de solapamiento, las teselas suman al menos todos los puntos de la nube
+		self.assertGreaterEqual(report[0]["points_before"], 4000)
+		self.assertEqual([stage["stage"] for stage in postprocessing], ["density_trim", "decimation"])
+		self.assertLess(postprocessing[0]["vertices_after"], postprocessing[0]["vertices_before"])
+		self.assertLessEqual(len(mesh.triangles), 500)
+
+	def test_sparse_tiles_raise_a_clear_error(self):
+		"""Test that a cloud whose tiles are all below the minimum fails before writing the mesh."""
+		file_path = write_pts(self.directory.name, self.rows[:300], name="sparse.pts")
+		output = os.path.join(self.directory.name, "sparse.obj")
+		with self.assertRaisesRegex(ValueError, "No tile produced a surface"):
+			create_tiled_poisson_mesh(file_path, radius=0.3, depth=5, tile_size=1.0, output_path=output, workers=1)
+		self.assertFalse(os.path.exists(output))
+
+	def test_tile_pool_uses_the_core_budget_of_the_caller(self):
+		"""Test that inside a one-core pool worker (e.g. a mesh job) the tiles run without a nested pool."""
+		self.assertEqual(worker_budget(), os.cpu_count() or 1)
+		with patch.dict(os.environ, {WORKER_CORES_VAR: "1"}), patch("api.utils.tiled_poisson.process_pool") as pool:
+			self.assertEqual(worker_budget(), 1)
+			create_tiled_poisson_mesh(
+				self.file_path, radius=0.3, depth=5, tile_size=2.0, target_triangles=500,
+				output_path=os.path.join(self.directory.name, "budget.obj"),
+			)
+		pool.assert_not_called()
+
+
+class TestPoissonPostprocessing(TestCase):
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.file_path = write_pts(self.directory.name, sphere_rows(2000))
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def poisson_mesh(self):
+		cloud = generate_cloud(load_point_cloud(self.file_path))
+		cloud.estimate_normals()
+		cloud.orient_normals_consistent_tangent_plane(10)
+		mesh, densities = o3d.geometry.TriangleMesh.create_from_point_cloud_poisson(cloud, depth=6)
+		return mesh, np.asarray(densities)
+
+	def test_trim_and_decimation_report_sizes(self):
+		"""Test that low-density vertices are removed and the mesh is decimated to the target."""
+		mesh, densities = self.poisson_mesh()
+		vertices = len(mesh.vertices)
+		mesh, report = simplify_poisson_mesh(mesh, densities, density_quantile=0.1, target_triangles=1000)
+		self.assertEqual([stage["stage"] for stage in report], ["density_trim", "decimation"])
+		self.assertEqual(report[0]["vertices_before"], vertices)
+		self.assertAlmostEqual(report[0]["vertices_after"], 0.9 * vertices, delta=0.01 * vertices)
+		self.assertEqual(report[1]["triangles_before"], report[0]["triangles_after"])
+		self.assertLessEqual(len(mesh.triangles), 1000)
+		self.assertEqual(report[1]["triangles_after"], len(mesh.triangles))
+
+	def test_disabled_stages_leave_the_mesh_unchanged(self):
+		"""Test that a zero quantile and no decimation target keep every triangle."""
+		mesh, densities = self.poisson_mesh()
+		triangles = len(mesh.triangles)
+		mesh, report = simplify_poisson_mesh(mesh, densities)
+		self.assertEqual(len(mesh.triangles), triangles)
+		self.assertEqual(report[1]["triangles_after"], triangles)
+
+	def test_mesh_result_reports_postprocessing(self):
+		"""Test that Poisson results carry the postprocessing report, also from the cache."""
+		params = {"depth": 6, "radius": 0.3, "target_triangles": 800}
+		result = mesh_result(self.file_path, "poisson", params)
+		self.assertEqual(result["postprocessing"][1]["triangles_after"], result["mesh_info"]["triangles"])
+		self.assertLessEqual(result["mesh_info"]["triangles"], 800)
+		cached = mesh_result(self.file_path, "poisson", params)
+		self.assertTrue(cached["cached"])
+		self.assertEqual(cached["postprocessing"], result["postprocessing"])
+
+
+class TestMeshLOD(TestCase):
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.file_path = os.path.join(self.directory.name, "sphere.obj")
+		mesh = o3d.geometry.TriangleMesh.create_sphere(1.0, 60)
+		mesh.compute_vertex_normals()
+		o3d.io.write_triangle_mesh(self.file_path, mesh)
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def test_pyramid_levels_shrink_by_ratio(self):
+		"""Test that each level has about ratio times fewer triangles than the previous one."""
+		pyramid = build_mesh_lod(self.file_path, min_triangles=500)
+		triangles = [level["triangles"] for level in pyramid["levels"]]
+		self.assertEqual(triangles[0], 14160)
+		self.assertEqual(len(triangles), 4)
+		for finer, coarser in zip(triangles, triangles[1:]):
+			self.assertLessEqual(coarser, finer // 4)
+		self.assertEqual(mesh_lod_path(self.file_path, 0), self.file_path)
+		self.assertEqual(len(o3d.io.read_triangle_mesh(mesh_lod_path(self.file_path, 3)).triangles), triangles[3])
+		with self.assertRaises(KeyError):
+			mesh_lod_path(self.file_path, "../pyramid")
+
+	def test_mesh_lod_view_serves_levels(self):
+		"""Test that the endpoint returns the pyramid and the .obj file of a level."""
+		response = self.client.get("/api/3d-mesh/lod", {"filepath": self.file_path})
+		self.assertEqual(response.status_code, 200)
+		levels = response.json()["lod"]["levels"]
+		response = self.client.get("/api/3d-mesh/lod", {"filepath": self.file_path, "level": len(levels) - 1})
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response["Content-Type"], "model/obj")
+		self.assertEqual(len(b"".join(response.streaming_content)), levels[-1]["bytes"])
+		response = self.client.get("/api/3d-mesh/lod", {"filepath": self.file_path, "level": 99})
+		self.assertEqual(response.status_code, 404)
+
+	def test_mesh_view_reads_without_building_and_indexing_builds(self):
+		"""Test that reading a mesh does not build its pyramid and indexing it does."""
+		with patch("api.views.HEADLESS_RENDERING", True):
+			self.assertEqual(self.client.get("/api/3d-mesh", {"filepath": self.file_path}).status_code, 200)
+		response = self.client.get("/api/async/3d-mesh", {"filepath": self.file_path})
+		self.assertIsNone(response.json()["meshs"][0]["lod"])
+		self.assertIsNone(load_mesh_lod(self.file_path, build=False))
+		index_scans([self.directory.name])
+		response = self.client.get("/api/async/3d-mesh", {"filepath": self.file_path})
+		self.assertEqual(response.json()["meshs"][0]["lod"]["levels"][0]["triangles"], 14160)
+
+	def test_generated_meshes_get_a_pyramid(self):
+		"""Test that mesh generation builds the pyramid of the stored mesh."""
+		file_path = write_pts(self.directory.name, sphere_rows())
+		result = mesh_result(file_path, "delaunay", {"alpha": 2.0})
+		pyramid = load_mesh_lod(result["output"], build=False)
+		self.assertEqual(pyramid["levels"][0]["triangles"], result["mesh_info"]["triangles"])
+
+
+class TestGLBMeshes(TestCase):
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.mesh = o3d.geometry.TriangleMesh.create_sphere(1.0, 30)
+		self.mesh.compute_vertex_normals()
+		self.mesh.vertex_colors = to_vector3d(np.random.default_rng(5).random((len(self.mesh.vertices), 3)))
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def test_glb_round_trip(self):
+		"""Test that a mesh saved as .glb loads back with its geometry, normals and colors."""
+		file_path = os.path.join(self.directory.name, "sphere.glb")
+		save_mesh(self.mesh, file_path)
+		self.assertTrue(is_3d_mesh(file_path))
+		with open(file_path, "rb") as f:
+			self.assertEqual(f.read(4), b"glTF")
+		mesh = load_3d_mesh(file_path)
+		np.testing.assert_allclose(np.asarray(mesh.vertices), np.asarray(self.mesh.vertices), atol=1e-6)
+		np.testing.assert_array_equal(np.asarray(mesh.triangles), np.asarray(self.mesh.triangles))
+		np.testing.assert_allclose(np.asarray(mesh.vertex_normals), np.asarray(self.mesh.vertex_normals), atol=1e-6)
+		np.testing.assert_allclose(np.asarray(mesh.vertex_colors), np.asarray(self.mesh.vertex_colors), atol=0.5 / 255 + 1e-9)
+
+	def test_decode_rejects_invalid_files(self):
+		"""Test that truncated or foreign files raise InvalidGLBError."""
+		data = encode_glb(np.zeros((3, 3)), np.array([[0, 1, 2]]))
+		self.assertEqual(decode_glb(data)["triangles"].tolist(), [[0, 1, 2]])
+		with self.assertRaises(InvalidGLBError):
+			decode_glb(b"solid ascii stl")
+		with self.assertRaises(InvalidGLBError):
+			decode_glb(data[:-8])
+
+	def test_mesh_result_writes_the_requested_format(self):
+		"""Test that generated meshes are written as .glb on request, and unknown formats are rejected."""
+		file_path = write_pts(self.directory.name, sphere_rows())
+		obj = mesh_result(file_path, "delaunay", {"alpha": 2.0})
+		glb = mesh_result(file_path, "delaunay", {"alpha": 2.0}, output_format="glb")
+		self.assertTrue(glb["output"].endswith(".glb"))
+		self.assertEqual(glb["mesh_info"]["triangles"], obj["mesh_info"]["triangles"])
+		self.assertLess(os.path.getsize(glb["output"]), os.path.getsize(obj["output"]))
+		mesh, _ = reconstruct_mesh(file_path, "delaunay", {"alpha": 2.0}, output_format="glb")
+		self.assertEqual(len(mesh.triangles), glb["mesh_info"]["triangles"])
+		with self.assertRaises(UnknownAlgorithmError):
+			mesh_result(file_path, "delaunay", output_format="stl")
+
+
+def decode_png(data):
+	"""Decodes the RGBA PNG files written by encode_png (single IDAT, no filters)."""
+	width, height = int.from_bytes(data[16:20], "big"), int.from_bytes(data[20:24], "big")
+	length = int.from_bytes(data[33:37], "big")
+	rows = np.frombuffer(zlib.decompress(data[41:41 + length]), dtype=np.uint8).reshape(height, -1)
+	return rows[:, 1:].reshape(height, width, -1)
+
+
+class TestThumbnails(TestCase):
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def test_encode_png_round_trip(self):
+		"""Test that PNG files carry the signature and the exact pixels."""
+		image = np.random.default_rng(1).integers(0, 256, size=(5, 7, 4), dtype=np.uint8)
+		data = encode_png(image)
+		self.assertEqual(data[:8], b"\x89PNG\r\n\x1a\n")
+		np.testing.assert_array_equal(decode_png(data), image)
+
+	def test_render_mesh_and_points_fill_the_frame(self):
+		"""Test that a mesh is rasterized opaque at the center and transparent at the corners."""
+		mesh = o3d.geometry.TriangleMesh.create_sphere(1.0, 20)
+		image = render_mesh(np.asarray(mesh.vertices), np.asarray(mesh.triangles), size=64)
+		self.assertEqual(image.shape, (64, 64, 4))
+		self.assertEqual(image[32, 32, 3], 255)
+		self.assertEqual(image[0, 0, 3], 0)
+		# Las caras que miran a la cámara son más claras que el borde de la silueta
+		self.assertGreater(image[32, 32, 0], image[32, 4:60, 0][image[32, 4:60, 3] > 0].min())
+		points = render_points(np.asarray(mesh.vertices), np.ones((len(mesh.vertices), 3)), size=64)
+		self.assertGreater((points[..., 3] > 0).sum(), 50)
+
+	def test_thumbnails_are_cached_and_served(self):
+		"""Test that the thumbnail endpoint renders once and headless backend views return PNG."""
+		file_path = write_pts(self.directory.name, sphere_rows())
+		path = render_thumbnail(file_path, 32)
+		self.assertEqual(path, thumbnail_path(file_path, 32))
+		self.assertEqual(decode_png(open(path, "rb").read()).shape, (32, 32, 4))
+		with patch("api.utils.thumbnail.point_cloud_image") as render:
+			response = self.client.get("/api/thumbnail", {"filepath": file_path, "size": 32})
+			self.assertEqual(response.status_code, 200)
+			self.assertEqual(response["Content-Type"], "image/png")
+			render.assert_not_called()
+
+		mesh_path = os.path.join(self.directory.name, "sphere.obj")
+		o3d.io.write_triangle_mesh(mesh_path, o3d.geometry.TriangleMesh.create_sphere(1.0, 10))
+		with patch("api.views.HEADLESS_RENDERING", True), patch("api.views.plot_3d_mesh") as plot:
+			response = self.client.get("/api/3d-mesh", {"filepath": mesh_path})
+			plot.assert_not_called()
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(b"".join(response.streaming_content)[:4], b"\x89PNG")
+		self.assertEqual(self.client.get("/api/thumbnail", {"filepath": mesh_path, "size": 4096}).status_code, 400)
+
+
+class TestPlanView(TestCase):
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		rng = np.random.default_rng(11)
+		xy = rng.uniform(0, 10, size=(3000, 2))
+		self.rows = np.round(np.column_stack([xy, rng.uniform(0, 2, 3000), rng.integers(0, 100, 3000), np.zeros((3000, 3))]), 5)
+		self.file_path = write_pts(self.directory.name, self.rows)
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def test_rasters_match_brute_force(self):
+		"""Test that each cell holds the max z, mean intensity and count of its points."""
+		plan = build_plan_view(self.file_path, cell_size=1.0)
+		self.assertEqual((plan["width"], plan["height"]), (10, 10))
+		count = load_plan_raster(self.file_path, "count")
+		max_z = load_plan_raster(self.file_path, "max_z")
+		intensity = load_plan_raster(self.file_path, "intensity")
+		self.assertEqual(count.sum(), 3000)
+		x0, y1 = self.rows[:, 0].min(), self.rows[:, 1].max()
+		columns = np.minimum(((self.rows[:, 0] - x0) / 1.0).astype(int), 9)
+		rows = np.minimum(((y1 - self.rows[:, 1]) / 1.0).astype(int), 9)
+		inside = (rows == 2) & (columns == 7)
+		self.assertEqual(count[2, 7], inside.sum())
+		self.assertAlmostEqual(float(max_z[2, 7]), self.rows[inside, 2].max(), places=4)
+		self.assertAlmostEqual(float(intensity[2, 7]), self.rows[inside, 3].mean(), places=3)
+
+	def test_tile_pyramid_levels(self):
+		"""Test that level 0 is one tile and each level doubles the resolution up to the grid."""
+		plan = build_plan_view(self.file_path, cell_size=0.01, tile_size=256)
+		# Unas 1000 celdas por lado: 1000 -> 500 -> 250 celdas
+		self.assertEqual([level["tiles"] for level in plan["levels"]], [[1, 1], [2, 2], [4, 4]])
+		self.assertEqual(plan["levels"][-1]["width"], plan["width"])
+		self.assertAlmostEqual(plan["levels"][0]["cell_size"], 0.04)
+		tile = plan_tile_path(self.file_path, "height", 0, 0, 0)
+		level = plan["levels"][0]
+		self.assertEqual(decode_png(open(tile, "rb").read()).shape, (level["height"], level["width"], 4))
+		with self.assertRaises(KeyError):
+			plan_tile_path(self.file_path, "height", 0, 1, 0)
+
+	def test_plan_view_endpoint(self):
+		"""Test that the endpoint returns the description, PNG tiles and raw rasters."""
+		response = self.client.get("/api/point-cloud/plan", {"filepath": self.file_path, "cell_size": 0.5})
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.json()["plan"]["width"], 20)
+		self.assertEqual(load_plan_view(self.file_path, build=False)["cell_size"], 0.5)
+		response = self.client.get("/api/point-cloud/plan", {"filepath": self.file_path, "layer": "count", "level": 0, "x": 0, "y": 0})
+		self.assertEqual(response["Content-Type"], "image/png")
+		response = self.client.get("/api/point-cloud/plan", {"filepath": self.file_path, "raster": "count"})
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(self.client.get("/api/point-cloud/plan", {"filepath": self.file_path, "layer": "rgb", "level": 0, "x": 0, "y": 0}).status_code, 400)
+
+
+class TestAsyncEndpoints(TestCase):
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.file_path = write_pts(self.directory.name, sphere_rows())
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def test_offloader_caps_admitted_tasks(self):
+		"""Test that tasks over max_pending are rejected and slots are released when they finish."""
+		offloader = WorkOffloader(max_workers=1, max_pending=2)
+		release = threading.Event()
+
+		async def scenario():
+			first = asyncio.ensure_future(offloader.run(release.wait, 5))
+			second = asyncio.ensure_future(offloader.run(lambda: "second"))
+			await asyncio.sleep(0)
+			self.assertEqual(offloader.in_flight, 2)
+			with self.assertRaises(OffloadBusyError):
+				await offloader.run(lambda: "third")
+			release.set()
+			return await first, await second
+
+		self.assertEqual(asyncio.run(scenario()), (True, "second"))
+		self.assertEqual(offloader.in_flight, 0)
+		self.assertEqual(asyncio.run(offloader.run(sum, [1, 2])), 3)
+		offloader.shutdown()
+
+	async def test_cached_artifacts_are_streamed(self):
+		"""Test that cached thumbnails are streamed without using the heavy pool."""
+		response = await self.async_client.get("/api/async/thumbnail", {"filepath": self.file_path, "size": 32})
+		self.assertEqual(response.status_code, 200)
+		content = b"".join([chunk async for chunk in response.streaming_content])
+		self.assertEqual(decode_png(content).shape, (32, 32, 4))
+		self.assertEqual(int(response["Content-Length"]), len(content))
+		with patch("api.async_views.heavy_work.run") as run:
+			response = await self.async_client.get("/api/async/thumbnail", {"filepath": self.file_path, "size": 32})
+			run.assert_not_called()
+		self.assertEqual(b"".join([chunk async for chunk in response.streaming_content]), content)
+
+		response = await self.async_client.get("/api/async/point-cloud", {"filepath": self.file_path, "format": "bin"})
+		payload = b"".join([chunk async for chunk in response.streaming_content])
+		np.testing.assert_allclose(decode_points_binary(payload)["xyz"], load_point_cloud(self.file_path)[:, :3], atol=1e-5)
+
+	async def test_point_encoding_runs_in_the_heavy_pool(self):
+		"""Test that JSON and qbin point payloads are encoded through the heavy pool, not on the event loop."""
+		with patch("api.async_views.heavy_work.run", wraps=heavy_work.run) as run:
+			response = await self.async_client.get("/api/async/point-cloud", {"filepath": self.file_path})
+			self.assertEqual(len(response.json()["point_clouds"][0]["point_cloud"]), len(sphere_rows()))
+			self.assertIn(json.dumps, [call.args[0] for call in run.call_args_list])
+			run.reset_mock()
+			response = await self.async_client.get("/api/async/point-cloud", {"filepath": self.file_path, "format": "qbin"})
+			xyz, _, _ = decode_points_quantized(response.content)
+			self.assertEqual(len(xyz), len(sphere_rows()))
+			self.assertIn(encode_points_quantized, [call.args[0] for call in run.call_args_list])
+
+	async def test_busy_process_returns_503(self):
+		"""Test that heavy requests are refused with Retry-After when the process is at its cap."""
+		with patch("api.async_views.heavy_work._admit", side_effect=OffloadBusyError("busy")):
+			response = await self.async_client.get("/api/async/point-cloud", {"filepath": self.file_path})
+			self.assertEqual(response.status_code, 503)
+			self.assertIn("Retry-After", response)
+			response = await self.async_client.post(
+				"/api/async/point-cloud", {"filepath": self.file_path, "algorithm": "poisson"}, content_type="application/json"
+			)
+			self.assertEqual(response.status_code, 503)
+		response = await self.async_client.get("/api/async/point-cloud", {"filepath": self.file_path})
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(len(response.json()["point_clouds"][0]["point_cloud"]), len(sphere_rows()))
+
+
+class TestMetrics(TestCase):
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.file_path = write_pts(self.directory.name, sphere_rows())
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def test_registry_renders_prometheus_text(self):
+		"""Test that counters and span histograms are exposed, and nothing is recorded when disabled."""
+		registry = metrics.MetricsRegistry(buckets=(0.1, 1.0))
+		registry.increment("cache_requests_total", cache="points", result="hit")
+		registry.increment("cache_requests_total", 2, cache="points", result="hit")
+		registry.observe("stage_seconds", 0.5, stage="poisson")
+		text = registry.render()
+		self.assertIn('# TYPE pointcloud_cache_requests_total counter', text)
+		self.assertIn('pointcloud_cache_requests_total{cache="points",result="hit"} 3', text)
+		self.assertIn('pointcloud_stage_seconds_bucket{stage="poisson",le="0.1"} 0', text)
+		self.assertIn('pointcloud_stage_seconds_bucket{stage="poisson",le="1"} 1', text)
+		self.assertIn('pointcloud_stage_seconds_count{stage="poisson"} 1', text)
+
+		before = metrics.registry.counter("cache_requests_total", cache="points", result="miss")
+		with patch("api.utils.metrics.METRICS_ENABLED", False):
+			with metrics.span("load_point_cloud"):
+				load_point_cloud(self.file_path, use_cache=True)
+		self.assertEqual(metrics.registry.counter("cache_requests_total", cache="points", result="miss"), before)
+
+	def test_request_log_line_and_metrics_endpoint(self):
+		"""Test that a request logs its stages and cache lookups and that /metrics exposes them."""
+		with self.assertLogs("api.requests", level="INFO") as logs:
+			self.client.get("/api/test/point-cloud", {"filepath": self.file_path})
+			self.client.get("/api/test/point-cloud", {"filepath": self.file_path})
+		first, second = (json.loads(line.split(":", 2)[2]) for line in logs.output)
+		self.assertEqual((first["path"], first["status"]), ("/api/test/point-cloud", 200))
+		self.assertIn("parse_pts", first["spans"])
+		self.assertEqual(first["counters"]["cache_requests_total{cache=points,result=miss}"], 1)
+		self.assertNotIn("parse_pts", second["spans"])
+		self.assertEqual(second["counters"]["points_processed_total{stage=load_point_cloud}"], len(sphere_rows()))
+
+		response = self.client.get("/metrics")
+		self.assertEqual(response.status_code, 200)
+		text = response.content.decode()
+		self.assertIn('pointcloud_stage_seconds_count{stage="load_point_cloud"}', text)
+		self.assertIn('pointcloud_http_requests_total{method="GET",status="200"}', text)
+		self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="10.0.0.5").status_code, 403)
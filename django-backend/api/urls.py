@@ -1,9 +1,25 @@
 from django.urls import path
-from .views import PointCloudView, Mesh3DView, PointCloudBackendView, Mesh3DBackendView
+from . import async_views
+from .views import PointCloudView, Mesh3DView, PointCloudBackendView, Mesh3DBackendView, PointCloudLODView, PointCloudPlanView, Mesh3DLODView, ThumbnailView, MeshJobView, MeshJobDetailView, MeshJobResultView, MeshJobCancelView
 
 urlpatterns = [
   path("point-cloud", PointCloudBackendView.as_view()),
 	path("3d-mesh", Mesh3DBackendView.as_view()),
   path("test/point-cloud", PointCloudView.as_view()),
   path("test/3d-mesh", Mesh3DView.as_view()),
+  path("point-cloud/lod", PointCloudLODView.as_view()),
+  path("point-cloud/plan", PointCloudPlanView.as_view()),
+  path("3d-mesh/lod", Mesh3DLODView.as_view()),
+  path("thumbnail", ThumbnailView.as_view()),
+  path("3d-mesh/jobs", MeshJobView.as_view()),
+  path("3d-mesh/jobs/<uuid:job_id>", MeshJobDetailView.as_view()),
+  path("3d-mesh/jobs/<uuid:job_id>/result", MeshJobResultView.as_view()),
+  path("3d-mesh/jobs/<uuid:job_id>/cancel", MeshJobCancelView.as_view()),
+  # Versiones asíncronas (ASGI), ver api/async_views.py
+  path("async/point-cloud", async_views.point_cloud_view),
+  path("async/3d-mesh", async_views.mesh_3d_view),
+  path("async/point-cloud/lod", async_views.point_cloud_lod_view),
+  path("async/point-cloud/plan", async_views.point_cloud_plan_view),
+  path("async/3d-mesh/lod", async_views.mesh_3d_lod_view),
+  path("async/thumbnail", async_views.thumbnail_view),
 ]
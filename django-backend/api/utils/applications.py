@@ -1,5 +1,5 @@
 '''
-#POSIBLES FUNCIONES PARA EL PROCESAMIENTO DE NUBES DE PUNTOS
+#FUNCIONES PARA EL PROCESAMIENTO DE NUBES DE PUNTOS
 #Eliminacion de outliers
 
 cl, ind = cloud.remove_statistical_outlier(nb_neighbors=20, std_ratio=2.0)
@@ -15,4 +15,142 @@ cloud.estimate_normals(search_param=o3d.geometry.KDTreeSearchParamHybrid(radius=
 plane_model, inliers = cloud.segment_plane(distance_threshold=0.01, ransac_n=3, num_iterations=1000)
 plane_cloud = cloud.select_by_index(inliers)
 
-'''
\ No newline at end of file
+Estas funciones se aplican como etapas de preprocesamiento entre generate_cloud y las
+funciones create_*_mesh (ver preprocess_cloud). Cada solicitud elige sus etapas, en orden:
+
+	[{"stage": "remove_statistical_outlier"}, {"stage": "voxel_down_sample", "voxel_size": 0.03}]
+'''
+import hashlib
+import json
+import time
+
+import open3d as o3d
+
+from .metrics import span
+
+# Etapas de preprocesamiento disponibles y sus parámetros por defecto
+PREPROCESSING_STAGES = {
+	"remove_statistical_outlier": {"nb_neighbors": 20, "std_ratio": 2.0},
+	"voxel_down_sample": {"voxel_size": 0.05},
+	"estimate_normals": {"radius": 0.1, "max_nn": 30},
+	"segment_plane": {"distance_threshold": 0.01, "ransac_n": 3, "num_iterations": 1000, "invert": False},
+}
+
+# Etapas cuyo resultado cambia entre ejecuciones (segment_plane usa RANSAC): la nube que
+# producen no se puede identificar por sus parámetros, así que nada derivado de ella se cachea
+NONDETERMINISTIC_STAGES = ("segment_plane",)
+
+
+class UnknownStageError(ValueError):
+	"""Raised when a preprocessing stage or one of its parameters is not recognized."""
+	pass
+
+
+def remove_statistical_outlier(cloud, nb_neighbors, std_ratio):
+	# Eliminación de outliers: puntos cuya distancia media a sus vecinos se aleja de la media global
+	cl, ind = cloud.remove_statistical_outlier(nb_neighbors=nb_neighbors, std_ratio=std_ratio)
+	return cloud.select_by_index(ind)
+
+
+def voxel_down_sample(cloud, voxel_size):
+	# Un punto (el promedio) por vóxel de lado voxel_size
+	return cloud.voxel_down_sample(voxel_size=voxel_size)
+
+
+def estimate_normals(cloud, radius, max_nn):
+	cloud.estimate_normals(search_param=o3d.geometry.KDTreeSearchParamHybrid(radius=radius, max_nn=max_nn))
+	return cloud
+
+
+def segment_plane(cloud, distance_threshold, ransac_n, num_iterations, invert):
+	# Conserva el plano dominante (o todo excepto él, con invert, p. ej. para quitar el suelo)
+	plane_model, inliers = cloud.segment_plane(
+		distance_threshold=distance_threshold, ransac_n=ransac_n, num_iterations=num_iterations
+	)
+	return cloud.select_by_index(inliers, invert=invert)
+
+
+STAGE_FUNCTIONS = {
+	"remove_statistical_outlier": remove_statistical_outlier,
+	"voxel_down_sample": voxel_down_sample,
+	"estimate_normals": estimate_normals,
+	"segment_plane": segment_plane,
+}
+
+
+def _coerce(default, value):
+	if isinstance(default, bool) and isinstance(value, str):
+		return value.strip().lower() in ("1", "true", "yes")
+	return type(default)(value)
+
+
+def preprocessing_stages(stages):
+	"""
+	Validates a list of preprocessing stages and fills in their default parameters.
+
+	Args:
+		stages (list): Stage names or dicts {"stage": name, **params}.
+
+	Returns:
+		list: [{"stage": name, "params": {...}}] with every parameter set.
+
+	Raises:
+		UnknownStageError: If a stage or a parameter is not recognized.
+	"""
+	normalized = []
+	for spec in stages or []:
+		spec = {"stage": spec} if isinstance(spec, str) else dict(spec)
+		name = spec.pop("stage", None)
+		if name not in PREPROCESSING_STAGES:
+			raise UnknownStageError(f"Unknown preprocessing stage: {name}")
+		# Se aceptan los parámetros tanto en "params" como al nivel de la etapa
+		overrides = {**spec.pop("params", {}), **spec}
+		defaults = PREPROCESSING_STAGES[name]
+		params = dict(defaults)
+		for key, value in overrides.items():
+			if key not in defaults:
+				raise UnknownStageError(f"Unknown parameter for {name}: {key}")
+			params[key] = _coerce(defaults[key], value)
+		normalized.append({"stage": name, "params": params})
+	return normalized
+
+
+def preprocessing_signature(stages):
+	"""Returns a short stable identifier of a normalized list of stages ("" when empty)."""
+	if not stages:
+		return ""
+	return hashlib.sha256(json.dumps(stages, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def preprocess_cloud(cloud, stages):
+	"""
+	Applies preprocessing stages to an Open3D point cloud, in order.
+
+	Args:
+		cloud (o3d.geometry.PointCloud): Input cloud.
+		stages (list): Stages as accepted by preprocessing_stages.
+
+	Returns:
+		tuple: (cloud, report) where report has one dict per stage with "stage", "params",
+		"points_before", "points_after" and "seconds".
+	"""
+	report = []
+	for stage in preprocessing_stages(stages):
+		points_before = len(cloud.points)
+		start = time.perf_counter()
+		with span(f"preprocess_{stage['stage']}"):
+			cloud = STAGE_FUNCTIONS[stage["stage"]](cloud, **stage["params"])
+		seconds = time.perf_counter() - start
+		report.append({
+			**stage,
+			"points_before": points_before,
+			"points_after": len(cloud.points),
+			"seconds": round(seconds, 4),
+		})
+		print(f"Preprocesamiento {stage['stage']}: {points_before} -> {len(cloud.points)} puntos en {seconds:.2f}s")
+	return cloud, report
+
+
+def is_deterministic(stages):
+	"""Whether a normalized list of stages always produces the same cloud from the same input."""
+	return not any(stage["stage"] in NONDETERMINISTIC_STAGES for stage in stages or [])
@@ -0,0 +1,198 @@
+import glob
+import hashlib
+import os
+import re
+import shutil
+import threading
+import time
+
+import numpy as np
+
+# Caché de artefactos derivados de un archivo de entrada (nubes de puntos binarias, índices, etc.).
+# Cada artefacto se guarda junto al archivo original, en el directorio ".pts_cache", salvo que
+# la variable de entorno POINT_CLOUD_CACHE_DIR indique un directorio común.
+# El nombre de cada artefacto incluye el tamaño y la fecha de modificación del archivo de entrada,
+# de modo que una modificación del archivo invalida automáticamente sus artefactos.
+
+CACHE_DIR_NAME = ".pts_cache"
+# Digest SHA-256 memoizado válido (ver file_digest)
+DIGEST_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+
+def file_signature(file_path):
+	"""
+	Returns the (size, mtime_ns) pair that identifies the current version of a file.
+
+	Raises:
+		OSError: If the file cannot be stat'ed.
+	"""
+	stat = os.stat(file_path)
+	return stat.st_size, stat.st_mtime_ns
+
+
+def cache_dir(file_path):
+	"""Returns the directory holding the cached artifacts of file_path."""
+	directory = os.path.dirname(os.path.abspath(file_path))
+	root = os.environ.get("POINT_CLOUD_CACHE_DIR")
+	if root:
+		# Un subdirectorio por directorio de origen evita colisiones entre archivos homónimos
+		return os.path.join(root, hashlib.sha1(directory.encode()).hexdigest()[:16])
+	return os.path.join(directory, CACHE_DIR_NAME)
+
+
+def cache_path(file_path, kind, extension):
+	"""
+	Returns the cache path of an artifact of file_path.
+
+	Args:
+		file_path (str): Source file the artifact is derived from.
+		kind (str): Artifact name, e.g. "points-float64".
+		extension (str): File extension including the dot, e.g. ".npy".
+
+	Raises:
+		OSError: If file_path cannot be stat'ed.
+	"""
+	size, mtime_ns = file_signature(file_path)
+	name = f"{os.path.basename(file_path)}.{size}-{mtime_ns}.{kind}{extension}"
+	return os.path.join(cache_dir(file_path), name)
+
+
+def remove_stale(file_path, kind, extension):
+	"""Deletes artifacts (files or directories) of file_path of the given kind built from older versions of the file."""
+	current = cache_path(file_path, kind, extension)
+	pattern = os.path.join(
+		glob.escape(cache_dir(file_path)), f"{glob.escape(os.path.basename(file_path))}.*.{kind}{extension}"
+	)
+	for path in glob.glob(pattern):
+		if path != current:
+			try:
+				if os.path.isdir(path):
+					shutil.rmtree(path)
+				else:
+					os.remove(path)
+			except OSError:
+				pass
+
+
+def temporary_path(path):
+	"""
+	Returns a sibling of path to build an artifact into before moving it in place.
+
+	The name is unique per process, thread and call, so concurrent builds of the same
+	artifact (e.g. two request threads of one server process) never share it.
+	"""
+	return f"{path}.tmp-{os.getpid()}-{threading.get_ident()}-{time.monotonic_ns()}"
+
+
+def publish_directory(temporary, destination, is_current):
+	"""
+	Moves a fully built directory into place without deleting the existing one first.
+
+	If destination already exists because a concurrent build published it first and
+	is_current(destination) is true, that copy is kept and temporary is discarded.
+	An outdated destination (older format or parameters) is renamed aside and then
+	replaced, so readers never see a partially deleted directory. Between the two
+	renames destination briefly does not exist; readers treat that like any missing
+	artifact (a cache miss), the same as before the first build.
+
+	Args:
+		temporary (str): Directory built with temporary_path(destination).
+		destination (str): Final path of the directory.
+		is_current (callable): is_current(path) tells whether an existing directory is usable.
+
+	Returns:
+		bool: True if temporary was published, False if a current concurrent build was kept.
+
+	Raises:
+		OSError: If temporary could not be published and no current directory is in place.
+	"""
+	try:
+		os.replace(temporary, destination)
+		return True
+	except OSError:
+		if not os.path.isdir(destination):
+			raise
+	if is_current(destination):
+		shutil.rmtree(temporary, ignore_errors=True)
+		return False
+
+	outdated = temporary_path(destination)
+	try:
+		os.replace(destination, outdated)
+	except OSError:
+		# Otra llamada ya lo reemplazó
+		pass
+	try:
+		os.replace(temporary, destination)
+		return True
+	except OSError:
+		# Solo se descarta si otra llamada publicó entre tanto una copia vigente
+		if os.path.isdir(destination) and is_current(destination):
+			shutil.rmtree(temporary, ignore_errors=True)
+			return False
+		raise
+	finally:
+		shutil.rmtree(outdated, ignore_errors=True)
+
+
+def save_array(path, array):
+	"""
+	Writes array to path in .npy format atomically.
+
+	The data is written to a temporary file in the same directory and then renamed,
+	so concurrent readers never see a partially written file.
+	"""
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+	temporary = temporary_path(path)
+	try:
+		with open(temporary, "wb") as f:
+			np.save(f, array)
+		os.replace(temporary, path)
+	finally:
+		if os.path.exists(temporary):
+			os.remove(temporary)
+
+
+def load_array(path):
+	"""Memory-maps a cached .npy file read-only, or returns None if it does not exist."""
+	if not os.path.exists(path):
+		return None
+	return np.load(path, mmap_mode="r")
+
+
+def file_digest(file_path, block_size=4 * 1024 * 1024):
+	"""
+	Returns the SHA-256 hex digest of a file's content.
+
+	The digest is memoized in the cache under the file's (size, mtime) key, so it is
+	only recomputed when the file changes. The memo is written atomically, and a memo
+	that is not a valid digest is ignored and rewritten.
+	"""
+	memo = cache_path(file_path, "sha256", ".txt")
+	try:
+		with open(memo) as f:
+			value = f.read().strip()
+		if DIGEST_PATTERN.fullmatch(value):
+			return value
+	except OSError:
+		pass
+
+	digest = hashlib.sha256()
+	with open(file_path, "rb") as f:
+		for block in iter(lambda: f.read(block_size), b""):
+			digest.update(block)
+	value = digest.hexdigest()
+
+	temporary = temporary_path(memo)
+	try:
+		os.makedirs(os.path.dirname(memo), exist_ok=True)
+		with open(temporary, "w") as f:
+			f.write(value)
+		os.replace(temporary, memo)
+		remove_stale(file_path, "sha256", ".txt")
+	except OSError:
+		pass
+	finally:
+		if os.path.exists(temporary):
+			os.remove(temporary)
+	return value
@@ -0,0 +1,209 @@
+import json
+import struct
+
+import numpy as np
+
+# Mallas en formato glTF binario (.glb), escritas y leídas con numpy.
+#
+# Un .glb es una cabecera de 12 bytes seguida de un fragmento JSON (la descripción de la
+# escena) y un fragmento BIN con los buffers de la malla. Las mallas se guardan como un único
+# primitivo de triángulos indexado:
+#   POSITION   float32 x 3
+#   NORMAL     float32 x 3           (si la malla tiene normales de vértice)
+#   COLOR_0    uint8 x 4 normalizado (si la malla tiene colores de vértice; alfa = 255)
+#   índices    uint32
+# Los buffers se copian tal cual al archivo y se leen sin interpretar texto, de modo que
+# escribir y leer una malla grande es varias veces más rápido que con .obj, y el archivo
+# ocupa unas 3 a 5 veces menos. El navegador lo carga directamente con GLTFLoader.
+#
+# Open3D escribe .glb, pero no puede volver a leer sus propios archivos, por eso el formato
+# se implementa aquí.
+
+GLB_MAGIC = b"glTF"
+GLB_VERSION = 2
+GLB_HEADER = struct.Struct("<4sII")
+GLB_CHUNK = struct.Struct("<II")
+CHUNK_JSON = 0x4E4F534A
+CHUNK_BIN = 0x004E4942
+
+# Tipos de componente y de accesor de glTF
+COMPONENT_TYPES = {
+	5120: np.int8,
+	5121: np.uint8,
+	5122: np.int16,
+	5123: np.uint16,
+	5125: np.uint32,
+	5126: np.float32,
+}
+ACCESSOR_SIZES = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4}
+
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+TRIANGLES = 4
+
+
+class InvalidGLBError(ValueError):
+	"""Raised when a file is not a binary glTF mesh this module can read."""
+	pass
+
+
+def _pad(data, fill):
+	return data + fill * (-len(data) % 4)
+
+
+def encode_glb(vertices, triangles, normals=None, colors=None):
+	"""
+	Encodes an indexed triangle mesh as binary glTF.
+
+	Args:
+		vertices (np.ndarray): (V, 3) vertex positions.
+		triangles (np.ndarray): (T, 3) vertex indices.
+		normals (np.ndarray, optional): (V, 3) vertex normals.
+		colors (np.ndarray, optional): (V, 3) vertex colors in [0, 1].
+
+	Returns:
+		bytes: The .glb file content.
+	"""
+	vertices = np.ascontiguousarray(vertices, dtype="<f4")
+	buffers = [(vertices, 5126, "VEC3", ARRAY_BUFFER)]
+	attributes = {"POSITION": 0}
+	if normals is not None and len(normals):
+		attributes["NORMAL"] = len(buffers)
+		buffers.append((np.ascontiguousarray(normals, dtype="<f4"), 5126, "VEC3", ARRAY_BUFFER))
+	if colors is not None and len(colors):
+		rgba = np.full((len(colors), 4), 255, dtype=np.uint8)
+		rgba[:, :3] = np.clip(np.rint(np.asarray(colors) * 255), 0, 255)
+		attributes["COLOR_0"] = len(buffers)
+		buffers.append((rgba, 5121, "VEC4", ARRAY_BUFFER))
+	indices = len(buffers)
+	buffers.append((np.ascontiguousarray(triangles, dtype="<u4").reshape(-1), 5125, "SCALAR", ELEMENT_ARRAY_BUFFER))
+
+	binary = bytearray()
+	buffer_views, accessors = [], []
+	for index, (array, component_type, accessor_type, target) in enumerate(buffers):
+		buffer_views.append({"buffer": 0, "byteOffset": len(binary), "byteLength": array.nbytes, "target": target})
+		binary += _pad(array.tobytes(), b"\0")
+		accessor = {
+			"bufferView": index,
+			"componentType": component_type,
+			"count": len(array),
+			"type": accessor_type,
+		}
+		if component_type == 5121:
+			accessor["normalized"] = True
+		accessors.append(accessor)
+	# POSITION requiere los límites de la malla
+	accessors[0]["min"] = vertices.min(axis=0).tolist() if len(vertices) else [0.0, 0.0, 0.0]
+	accessors[0]["max"] = vertices.max(axis=0).tolist() if len(vertices) else [0.0, 0.0, 0.0]
+
+	document = {
+		"asset": {"version": "2.0", "generator": "django-backend"},
+		"scene": 0,
+		"scenes": [{"nodes": [0]}],
+		"nodes": [{"mesh": 0}],
+		"meshes": [{"primitives": [{"attributes": attributes, "indices": indices, "mode": TRIANGLES}]}],
+		"buffers": [{"byteLength": len(binary)}],
+		"bufferViews": buffer_views,
+		"accessors": accessors,
+	}
+	content = _pad(json.dumps(document, separators=(",", ":")).encode("utf-8"), b" ")
+	length = GLB_HEADER.size + 2 * GLB_CHUNK.size + len(content) + len(binary)
+	return b"".join([
+		GLB_HEADER.pack(GLB_MAGIC, GLB_VERSION, length),
+		GLB_CHUNK.pack(len(content), CHUNK_JSON), content,
+		GLB_CHUNK.pack(len(binary), CHUNK_BIN), bytes(binary),
+	])
+
+
+def _read_accessor(document, binary, index):
+	accessor = document["accessors"][index]
+	if "bufferView" not in accessor or "sparse" in accessor:
+		raise InvalidGLBError("Sparse or empty accessors are not supported.")
+	view = document["bufferViews"][accessor["bufferView"]]
+	if view.get("buffer", 0) != 0:
+		raise InvalidGLBError("Only the embedded binary buffer is supported.")
+	dtype = np.dtype(COMPONENT_TYPES[accessor["componentType"]]).newbyteorder("<")
+	size = ACCESSOR_SIZES[accessor["type"]]
+	count = accessor["count"]
+	offset = view.get("byteOffset", 0) + accessor.get("byteOffset", 0)
+	stride = view.get("byteStride") or dtype.itemsize * size
+	if count and offset + stride * (count - 1) + dtype.itemsize * size > len(binary):
+		raise InvalidGLBError("Accessor out of the binary buffer.")
+	values = np.ndarray((count, size), dtype=dtype, buffer=binary, offset=offset, strides=(stride, dtype.itemsize))
+	if accessor.get("normalized"):
+		return values / np.float64(np.iinfo(dtype).max)
+	return values
+
+
+def decode_glb(data):
+	"""
+	Decodes the triangle primitives of a binary glTF file into one indexed mesh.
+
+	Node transforms and materials are ignored; all triangle primitives of all meshes are
+	merged.
+
+	Args:
+		data (bytes): The .glb file content.
+
+	Returns:
+		dict: "vertices" (V, 3) float64, "triangles" (T, 3) int32 and, when present,
+		"normals" (V, 3) and "colors" (V, 3) float64 arrays.
+
+	Raises:
+		InvalidGLBError: If data is not a supported binary glTF mesh.
+	"""
+	if len(data) < GLB_HEADER.size + GLB_CHUNK.size:
+		raise InvalidGLBError("File too short for a GLB header.")
+	magic, version, _ = GLB_HEADER.unpack_from(data)
+	if magic != GLB_MAGIC or version != GLB_VERSION:
+		raise InvalidGLBError("Not a glTF 2.0 binary file.")
+
+	document, binary = None, b""
+	offset = GLB_HEADER.size
+	while offset + GLB_CHUNK.size <= len(data):
+		length, chunk_type = GLB_CHUNK.unpack_from(data, offset)
+		chunk = data[offset + GLB_CHUNK.size:offset + GLB_CHUNK.size + length]
+		if chunk_type == CHUNK_JSON:
+			document = json.loads(bytes(chunk).decode("utf-8"))
+		elif chunk_type == CHUNK_BIN:
+			binary = chunk
+		offset += GLB_CHUNK.size + length
+	if document is None:
+		raise InvalidGLBError("GLB file without a JSON chunk.")
+
+	parts = {"vertices": [], "triangles": [], "normals": [], "colors": []}
+	vertex_count = 0
+	try:
+		for mesh in document.get("meshes", []):
+			for primitive in mesh["primitives"]:
+				if primitive.get("mode", TRIANGLES) != TRIANGLES:
+					continue
+				attributes = primitive["attributes"]
+				vertices = _read_accessor(document, binary, attributes["POSITION"])
+				if "indices" in primitive:
+					indices = _read_accessor(document, binary, primitive["indices"]).reshape(-1)
+				else:
+					indices = np.arange(len(vertices))
+				parts["vertices"].append(vertices.astype(np.float64))
+				parts["triangles"].append(indices.astype(np.int64).reshape(-1, 3) + vertex_count)
+				if "NORMAL" in attributes:
+					parts["normals"].append(_read_accessor(document, binary, attributes["NORMAL"]).astype(np.float64))
+				if "COLOR_0" in attributes:
+					parts["colors"].append(_read_accessor(document, binary, attributes["COLOR_0"])[:, :3].astype(np.float64))
+				vertex_count += len(vertices)
+	except InvalidGLBError:
+		raise
+	except (KeyError, IndexError, TypeError, ValueError) as e:
+		raise InvalidGLBError(f"Malformed glTF document: {e}")
+
+	if not parts["vertices"]:
+		raise InvalidGLBError("GLB file without triangle meshes.")
+	mesh = {
+		"vertices": np.concatenate(parts["vertices"]),
+		"triangles": np.concatenate(parts["triangles"]).astype(np.int32),
+	}
+	# Normales y colores solo si todos los primitivos los tienen
+	for name in ("normals", "colors"):
+		if len(parts[name]) == len(parts["vertices"]):
+			mesh[name] = np.concatenate(parts[name])
+	return mesh
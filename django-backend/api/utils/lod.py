@@ -0,0 +1,194 @@
+import json
+import os
+import re
+import shutil
+
+import numpy as np
+
+from .cache import cache_path, publish_directory, remove_stale, temporary_path
+from .metrics import record_cache, timed
+from .point_cloud import load_point_cloud
+
+# Jerarquía de niveles de detalle (LOD) de una nube de puntos, al estilo de Potree.
+#
+# Cada nodo del octree guarda una submuestra espacialmente uniforme de los puntos de su
+# cubo (un punto por celda de una grilla de LOD_GRID_SIZE^3); los puntos no seleccionados
+# bajan a los 8 hijos. La raíz contiene entonces una versión gruesa de toda la nube y cada
+# nivel agrega detalle, de modo que un visor puede dibujar la raíz de inmediato y pedir
+# solo los nodos visibles a medida que se mueve la cámara.
+#
+# Los nodos se identifican como en Potree: "r" es la raíz y cada dígito (0-7) agrega un
+# octante, con bits (x, y, z) = (4, 2, 1). La jerarquía se guarda en la caché del archivo
+# (ver api/utils/cache.py) como un directorio con hierarchy.json y un <id>.npy por nodo. Los
+# puntos de cada nodo se guardan en float32 con x, y, z relativas al origen del nodo (esquina
+# mínima de su bbox), lo que conserva la precisión de coordenadas georreferenciadas grandes.
+
+LOD_NODE_CAPACITY = 50_000
+LOD_GRID_SIZE = 128
+LOD_MAX_DEPTH = 12
+LOD_VERSION = 2
+
+NODE_ID_PATTERN = re.compile(r"^r[0-7]*$")
+
+
+def lod_dir(file_path):
+	"""Returns the cache directory of the LOD hierarchy of file_path."""
+	return cache_path(file_path, "lod", "")
+
+
+def _sample_node(points, indices, origin, size, grid_size, capacity, rng):
+	"""Splits indices into (kept, remaining): one random point per grid cell, at most capacity."""
+	cells = np.floor((points[indices, :3] - origin) * (grid_size / size)).astype(np.int64)
+	np.clip(cells, 0, grid_size - 1, out=cells)
+	keys = (cells[:, 0] * grid_size + cells[:, 1]) * grid_size + cells[:, 2]
+	# Los índices ya están barajados: la primera aparición de cada celda es un punto al azar
+	_, first = np.unique(keys, return_index=True)
+	if len(first) > capacity:
+		first = rng.choice(first, capacity, replace=False)
+	keep = np.zeros(len(indices), dtype=bool)
+	keep[first] = True
+	return indices[keep], indices[~keep]
+
+
+@timed("build_lod_octree")
+def build_lod_octree(file_path, point_cloud=None, node_capacity=LOD_NODE_CAPACITY,
+	grid_size=LOD_GRID_SIZE, max_depth=LOD_MAX_DEPTH, seed=0):
+	"""
+	Builds and persists the LOD octree of a point cloud file.
+
+	Args:
+		file_path (str): Path to the point cloud file.
+		point_cloud (np.ndarray, optional): Already loaded data of file_path.
+		node_capacity (int): Maximum number of points stored per node.
+		grid_size (int): Sampling grid resolution per node and axis.
+		max_depth (int): Depth at which nodes keep all their remaining points.
+		seed (int): Seed of the random subsampling, for reproducible trees.
+
+	Returns:
+		dict: The hierarchy (see load_lod_hierarchy).
+	"""
+	if point_cloud is None:
+		point_cloud = load_point_cloud(file_path)
+	rng = np.random.default_rng(seed)
+
+	bbox_min = point_cloud[:, :3].min(axis=0) if len(point_cloud) else np.zeros(3)
+	bbox_max = point_cloud[:, :3].max(axis=0) if len(point_cloud) else np.zeros(3)
+	size = float(max(np.max(bbox_max - bbox_min), 1e-9))
+	intensity = point_cloud[:, 3]
+
+	destination = lod_dir(file_path)
+	temporary = temporary_path(destination)
+	os.makedirs(temporary)
+
+	nodes = {}
+	stack = [("r", rng.permutation(len(point_cloud)), bbox_min.astype(np.float64), size, 0)]
+	try:
+		while stack:
+			node_id, indices, origin, node_size, depth = stack.pop()
+			if len(indices) <= node_capacity or depth >= max_depth:
+				kept, remaining = indices, indices[:0]
+			else:
+				kept, remaining = _sample_node(point_cloud, indices, origin, node_size, grid_size, node_capacity, rng)
+
+			points = np.array(point_cloud[np.sort(kept)], dtype=np.float64)
+			points[:, :3] -= origin
+			np.save(os.path.join(temporary, f"{node_id}.npy"), points.astype(np.float32))
+			node = {
+				"points": int(len(kept)),
+				"bbox": [origin.tolist(), (origin + node_size).tolist()],
+				"children": [],
+			}
+			nodes[node_id] = node
+
+			if len(remaining):
+				half = node_size / 2
+				center = origin + half
+				xyz = point_cloud[remaining, :3]
+				octants = (
+					(xyz[:, 0] >= center[0]).astype(np.int64) * 4
+					+ (xyz[:, 1] >= center[1]) * 2
+					+ (xyz[:, 2] >= center[2])
+				)
+				order = np.argsort(octants, kind="stable")
+				bounds = np.searchsorted(octants[order], np.arange(9))
+				for octant in range(8):
+					child = remaining[order[bounds[octant]:bounds[octant + 1]]]
+					if len(child):
+						child_origin = origin + half * np.array([(octant >> 2) & 1, (octant >> 1) & 1, octant & 1])
+						node["children"].append(f"{node_id}{octant}")
+						stack.append((f"{node_id}{octant}", child, child_origin, half, depth + 1))
+
+		hierarchy = {
+			"version": LOD_VERSION,
+			"points": int(len(point_cloud)),
+			"bbox": [bbox_min.tolist(), bbox_max.tolist()],
+			"intensity_range": [float(intensity.min()), float(intensity.max())] if len(intensity) else [0.0, 0.0],
+			"node_capacity": node_capacity,
+			"nodes": nodes,
+		}
+		with open(os.path.join(temporary, "hierarchy.json"), "w") as f:
+			json.dump(hierarchy, f)
+
+		publish_directory(temporary, destination, lambda path: _read_hierarchy(path) is not None)
+	finally:
+		shutil.rmtree(temporary, ignore_errors=True)
+	remove_stale(file_path, "lod", "")
+	print(f"Jerarquía LOD de {file_path}: {len(nodes)} nodos")
+	return hierarchy
+
+
+def _read_hierarchy(directory):
+	"""Returns the hierarchy stored in directory, or None if it is missing or from another LOD_VERSION."""
+	try:
+		with open(os.path.join(directory, "hierarchy.json")) as f:
+			hierarchy = json.load(f)
+	except (OSError, ValueError):
+		return None
+	return hierarchy if hierarchy.get("version") == LOD_VERSION else None
+
+
+def load_lod_hierarchy(file_path, build=True):
+	"""
+	Returns the LOD hierarchy of file_path, building it first if needed.
+
+	The hierarchy is a dict with the total point count, the bounding box, the global
+	intensity range and "nodes": {id: {"points", "bbox", "children"}}.
+
+	Returns:
+		dict: The hierarchy, or None when it does not exist and build is False.
+	"""
+	hierarchy = _read_hierarchy(lod_dir(file_path))
+	if hierarchy is not None:
+		record_cache("lod", True)
+		return hierarchy
+	record_cache("lod", False)
+	return build_lod_octree(file_path) if build else None
+
+
+def load_lod_node(file_path, node_id, hierarchy=None):
+	"""
+	Reads the points of one LOD node.
+
+	Args:
+		file_path (str): Path to the point cloud file.
+		node_id (str): Node id, e.g. "r04".
+		hierarchy (dict, optional): Already loaded hierarchy of file_path.
+
+	Returns:
+		np.ndarray: (n, 7) float64 array of the node points, with absolute coordinates.
+
+	Raises:
+		KeyError: If the hierarchy has not been built or has no such node.
+	"""
+	if not NODE_ID_PATTERN.match(node_id or ""):
+		raise KeyError(f"Invalid LOD node id: {node_id}")
+	if hierarchy is None:
+		hierarchy = load_lod_hierarchy(file_path, build=False)
+	if hierarchy is None or node_id not in hierarchy["nodes"]:
+		raise KeyError(f"LOD node not found: {node_id}")
+	path = os.path.join(lod_dir(file_path), f"{node_id}.npy")
+	if not os.path.exists(path):
+		raise KeyError(f"LOD node not found: {node_id}")
+	points = np.load(path).astype(np.float64)
+	points[:, :3] += hierarchy["nodes"][node_id]["bbox"][0]
+	return points
@@ -1,5 +1,14 @@
+import os
+import time
+
+import numpy as np
 import open3d as o3d
-import matplotlib.pyplot as plt
+
+from .cache import temporary_path
+from .colormap import apply_colormap
+from .gltf import decode_glb, encode_glb
+from .metrics import increment, span, timed
+from .point_cloud import to_vector3d
 
 # Mallas tridimensionales: Representación digital de una superficie 3D compuesta por vértices, aristas y caras, típicamente en forma de triángulos o polígonos. Estas mallas se utilizan en gráficos por computadora, modelado 3D, simulaciones físicas y análisis estructural.
 # Atributos particulares:
@@ -9,21 +18,83 @@ import matplotlib.pyplot as plt
 # - Normales: Vectores perpendiculares a las caras o vértices, utilizados para cálculos de iluminación y sombreado.
 # - Texturas: Imágenes aplicadas a la superficie de la malla para añadir detalles visuales.
 
+# Formatos de archivo de mallas: .obj (texto) y .glb (glTF binario, ver api/utils/gltf.py)
+MESH_FORMATS = ("obj", "glb")
+MESH_CONTENT_TYPES = {"obj": "model/obj", "glb": "model/gltf-binary"}
+
+
 #Funciones de utilidad mallas 3D
 def is_3d_mesh(file_path):
 	file_type = file_path.split(".")[-1]
-	return file_type == "obj"
+	return file_type in MESH_FORMATS
 
 
+def mesh_format(file_path):
+	"""Returns the mesh format of a file path ("obj" or "glb")."""
+	return file_path.split(".")[-1]
+
+
+@timed("load_3d_mesh")
 def load_3d_mesh(file_path):
 	if not is_3d_mesh(file_path):
 		raise ValueError("Unsupported file format")
-	mesh = o3d.io.read_triangle_mesh(file_path)
+	if mesh_format(file_path) == "glb":
+		with open(file_path, "rb") as f:
+			data = decode_glb(f.read())
+		mesh = o3d.geometry.TriangleMesh()
+		mesh.vertices = to_vector3d(data["vertices"])
+		mesh.triangles = o3d.utility.Vector3iVector(data["triangles"])
+		if "normals" in data:
+			mesh.vertex_normals = to_vector3d(data["normals"])
+		if "colors" in data:
+			mesh.vertex_colors = to_vector3d(data["colors"])
+	else:
+		mesh = o3d.io.read_triangle_mesh(file_path)
 	if not mesh.has_vertices():
 		raise ValueError("Failed to load mesh or mesh is empty")
+	increment("bytes_total", os.path.getsize(file_path), direction="read", format=mesh_format(file_path))
 	return mesh
 
 
+def save_mesh(mesh, output_path):
+	"""
+    Guarda una malla en el formato indicado por la extensión de output_path.
+
+    Los archivos .glb se escriben con api/utils/gltf.py (posiciones y normales float32,
+    colores uint8 e índices uint32); los demás formatos, con Open3D.
+
+    Parámetros
+    ----------
+    mesh : o3d.geometry.TriangleMesh
+        La malla a guardar.
+    output_path : str
+        Ruta del archivo de salida.
+    """
+	with span("save_mesh"):
+		_write_mesh(mesh, output_path)
+	increment("bytes_total", os.path.getsize(output_path), direction="written", format=mesh_format(output_path))
+
+
+def _write_mesh(mesh, output_path):
+	if mesh_format(output_path) == "glb":
+		# Se escribe a un archivo temporal y se renombra, como los demás artefactos
+		temporary = temporary_path(output_path)
+		try:
+			with open(temporary, "wb") as f:
+				f.write(encode_glb(
+					np.asarray(mesh.vertices),
+					np.asarray(mesh.triangles),
+					np.asarray(mesh.vertex_normals) if mesh.has_vertex_normals() else None,
+					np.asarray(mesh.vertex_colors) if mesh.has_vertex_colors() else None,
+				))
+			os.replace(temporary, output_path)
+		finally:
+			if os.path.exists(temporary):
+				os.remove(temporary)
+	elif not o3d.io.write_triangle_mesh(output_path, mesh):
+		raise OSError(f"Failed to write mesh: {output_path}")
+
+
 def mesh_3d_info(mesh):
 	info = {
 		"vertices": len(mesh.vertices),
@@ -41,7 +112,7 @@ def plot_3d_mesh(mesh):
 	o3d.visualization.draw_geometries([mesh], window_name="3D Mesh")
 
 
-def create_delaunay_mesh(cloud, file_path, alpha=1.0):
+def create_delaunay_mesh(cloud, file_path, alpha=1.0, output_path=None):
     """
     Crea una malla tridimensional utilizando el algoritmo de triangulación de Delaunay
     a partir de una nube de puntos.
@@ -56,6 +127,8 @@ def create_delaunay_mesh(cloud, file_path, alpha=1.0):
     alpha : float, opcional
         Valor de alpha para el algoritmo de forma alpha utilizado en la triangulación de Delaunay.
         Un valor menor crea una malla más ajustada alrededor de los puntos. El valor predeterminado es 1.0.
+    output_path : str, opcional
+        Ruta donde guardar la malla. Por defecto se usa file_path con "_delaunay.obj".
 
     Retorna
     -------
@@ -75,21 +148,23 @@ def create_delaunay_mesh(cloud, file_path, alpha=1.0):
       las normales de los vértices, lo que significa que las propiedades visuales, como iluminación y sombreados, 
       no se renderizan correctamente. Este comando calcula las normales para cada vértice, mejorando así la 
       representación visual de la malla.
-    - La malla se guarda en formato .obj con un nombre modificado basado en la ruta del archivo de entrada.
+    - La malla se guarda con `save_mesh`, en formato .obj con un nombre modificado basado en la ruta del
+      archivo de entrada, o en el formato de la extensión de output_path (p. ej. .glb).
     """
-    delaunay_mesh = (o3d.geometry.TriangleMesh.create_from_point_cloud_alpha_shape(cloud, alpha=alpha))
+    with span("alpha_shape"):
+        delaunay_mesh = (o3d.geometry.TriangleMesh.create_from_point_cloud_alpha_shape(cloud, alpha=alpha))
     delaunay_mesh.compute_vertex_normals()
     # o3d.visualization.draw_geometries(
     #     [delaunay_mesh], window_name="Malla - Triangulación Delaunay"
     # )
-    output_delaunay = file_path.replace(".pts", "_delaunay.obj")
-    o3d.io.write_triangle_mesh(output_delaunay, delaunay_mesh)
+    output_delaunay = output_path or file_path.replace(".pts", "_delaunay.obj")
+    save_mesh(delaunay_mesh, output_delaunay)
     print(f"Malla Delaunay guardada en: {output_delaunay}")
     return delaunay_mesh, output_delaunay
 
 
 
-def create_poisson_mesh(cloud, file_path, radius=0.1, max_nn=30, depth=9):
+def create_poisson_mesh(cloud, file_path, radius=0.1, max_nn=30, depth=9, output_path=None, postprocess=None):
 	"""
     Crea una malla tridimensional utilizando el algoritmo de reconstrucción por Poisson
     a partir de una nube de puntos.
@@ -110,6 +185,12 @@ def create_poisson_mesh(cloud, file_path, radius=0.1, max_nn=30, depth=9):
     depth : int, opcional
         La profundidad de la octree utilizada en la reconstrucción de Poisson. Este parámetro
         controla el nivel de detalle de la malla generada. El valor predeterminado es 9.
+    output_path : str, opcional
+        Ruta donde guardar la malla. Por defecto se usa file_path con "_poisson.obj".
+    postprocess : callable, opcional
+        Función aplicada a la malla antes de calcular sus normales y guardarla (p. ej.
+        `simplify_poisson_mesh`). Recibe la malla y las densidades de sus vértices y retorna
+        la malla resultante.
 
     Retorna
     -------
@@ -117,42 +198,151 @@ def create_poisson_mesh(cloud, file_path, radius=0.1, max_nn=30, depth=9):
         Una tupla que contiene:
         - poisson_mesh (o3d.geometry.TriangleMesh): La malla generada mediante el algoritmo de Poisson.
         - output_poisson (str): La ruta del archivo donde se guardó la malla.
-        - densities (numpy.ndarray): Las densidades calculadas en cada vértice de la malla.
+        - densities (numpy.ndarray): Las densidades calculadas en cada vértice de la malla,
+          antes del postprocesamiento.
 
     Notas
     -----
     - Antes de generar la malla, se calculan las normales de la nube de puntos utilizando 
       `cloud.estimate_normals()`. Esto es esencial para que el algoritmo de Poisson funcione 
-      correctamente, ya que requiere normales bien definidas.
+      correctamente, ya que requiere normales bien definidas. Si la nube ya tiene normales
+      (por ejemplo, obtenidas con `estimate_cloud_normals` desde la caché) se usan tal cual.
     - El comando `o3d.geometry.TriangleMesh.create_from_point_cloud_poisson` genera una malla
       detallada basada en un modelo implícito de la superficie. El parámetro `depth` controla el
       nivel de detalle -> un valor más alto produce una malla más detallada pero también más pesada.
     - El cálculo de las normales con `poisson_mesh.compute_vertex_normals()` mejora la visualización
       de la malla generada al definir propiedades como iluminación y sombreado.
-    - El archivo resultante se guarda en formato .obj con un nombre modificado basado en la ruta del archivo de entrada.
+    - El archivo resultante se guarda con `save_mesh`, en formato .obj con un nombre modificado basado en la
+      ruta del archivo de entrada, o en el formato de la extensión de output_path (p. ej. .glb).
     """
-	# Calcula las normales para la nube de puntos
-	cloud.estimate_normals(
-		search_param=o3d.geometry.KDTreeSearchParamHybrid(radius=radius, max_nn=max_nn)
-	)
+	# Calcula las normales para la nube de puntos, salvo que ya vengan calculadas (p. ej. desde la caché)
+	if not cloud.has_normals():
+		cloud.estimate_normals(
+			search_param=o3d.geometry.KDTreeSearchParamHybrid(radius=radius, max_nn=max_nn)
+		)
 
 	# Genera la malla con el algoritmo de Poisson
-	poisson_mesh, densities = (
-		o3d.geometry.TriangleMesh.create_from_point_cloud_poisson(
-			cloud, depth=depth
+	with span("poisson"):
+		poisson_mesh, densities = (
+			o3d.geometry.TriangleMesh.create_from_point_cloud_poisson(
+				cloud, depth=depth
+			)
 		)
-	)
+	densities = np.asarray(densities)
+	if postprocess is not None:
+		poisson_mesh = postprocess(poisson_mesh, densities)
 	poisson_mesh.compute_vertex_normals()
 	#o3d.visualization.draw_geometries(
 	#	[poisson_mesh], window_name="Malla - Reconstrucción por Poisson"
 	#)
-	output_poisson = file_path.replace(".pts", "_poisson.obj")
-	o3d.io.write_triangle_mesh(output_poisson, poisson_mesh)
+	output_poisson = output_path or file_path.replace(".pts", "_poisson.obj")
+	save_mesh(poisson_mesh, output_poisson)
 	print(f"Malla Poisson guardada en: {output_poisson}")
 	return poisson_mesh, output_poisson, densities
 
 
-def create_threshold_mesh(point_cloud, file_path, normalized_intensity, threshold = 0.5, alpha=1.0):
+def _mesh_stage(stage, params, mesh, start, vertices_before, triangles_before):
+	return {
+		"stage": stage,
+		"params": params,
+		"vertices_before": vertices_before,
+		"vertices_after": len(mesh.vertices),
+		"triangles_before": triangles_before,
+		"triangles_after": len(mesh.triangles),
+		"seconds": round(time.perf_counter() - start, 4),
+	}
+
+
+def trim_low_density(mesh, densities, density_quantile):
+	"""
+    Elimina los vértices de menor densidad de una malla de Poisson.
+
+    Poisson cierra la superficie también donde no hay puntos (p. ej. los "globos" que cubren
+    los bordes abiertos de un escaneo); esos vértices tienen densidad baja, ya que se apoyan en
+    pocos puntos de la nube.
+
+    Parámetros
+    ----------
+    mesh : o3d.geometry.TriangleMesh
+        Malla generada por `create_from_point_cloud_poisson`. Se modifica en el lugar.
+    densities : numpy.ndarray
+        Densidad de cada vértice de la malla.
+    density_quantile : float
+        Fracción de los vértices, de menor densidad, que se elimina (0 no elimina ninguno).
+
+    Retorna
+    -------
+    dict
+        Reporte de la etapa: vértices y triángulos antes y después, y duración en segundos.
+    """
+	start = time.perf_counter()
+	vertices_before, triangles_before = len(mesh.vertices), len(mesh.triangles)
+	if density_quantile > 0 and len(densities):
+		mesh.remove_vertices_by_mask(densities < np.quantile(densities, density_quantile))
+		mesh.remove_unreferenced_vertices()
+	return _mesh_stage("density_trim", {"density_quantile": density_quantile}, mesh, start, vertices_before, triangles_before)
+
+
+def decimate_mesh(mesh, target_triangles=0, max_error=0.0):
+	"""
+    Reduce el número de triángulos de una malla por decimación cuadrática.
+
+    Parámetros
+    ----------
+    mesh : o3d.geometry.TriangleMesh
+        Malla de entrada.
+    target_triangles : int, opcional
+        Número de triángulos buscado (0 = sin objetivo, solo se limita por max_error).
+    max_error : float, opcional
+        Error cuadrático máximo de cada colapso de arista (0 = sin límite). Con ambos
+        parámetros en 0 la malla no se modifica.
+
+    Retorna
+    -------
+    tuple
+        - mesh (o3d.geometry.TriangleMesh): La malla decimada (o la misma malla de entrada).
+        - report (dict): Reporte de la etapa, como en `trim_low_density`.
+    """
+	start = time.perf_counter()
+	vertices_before, triangles_before = len(mesh.vertices), len(mesh.triangles)
+	if (target_triangles > 0 and target_triangles < triangles_before) or max_error > 0:
+		mesh = mesh.simplify_quadric_decimation(
+			target_number_of_triangles=max(target_triangles, 0),
+			maximum_error=max_error if max_error > 0 else np.inf,
+		)
+	params = {"target_triangles": target_triangles, "max_error": max_error}
+	return mesh, _mesh_stage("decimation", params, mesh, start, vertices_before, triangles_before)
+
+
+def simplify_poisson_mesh(mesh, densities, density_quantile=0.0, target_triangles=0, max_error=0.0):
+	"""
+    Postprocesamiento de una malla de Poisson: recorte por densidad y luego decimación.
+
+    Parámetros
+    ----------
+    mesh : o3d.geometry.TriangleMesh
+        Malla generada por `create_from_point_cloud_poisson`.
+    densities : numpy.ndarray
+        Densidad de cada vértice de la malla.
+    density_quantile, target_triangles, max_error
+        Ver `trim_low_density` y `decimate_mesh`.
+
+    Retorna
+    -------
+    tuple
+        - mesh (o3d.geometry.TriangleMesh): La malla simplificada.
+        - report (list): Reporte de cada etapa (recorte y decimación), en orden.
+    """
+	trim_report = trim_low_density(mesh, densities, density_quantile)
+	mesh, decimation_report = decimate_mesh(mesh, target_triangles, max_error)
+	print(
+		f"Malla Poisson simplificada: {trim_report['triangles_before']} -> "
+		f"{decimation_report['triangles_after']} triángulos"
+	)
+	return mesh, [trim_report, decimation_report]
+
+
+def create_threshold_mesh(point_cloud, file_path, normalized_intensity, threshold = 0.5, alpha=1.0, output_path=None, preprocess=None):
 	"""
     Genera una malla tridimensional aplicando un filtro de umbrales a una nube de puntos.
     La malla resultante se crea a partir de puntos que cumplen un criterio de intensidad.
@@ -173,6 +363,11 @@ def create_threshold_mesh(point_cloud, file_path, normalized_intensity, threshol
         Parámetro de la forma alpha utilizado para la generación de la malla. Controla cuán ajustada es
         la malla a los puntos. Valores más bajos producen mallas más detalladas. El valor predeterminado
         es 1.0.
+    output_path : str, opcional
+        Ruta donde guardar la malla. Por defecto se usa file_path con "_threshold.obj".
+    preprocess : callable, opcional
+        Función aplicada a la nube filtrada antes de generar la malla (p. ej. las etapas de
+        `preprocess_cloud`). Recibe y retorna un o3d.geometry.PointCloud.
 
     Retorna
     -------
@@ -185,39 +380,42 @@ def create_threshold_mesh(point_cloud, file_path, normalized_intensity, threshol
     -----
     - El filtrado de puntos se realiza mediante un valor de umbral aplicado a las intensidades normalizadas.
       Solo los puntos cuya intensidad sea mayor al valor definido se consideran para la malla.
-    - Se utiliza la paleta de colores "inferno" para asignar colores a los puntos filtrados. Esto facilita
-      la visualización de las intensidades.
+    - Se utiliza la paleta de colores "inferno" (ver api/utils/colormap.py) sobre las intensidades
+      normalizadas para asignar colores a los puntos filtrados. Esto facilita la visualización de las intensidades.
     - El comando `o3d.geometry.TriangleMesh.create_from_point_cloud_alpha_shape` genera una malla 3D
       para los puntos filtrados. El parámetro `alpha` controla la densidad y ajuste de la malla generada.
     - El cálculo de las normales con `threshold_mesh.compute_vertex_normals()` define las propiedades de
       iluminación y sombreado de la malla para mejorar su visualización.
-    - El archivo resultante se guarda en formato .obj, con un nombre modificado basado en la ruta de entrada.
+    - El archivo resultante se guarda con `save_mesh`, en formato .obj con un nombre modificado basado en la
+      ruta de entrada, o en el formato de la extensión de output_path (p. ej. .glb).
     """
 	print("Generando malla con Algoritmos de Umbrales...")
 	#threshold = 0.5  # Define un umbral basado en la intensidad
 	mask = normalized_intensity > threshold
-	filtered_points = point_cloud[mask]
-	
-	# Aplica la paleta inferno
-	cmap = plt.cm.inferno
+	# Solo se copian las coordenadas de los puntos filtrados, ya contiguas
+	filtered_points = point_cloud[mask, :3]
 
-	# Crear nube filtrada
+	# Crear nube filtrada, coloreada con la paleta inferno según la intensidad normalizada
 	filtered_cloud = o3d.geometry.PointCloud()
-	filtered_cloud.points = o3d.utility.Vector3dVector(filtered_points[:, :3])
-	filtered_cloud.colors = o3d.utility.Vector3dVector(
-		cmap(filtered_points[:, 3])[:, :3]
+	filtered_cloud.points = to_vector3d(filtered_points)
+	filtered_cloud.colors = to_vector3d(
+		apply_colormap(normalized_intensity[mask], "inferno", np.float64)
 	)
 
+	if preprocess is not None:
+		filtered_cloud = preprocess(filtered_cloud)
+
 	# Crear malla Alpha Shape para puntos filtrados
-	threshold_mesh = o3d.geometry.TriangleMesh.create_from_point_cloud_alpha_shape(
-		filtered_cloud, alpha=alpha
-	)
+	with span("alpha_shape"):
+		threshold_mesh = o3d.geometry.TriangleMesh.create_from_point_cloud_alpha_shape(
+			filtered_cloud, alpha=alpha
+		)
 	threshold_mesh.compute_vertex_normals()
 	#o3d.visualization.draw_geometries(
 	#	[threshold_mesh], window_name="Malla - Umbral"
 	#)
-	threshold_output = file_path.replace(".pts", "_threshold.obj")
-	o3d.io.write_triangle_mesh(threshold_output, threshold_mesh)
+	threshold_output = output_path or file_path.replace(".pts", "_threshold.obj")
+	save_mesh(threshold_mesh, threshold_output)
 	print(f"Malla por Umbral guardada en: {threshold_output}")
 	return threshold_mesh, threshold_output
 
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+from .cache import file_digest, temporary_path
+
+# Caché de mallas generadas, direccionada por contenido.
+#
+# Cada resultado se identifica por el hash del contenido del archivo de entrada, el algoritmo
+# y el conjunto completo de parámetros, y se guarda en su propio directorio <clave>/ con la
+# malla y un entry.json con sus metadatos. Una solicitud idéntica reutiliza el resultado, y
+# dos conjuntos de parámetros distintos nunca escriben el mismo archivo.
+#
+# La caché es una sola para todos los escaneos: MESH_CACHE_DIR, o "meshes" dentro de
+# POINT_CLOUD_CACHE_DIR, o ~/.cache/pointcloud/meshes. Su tamaño total se limita a
+# MESH_CACHE_MAX_BYTES; al superarlo se eliminan las entradas usadas hace más tiempo (LRU,
+# según la fecha de modificación de entry.json, que se actualiza en cada acierto). Las
+# entradas usadas en los últimos MESH_CACHE_GRACE_SECONDS no se eliminan, aunque la caché
+# quede por un momento sobre el límite: otra solicitud puede estar leyéndolas.
+
+MESH_CACHE_VERSION = 1
+MESH_CACHE_MAX_BYTES = int(os.environ.get("MESH_CACHE_MAX_BYTES") or 5 * 1024 ** 3)
+MESH_CACHE_GRACE_SECONDS = float(os.environ.get("MESH_CACHE_GRACE_SECONDS") or 300)
+ENTRY_FILE = "entry.json"
+
+
+def mesh_cache_root():
+	"""Returns the mesh cache directory, shared by every scan (see the module comment)."""
+	if os.environ.get("MESH_CACHE_DIR"):
+		return os.environ["MESH_CACHE_DIR"]
+	if os.environ.get("POINT_CLOUD_CACHE_DIR"):
+		return os.path.join(os.environ["POINT_CLOUD_CACHE_DIR"], "meshes")
+	return os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "pointcloud", "meshes")
+
+
+def mesh_cache_key(file_path, algorithm, params):
+	"""Returns the cache key of a mesh: hash of input content, algorithm and full parameter set."""
+	description = {
+		"version": MESH_CACHE_VERSION,
+		"input": file_digest(file_path),
+		"algorithm": algorithm,
+		"params": params,
+	}
+	return hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()
+
+
+def find_cached_mesh(file_path, key):
+	"""
+	Returns the entry of a cached mesh, or None on a miss.
+
+	The entry is a dict with at least "output" (path of the mesh file) and "mesh_info".
+	A hit refreshes the entry's position in the LRU order.
+	"""
+	entry_path = os.path.join(mesh_cache_root(), key, ENTRY_FILE)
+	try:
+		with open(entry_path) as f:
+			entry = json.load(f)
+	except (OSError, ValueError):
+		return None
+	if not os.path.exists(entry["output"]):
+		return None
+	os.utime(entry_path)
+	return entry
+
+
+def store_cached_mesh(file_path, key, build, metadata=None):
+	"""
+	Builds a mesh into a new cache entry.
+
+	Args:
+		file_path (str): Input point cloud file.
+		key (str): Cache key from mesh_cache_key.
+		build (callable): build(directory) writes the mesh inside directory and returns
+			(mesh, output_path, mesh_info).
+		metadata (dict, optional): Extra fields stored in the entry.
+
+	Returns:
+		tuple: (mesh, entry) with the paths of the entry pointing to its final location.
+	"""
+	root = mesh_cache_root()
+	final = os.path.join(root, key)
+	temporary = temporary_path(final)
+	os.makedirs(temporary)
+	try:
+		mesh, output, mesh_info = build(temporary)
+		entry = {
+			**(metadata or {}),
+			"key": key,
+			"input": file_path,
+			"output": os.path.join(final, os.path.relpath(output, temporary)),
+			"mesh_info": mesh_info,
+		}
+		with open(os.path.join(temporary, ENTRY_FILE), "w") as f:
+			json.dump(entry, f)
+		try:
+			os.replace(temporary, final)
+		except OSError:
+			# Otra solicitud guardó el mismo resultado primero; se conserva esa entrada
+			pass
+	finally:
+		shutil.rmtree(temporary, ignore_errors=True)
+	evict_mesh_cache(root, keep=key)
+	return mesh, entry
+
+
+def _directory_size(path):
+	total = 0
+	for directory, _, files in os.walk(path):
+		for name in files:
+			try:
+				total += os.path.getsize(os.path.join(directory, name))
+			except OSError:
+				pass
+	return total
+
+
+def evict_mesh_cache(root, max_bytes=None, keep=None, grace_seconds=None):
+	"""
+	Deletes the least recently used entries of a mesh cache until it fits in max_bytes.
+
+	keep and the entries used in the last grace_seconds are never deleted.
+	"""
+	max_bytes = MESH_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+	grace_seconds = MESH_CACHE_GRACE_SECONDS if grace_seconds is None else grace_seconds
+	recent = time.time() - grace_seconds
+	entries = []
+	for name in os.listdir(root):
+		entry_path = os.path.join(root, name, ENTRY_FILE)
+		if os.path.exists(entry_path):
+			entries.append((os.path.getmtime(entry_path), _directory_size(os.path.join(root, name)), name))
+
+	total = sum(size for _, size, _ in entries)
+	for used, size, name in sorted(entries):
+		if total <= max_bytes or used > recent:
+			break
+		if name == keep:
+			continue
+		shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+		total -= size
+		print(f"Malla eliminada de la caché: {name}")
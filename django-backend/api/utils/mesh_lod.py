@@ -0,0 +1,136 @@
+import json
+import os
+import re
+import shutil
+
+from .cache import cache_path, publish_directory, remove_stale, temporary_path
+from .metrics import record_cache, timed
+from .mesh_3d import decimate_mesh, load_3d_mesh, mesh_format, save_mesh
+
+# Pirámide de niveles de detalle (LOD) de una malla.
+#
+# El nivel 0 es la malla original; cada nivel siguiente tiene unas MESH_LOD_RATIO veces menos
+# triángulos que el anterior, obtenido por decimación cuadrática (ver decimate_mesh) del nivel
+# previo, hasta bajar de MESH_LOD_MIN_TRIANGLES. Un visor puede mostrar de inmediato el nivel
+# más grueso y pedir los niveles más detallados solo cuando hacen falta.
+#
+# La pirámide se guarda en la caché de la malla (ver api/utils/cache.py) como un directorio
+# "mesh-lod" con pyramid.json y un <nivel>.<formato> por nivel decimado, en el formato de la
+# malla original (.obj o .glb); el nivel 0 se sirve desde el archivo original. Las mallas
+# generadas construyen su pirámide al guardarse (ver api/utils/reconstruction.py) y las
+# indexadas en el catálogo, al calcular sus metadatos (ver api/utils/metadata.py), ambas con
+# la malla ya cargada; las demás, en la primera consulta a 3d-mesh/lod.
+
+MESH_LOD_RATIO = 4
+MESH_LOD_MIN_TRIANGLES = 5_000
+MESH_LOD_MAX_LEVELS = 8
+MESH_LOD_VERSION = 1
+
+LEVEL_PATTERN = re.compile(r"^[0-9]+$")
+
+
+def mesh_lod_dir(file_path):
+	"""Returns the cache directory of the LOD pyramid of the mesh file_path."""
+	return cache_path(file_path, "mesh-lod", "")
+
+
+def _level_info(level, mesh, path):
+	return {
+		"level": level,
+		"vertices": len(mesh.vertices),
+		"triangles": len(mesh.triangles),
+		"bytes": os.path.getsize(path),
+	}
+
+
+@timed("build_mesh_lod")
+def build_mesh_lod(file_path, mesh=None, ratio=MESH_LOD_RATIO, min_triangles=MESH_LOD_MIN_TRIANGLES,
+	max_levels=MESH_LOD_MAX_LEVELS):
+	"""
+	Builds and persists the LOD pyramid of a mesh file.
+
+	Args:
+		file_path (str): Path to the mesh file (level 0).
+		mesh (o3d.geometry.TriangleMesh, optional): Already loaded mesh of file_path.
+		ratio (int): Triangle reduction factor between consecutive levels.
+		min_triangles (int): No further level is built once a level has fewer triangles.
+		max_levels (int): Maximum number of levels, level 0 included.
+
+	Returns:
+		dict: The pyramid (see load_mesh_lod).
+	"""
+	if mesh is None:
+		mesh = load_3d_mesh(file_path)
+
+	destination = mesh_lod_dir(file_path)
+	temporary = temporary_path(destination)
+	os.makedirs(temporary)
+	try:
+		levels = [_level_info(0, mesh, file_path)]
+		current = mesh
+		while len(levels) < max_levels and len(current.triangles) >= min_triangles:
+			target = len(current.triangles) // ratio
+			current, _ = decimate_mesh(current, target_triangles=target)
+			if len(current.triangles) == 0 or len(current.triangles) >= levels[-1]["triangles"]:
+				break
+			current.compute_vertex_normals()
+			path = os.path.join(temporary, f"{len(levels)}.{mesh_format(file_path)}")
+			save_mesh(current, path)
+			levels.append(_level_info(len(levels), current, path))
+
+		pyramid = {"version": MESH_LOD_VERSION, "ratio": ratio, "levels": levels}
+		with open(os.path.join(temporary, "pyramid.json"), "w") as f:
+			json.dump(pyramid, f)
+
+		publish_directory(temporary, destination, lambda path: _read_pyramid(path) is not None)
+	finally:
+		shutil.rmtree(temporary, ignore_errors=True)
+	remove_stale(file_path, "mesh-lod", "")
+	print(f"Pirámide LOD de {file_path}: {[level['triangles'] for level in levels]} triángulos")
+	return pyramid
+
+
+def _read_pyramid(directory):
+	"""Returns the pyramid stored in directory, or None if it is missing or from another MESH_LOD_VERSION."""
+	try:
+		with open(os.path.join(directory, "pyramid.json")) as f:
+			pyramid = json.load(f)
+	except (OSError, ValueError):
+		return None
+	return pyramid if pyramid.get("version") == MESH_LOD_VERSION else None
+
+
+def load_mesh_lod(file_path, build=True):
+	"""
+	Returns the LOD pyramid of a mesh file, building it first if needed.
+
+	The pyramid is a dict with the reduction "ratio" and "levels": a list, from the full
+	mesh (level 0) to the coarsest one, of {"level", "vertices", "triangles", "bytes"}.
+
+	Returns:
+		dict: The pyramid, or None when it does not exist and build is False.
+	"""
+	pyramid = _read_pyramid(mesh_lod_dir(file_path))
+	if pyramid is not None:
+		record_cache("mesh_lod", True)
+		return pyramid
+	record_cache("mesh_lod", False)
+	return build_mesh_lod(file_path) if build else None
+
+
+def mesh_lod_path(file_path, level):
+	"""
+	Returns the path of the mesh file of one pyramid level.
+
+	Raises:
+		KeyError: If the pyramid has not been built or has no such level.
+	"""
+	level = str(level)
+	if not LEVEL_PATTERN.match(level):
+		raise KeyError(f"Invalid mesh LOD level: {level}")
+	if int(level) == 0:
+		return file_path
+	path = os.path.join(mesh_lod_dir(file_path), f"{int(level)}.{mesh_format(file_path)}")
+	if not os.path.exists(path):
+		raise KeyError(f"Mesh LOD level not found: {level}")
+	return path
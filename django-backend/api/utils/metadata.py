@@ -0,0 +1,194 @@
+import json
+import os
+import threading
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from .cache import cache_path, file_signature, remove_stale, temporary_path
+from .point_cloud import is_point_cloud, streaming_point_cloud_info
+from .mesh_3d import is_3d_mesh, load_3d_mesh
+from .mesh_lod import build_mesh_lod, load_mesh_lod
+from .workers import default_workers, process_pool
+
+# Metadatos livianos de los archivos de escaneo (nubes de puntos y mallas) para los listados.
+#
+# Los listados no retornan los datos de cada archivo sino un resumen: número de puntos o de
+# vértices, bounding box y estadísticas de intensidad. El resumen se guarda en la caché del
+# archivo (ver api/utils/cache.py) como "<archivo>.<tamaño>-<mtime>.metadata.json", de modo
+# que se recalcula solo cuando el archivo cambia. Los archivos sin resumen se procesan en
+# paralelo en un pool de METADATA_WORKERS procesos. Al calcular los metadatos de una malla se
+# construye también su pirámide LOD (ver api/utils/mesh_lod.py) con la malla ya cargada, de
+# modo que las consultas de la malla no la construyen.
+
+METADATA_VERSION = 1
+METADATA_WORKERS = int(os.environ.get("METADATA_WORKERS") or default_workers(limit=4))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def scan_routes(predicate):
+	"""Returns {variable: path} of the FARO* environment variables whose path satisfies predicate."""
+	return {key: value for key, value in os.environ.items() if "FARO" in key and predicate(value)}
+
+
+def _file_fields(file_path):
+	size, mtime_ns = file_signature(file_path)
+	return {"path": file_path, "size": size, "modified": mtime_ns / 1e9}
+
+
+def point_cloud_metadata(file_path):
+	"""
+	Computes the listing metadata of a point cloud file with bounded memory.
+
+	Returns:
+		dict: Path, size, modification time, point count, bounding box and intensity statistics.
+	"""
+	info = streaming_point_cloud_info(file_path)
+	return {
+		**_file_fields(file_path),
+		"points": info["numero_puntos"],
+		"bbox": [
+			[info["rango_x"][0], info["rango_y"][0], info["rango_z"][0]],
+			[info["rango_x"][1], info["rango_y"][1], info["rango_z"][1]],
+		],
+		"intensity": {
+			"min": info["rango_intensidad"][0],
+			"max": info["rango_intensidad"][1],
+			"mean": info["media_intensidad"],
+			"std": info["desviacion_estandar_intensidad"],
+		},
+	}
+
+
+def mesh_metadata(file_path):
+	"""
+	Computes the listing metadata of a mesh file, building its LOD pyramid if missing.
+
+	Returns:
+		dict: Path, size, modification time, vertex and triangle counts and bounding box.
+	"""
+	mesh = load_3d_mesh(file_path)
+	vertices = np.asarray(mesh.vertices)
+	if load_mesh_lod(file_path, build=False) is None:
+		try:
+			build_mesh_lod(file_path, mesh)
+		except (OSError, ValueError) as e:
+			print(f"No se pudo construir la pirámide LOD de {file_path}: {e}")
+	return {
+		**_file_fields(file_path),
+		"vertices": len(vertices),
+		"triangles": len(mesh.triangles),
+		"bbox": [vertices.min(axis=0).tolist(), vertices.max(axis=0).tolist()],
+	}
+
+
+def _metadata_function(file_path):
+	if is_point_cloud(file_path):
+		return point_cloud_metadata
+	if is_3d_mesh(file_path):
+		return mesh_metadata
+	raise ValueError(f"Unsupported file format: {file_path}")
+
+
+def cached_metadata(file_path):
+	"""Returns the cached metadata of file_path, or None if it is missing or out of date."""
+	try:
+		with open(cache_path(file_path, "metadata", ".json")) as f:
+			metadata = json.load(f)
+	except (OSError, ValueError):
+		return None
+	return metadata if metadata.get("version") == METADATA_VERSION else None
+
+
+def file_metadata(file_path):
+	"""
+	Returns the listing metadata of a point cloud or mesh file, from the cache when possible.
+
+	Raises:
+		ValueError: If the file format is not supported.
+		OSError: If the file cannot be read.
+	"""
+	metadata = cached_metadata(file_path)
+	if metadata is not None:
+		return metadata
+
+	metadata = {"version": METADATA_VERSION, **_metadata_function(file_path)(file_path)}
+	path = cache_path(file_path, "metadata", ".json")
+	temporary = temporary_path(path)
+	try:
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		with open(temporary, "w") as f:
+			json.dump(metadata, f)
+		os.replace(temporary, path)
+		remove_stale(file_path, "metadata", ".json")
+	except OSError as e:
+		print(f"No se pudo guardar la caché de metadatos de {file_path}: {e}")
+	finally:
+		if os.path.exists(temporary):
+			os.remove(temporary)
+	return metadata
+
+
+def _metadata_pool():
+	global _pool
+	with _pool_lock:
+		if _pool is None:
+			_pool = process_pool(METADATA_WORKERS)
+		return _pool
+
+
+def _discard_pool():
+	global _pool
+	with _pool_lock:
+		if _pool is not None:
+			_pool.shutdown(wait=False, cancel_futures=True)
+			_pool = None
+
+
+def batch_metadata(routes):
+	"""
+	Returns the listing metadata of several files, computing the missing ones in parallel.
+
+	Cached metadata is read in the calling process; the remaining files are processed in
+	the metadata process pool (or inline when only one is missing). A file that cannot be
+	read gets an "error" entry instead of failing the whole listing.
+
+	Args:
+		routes (dict): {key: path}, e.g. from scan_routes.
+
+	Returns:
+		list: One dict per route, in order, with "key" plus the metadata or "error".
+	"""
+	results = {}
+	missing = {}
+	for key, path in routes.items():
+		metadata = cached_metadata(path)
+		if metadata is not None:
+			results[key] = metadata
+		else:
+			missing[key] = path
+
+	# Con un solo archivo pendiente no se justifica iniciar el pool
+	if len(missing) > 1:
+		pool = _metadata_pool()
+		pending = {key: pool.submit(file_metadata, path) for key, path in missing.items()}
+		collect = lambda key: pending[key].result()
+	else:
+		collect = lambda key: file_metadata(missing[key])
+	for key in missing:
+		try:
+			results[key] = collect(key)
+		except BrokenProcessPool as e:
+			# Un proceso murió (p. ej. sin memoria): el pool se recrea en el próximo listado
+			_discard_pool()
+			results[key] = {"path": missing[key], "error": f"{type(e).__name__}: {e}"}
+		except Exception as e:
+			results[key] = {"path": missing[key], "error": f"{type(e).__name__}: {e}"}
+
+	listing = []
+	for key in routes:
+		metadata = {name: value for name, value in results[key].items() if name != "version"}
+		listing.append({"key": key, **metadata})
+	return listing
@@ -0,0 +1,193 @@
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# Métricas de las etapas de procesamiento, en el formato de texto de Prometheus.
+#
+# - span(stage) mide la duración de una etapa (carga, generate_cloud, normales, reconstrucción,
+#   escritura de la malla...) en el histograma pointcloud_stage_seconds{stage=...};
+#   @timed(stage) hace lo mismo para una función completa.
+# - increment(name, value, **labels) suma a un contador (puntos y bytes procesados).
+# - record_cache(cache, hit) cuenta los aciertos y fallos de cada caché de archivos derivados.
+#
+# Los valores se acumulan en el proceso y se exponen en /metrics (ver MetricsView). Además,
+# lo registrado durante una petición se acumula en su contexto (contextvars, que sync_to_async
+# y el pool de api/utils/offload.py propagan a sus hilos) y RequestMetricsMiddleware lo escribe
+# en una línea de log JSON por petición. Lo que corre en los pools de procesos (Poisson por
+# teselas, trabajos de mallas) no se reporta al proceso del servidor: se mide la etapa que
+# los engloba.
+#
+# Con METRICS_ENABLED=0 cada llamada retorna de inmediato sin tomar tiempos ni locks.
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+METRICS_PREFIX = "pointcloud"
+
+# Límites superiores (segundos) de los buckets de los histogramas de duración
+DURATION_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+_request_metrics = contextvars.ContextVar("request_metrics", default=None)
+
+
+def _label_key(labels):
+	return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _escape(value):
+	return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key, extra=()):
+	pairs = list(key) + list(extra)
+	if not pairs:
+		return ""
+	return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class MetricsRegistry:
+	"""Thread-safe counters and duration histograms of one process."""
+
+	def __init__(self, prefix=METRICS_PREFIX, buckets=DURATION_BUCKETS):
+		self.prefix = prefix
+		self.buckets = buckets
+		self._lock = threading.Lock()
+		self._counters = {}
+		self._histograms = {}
+		self._help = {}
+
+	def describe(self, name, text):
+		"""Sets the HELP text of a metric."""
+		self._help[name] = text
+
+	def increment(self, name, value=1, **labels):
+		"""Adds value to the counter name{labels}."""
+		key = (name, _label_key(labels))
+		with self._lock:
+			self._counters[key] = self._counters.get(key, 0) + value
+
+	def observe(self, name, value, **labels):
+		"""Records one observation of the histogram name{labels}."""
+		key = (name, _label_key(labels))
+		with self._lock:
+			histogram = self._histograms.get(key)
+			if histogram is None:
+				histogram = self._histograms[key] = {"buckets": [0] * len(self.buckets), "count": 0, "sum": 0.0}
+			for index, bound in enumerate(self.buckets):
+				if value <= bound:
+					histogram["buckets"][index] += 1
+			histogram["count"] += 1
+			histogram["sum"] += value
+
+	def counter(self, name, **labels):
+		"""Current value of the counter name{labels} (0 if never incremented)."""
+		with self._lock:
+			return self._counters.get((name, _label_key(labels)), 0)
+
+	def reset(self):
+		with self._lock:
+			self._counters.clear()
+			self._histograms.clear()
+
+	def render(self):
+		"""Returns the metrics in the Prometheus text exposition format (version 0.0.4)."""
+		with self._lock:
+			counters = sorted(self._counters.items())
+			histograms = sorted((key, dict(value, buckets=list(value["buckets"]))) for key, value in self._histograms.items())
+		lines = []
+		described = set()
+
+		def header(name, kind):
+			if name not in described:
+				described.add(name)
+				if name in self._help:
+					lines.append(f"# HELP {self.prefix}_{name} {self._help[name]}")
+				lines.append(f"# TYPE {self.prefix}_{name} {kind}")
+
+		for (name, key), value in counters:
+			header(name, "counter")
+			lines.append(f"{self.prefix}_{name}{_format_labels(key)} {value:g}")
+		for (name, key), histogram in histograms:
+			header(name, "histogram")
+			for bound, count in zip(self.buckets, histogram["buckets"]):
+				lines.append(f"{self.prefix}_{name}_bucket{_format_labels(key, [('le', f'{bound:g}')])} {count}")
+			lines.append(f"{self.prefix}_{name}_bucket{_format_labels(key, [('le', '+Inf')])} {histogram['count']}")
+			lines.append(f"{self.prefix}_{name}_sum{_format_labels(key)} {histogram['sum']:.6f}")
+			lines.append(f"{self.prefix}_{name}_count{_format_labels(key)} {histogram['count']}")
+		return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+registry.describe("stage_seconds", "Duration of the point cloud and mesh pipeline stages.")
+registry.describe("points_processed_total", "Points processed by each stage.")
+registry.describe("bytes_total", "Bytes of scan and mesh files read and written.")
+registry.describe("cache_requests_total", "Lookups of the derived-file caches by result.")
+registry.describe("http_requests_total", "HTTP requests by method and status code.")
+registry.describe("http_request_seconds", "Duration of the HTTP requests until the response is returned.")
+
+
+def begin_request():
+	"""Starts collecting the metrics of the current request. Returns a token for end_request."""
+	return _request_metrics.set({"spans": {}, "counters": {}})
+
+
+def end_request(token):
+	"""Stops collecting and returns {"spans": {stage: seconds}, "counters": {name: value}}."""
+	collected = _request_metrics.get()
+	_request_metrics.reset(token)
+	return collected
+
+
+def _collect(section, name, value):
+	collected = _request_metrics.get()
+	if collected is not None:
+		collected[section][name] = collected[section].get(name, 0) + value
+
+
+def increment(name, value=1, **labels):
+	"""Adds value to a process counter and to the current request."""
+	if not METRICS_ENABLED:
+		return
+	registry.increment(name, value, **labels)
+	suffix = ",".join(f"{label}={text}" for label, text in _label_key(labels))
+	_collect("counters", f"{name}{{{suffix}}}" if suffix else name, value)
+
+
+def record_cache(cache, hit):
+	"""Counts a hit or a miss of one of the derived-file caches."""
+	increment("cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+
+@contextmanager
+def span(stage, **labels):
+	"""
+	Measures the duration of a pipeline stage.
+
+	Args:
+		stage (str): Name of the stage, e.g. "load_point_cloud".
+		**labels: Extra labels of the histogram (e.g. algorithm).
+	"""
+	if not METRICS_ENABLED:
+		yield
+		return
+	start = time.perf_counter()
+	try:
+		yield
+	finally:
+		seconds = time.perf_counter() - start
+		registry.observe("stage_seconds", seconds, stage=stage, **labels)
+		_collect("spans", stage, seconds)
+
+
+def timed(stage):
+	"""Decorator measuring every call of a function as a span of the given stage."""
+	def decorator(function):
+		@wraps(function)
+		def wrapper(*args, **kwargs):
+			if not METRICS_ENABLED:
+				return function(*args, **kwargs)
+			with span(stage):
+				return function(*args, **kwargs)
+		return wrapper
+	return decorator
@@ -0,0 +1,130 @@
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from .workers import default_workers
+
+# Ejecución del trabajo pesado fuera del bucle de eventos de ASGI.
+#
+# Las vistas asíncronas (ver api/async_views.py) no deben bloquear el bucle: un solo proceso
+# de uvicorn atiende muchas peticiones livianas a la vez (listados, vistas previas, archivos
+# ya cacheados) mientras la lectura de archivos y la generación de mallas corren en un pool
+# acotado de OFFLOAD_WORKERS hilos (open3d y numpy liberan el GIL en sus operaciones largas).
+#
+# Cada proceso admite a lo sumo OFFLOAD_MAX_PENDING trabajos pesados entre los que corren y
+# los que esperan un hilo; por encima de ese límite se rechazan de inmediato (OffloadBusyError,
+# 503 en las vistas) en lugar de acumular peticiones que vencerían esperando. La admisión usa
+# un contador con lock y no un asyncio.Semaphore, para no quedar ligada a un bucle de eventos.
+#
+# Las lecturas cortas (fragmentos de archivos cacheados) usan el executor por defecto del
+# bucle y no cuentan para el límite.
+
+OFFLOAD_WORKERS = int(os.environ.get("OFFLOAD_WORKERS") or default_workers(limit=4))
+OFFLOAD_MAX_PENDING = int(os.environ.get("OFFLOAD_MAX_PENDING") or 4 * OFFLOAD_WORKERS)
+FILE_CHUNK_SIZE = 256 * 1024
+
+
+class OffloadBusyError(RuntimeError):
+	"""Raised when a process already holds its maximum number of heavy tasks."""
+	pass
+
+
+class WorkOffloader:
+	def __init__(self, max_workers=OFFLOAD_WORKERS, max_pending=OFFLOAD_MAX_PENDING):
+		self.max_workers = max_workers
+		self.max_pending = max(max_pending, max_workers)
+		self._lock = threading.Lock()
+		self._in_flight = 0
+		self._executor = None
+
+	@property
+	def in_flight(self):
+		"""Number of admitted tasks, running or waiting for a thread."""
+		return self._in_flight
+
+	def _admit(self):
+		with self._lock:
+			if self._in_flight >= self.max_pending:
+				raise OffloadBusyError(f"Too many heavy tasks in progress ({self._in_flight}).")
+			self._in_flight += 1
+			if self._executor is None:
+				self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="offload")
+
+	def _release(self, _=None):
+		with self._lock:
+			self._in_flight -= 1
+
+	async def run(self, function, *args, **kwargs):
+		"""
+		Runs a blocking function in the bounded thread pool and awaits its result.
+
+		The slot is released when the function finishes, even if the awaiting request
+		was cancelled (a running thread cannot be interrupted).
+
+		Raises:
+			OffloadBusyError: If max_pending tasks are already admitted.
+		"""
+		self._admit()
+		try:
+			# El contexto (p. ej. las métricas de la petición, ver api/utils/metrics.py) pasa al hilo
+			future = self._executor.submit(contextvars.copy_context().run, partial(function, *args, **kwargs))
+		except BaseException:
+			self._release()
+			raise
+		future.add_done_callback(self._release)
+		return await asyncio.wrap_future(future)
+
+	def shutdown(self, wait=True):
+		with self._lock:
+			executor, self._executor = self._executor, None
+		if executor is not None:
+			executor.shutdown(wait=wait)
+
+
+heavy_work = WorkOffloader()
+
+
+def _read_chunk(f, chunk_size):
+	return f.read(chunk_size)
+
+
+async def iter_file(path, chunk_size=FILE_CHUNK_SIZE):
+	"""
+	Asynchronously yields the content of a file in chunks, reading each one in the default
+	executor so the event loop never waits on the disk.
+
+	Args:
+		path (str): Path of the file.
+		chunk_size (int): Bytes per chunk.
+
+	Yields:
+		bytes: The chunks of the file.
+	"""
+	loop = asyncio.get_running_loop()
+	f = await loop.run_in_executor(None, open, path, "rb")
+	try:
+		while True:
+			chunk = await loop.run_in_executor(None, _read_chunk, f, chunk_size)
+			if not chunk:
+				break
+			yield chunk
+	finally:
+		f.close()
+
+
+async def iter_sync(iterator):
+	"""
+	Asynchronously yields the items of a blocking iterator (e.g. encode_points_binary),
+	producing each one in the default executor.
+	"""
+	loop = asyncio.get_running_loop()
+	iterator = iter(iterator)
+	done = object()
+	while True:
+		item = await loop.run_in_executor(None, next, iterator, done)
+		if item is done:
+			break
+		yield item
@@ -0,0 +1,273 @@
+import json
+import os
+import re
+import shutil
+
+import numpy as np
+
+from .cache import cache_path, publish_directory, remove_stale, temporary_path
+from .metrics import record_cache, timed
+from .colormap import apply_colormap, normalize_values
+from .point_cloud import POINT_CHUNK_SIZE, load_point_cloud, point_cloud_info
+from .thumbnail import encode_png
+
+# Vista en planta de una nube de puntos: rásters 2D vistos desde arriba.
+#
+# Los puntos se agrupan en una grilla regular sobre el plano x-y, de cell_size metros por
+# celda (por defecto, PLAN_SIZE celdas en el lado mayor), acumulando en una sola pasada
+# vectorizada por bloque la altura máxima, la intensidad media y el número de puntos de cada
+# celda. La fila 0 de los rásters es el borde norte (y máximo), como en una imagen.
+#
+# Los rásters se guardan en la caché del archivo (ver api/utils/cache.py) como un directorio
+# "plan" con plan.json, max_z.npy e intensity.npy (float32, NaN en las celdas vacías) y
+# count.npy (uint32), junto con una pirámide de teselas PNG de PLAN_TILE_SIZE píxeles por capa:
+# <capa>/<nivel>/<x>_<y>.png. Como en los mapas web, el nivel 0 es una sola tesela con todo el
+# escaneo y cada nivel siguiente duplica la resolución, hasta la de la grilla; cada celda de un
+# nivel agrega las 2x2 celdas del siguiente (máximo de altura, suma de puntos y de intensidad).
+# Las celdas vacías son transparentes.
+
+PLAN_SIZE = 2048
+PLAN_MAX_SIZE = 16384
+PLAN_TILE_SIZE = 256
+PLAN_VERSION = 1
+
+# Capas de la vista en planta y sus paletas (ver api/utils/colormap.py)
+PLAN_LAYERS = {"height": "viridis", "intensity": "inferno", "count": "magma"}
+
+TILE_PATTERN = re.compile(r"^[0-9]+$")
+
+
+class PlanViewError(ValueError):
+	"""Raised when a plan view request is malformed."""
+	pass
+
+
+def plan_dir(file_path):
+	"""Returns the cache directory of the plan view of file_path."""
+	return cache_path(file_path, "plan", "")
+
+
+def _bin_points(point_cloud, origin, cell_size, width, height, chunk_points):
+	"""Returns (count, max_z, intensity_sum) flat arrays of the grid cells."""
+	cells = width * height
+	count = np.zeros(cells, dtype=np.int64)
+	max_z = np.full(cells, -np.inf)
+	intensity_sum = np.zeros(cells)
+	for start in range(0, len(point_cloud), chunk_points):
+		chunk = np.asarray(point_cloud[start:start + chunk_points])
+		columns = np.clip(((chunk[:, 0] - origin[0]) / cell_size).astype(np.int64), 0, width - 1)
+		rows = np.clip(((origin[1] - chunk[:, 1]) / cell_size).astype(np.int64), 0, height - 1)
+		index = rows * width + columns
+		count += np.bincount(index, minlength=cells)
+		intensity_sum += np.bincount(index, weights=chunk[:, 3], minlength=cells)
+		np.maximum.at(max_z, index, chunk[:, 2])
+	return count.reshape(height, width), max_z.reshape(height, width), intensity_sum.reshape(height, width)
+
+
+def _downsample(count, max_z, intensity_sum):
+	"""Aggregates 2x2 blocks of cells (the last row/column is padded with empty cells)."""
+	height, width = count.shape
+	pad = ((0, height % 2), (0, width % 2))
+	count = np.pad(count, pad)
+	max_z = np.pad(max_z, pad, constant_values=-np.inf)
+	intensity_sum = np.pad(intensity_sum, pad)
+	shape = (count.shape[0] // 2, 2, count.shape[1] // 2, 2)
+	return (
+		count.reshape(shape).sum(axis=(1, 3)),
+		max_z.reshape(shape).max(axis=(1, 3)),
+		intensity_sum.reshape(shape).sum(axis=(1, 3)),
+	)
+
+
+def _layer_values(layer, count, max_z, intensity_sum, ranges):
+	"""Values of a layer normalized to [0, 1], NaN on empty cells."""
+	with np.errstate(invalid="ignore", divide="ignore"):
+		if layer == "height":
+			values = normalize_values(max_z, ranges["height"])
+		elif layer == "intensity":
+			values = normalize_values(intensity_sum / count, ranges["intensity"])
+		else:
+			values = normalize_values(np.log1p(count), (0.0, np.log1p(ranges["count"][1])))
+	values[count == 0] = np.nan
+	return values
+
+
+def _write_tiles(directory, level, count, max_z, intensity_sum, ranges, tile_size):
+	"""Writes the PNG tiles of every layer of one pyramid level. Returns (tiles x, tiles y)."""
+	height, width = count.shape
+	tiles = (-(-width // tile_size), -(-height // tile_size))
+	for layer, colormap in PLAN_LAYERS.items():
+		values = _layer_values(layer, count, max_z, intensity_sum, ranges)
+		image = np.zeros((height, width, 4), dtype=np.uint8)
+		image[..., :3] = apply_colormap(values, colormap)
+		image[..., 3] = np.where(count > 0, 255, 0)
+		os.makedirs(os.path.join(directory, layer, str(level)))
+		for tile_y in range(tiles[1]):
+			for tile_x in range(tiles[0]):
+				tile = image[tile_y * tile_size:(tile_y + 1) * tile_size, tile_x * tile_size:(tile_x + 1) * tile_size]
+				with open(os.path.join(directory, layer, str(level), f"{tile_x}_{tile_y}.png"), "wb") as f:
+					f.write(encode_png(tile))
+	return tiles
+
+
+@timed("build_plan_view")
+def build_plan_view(file_path, cell_size=0.0, point_cloud=None, chunk_points=POINT_CHUNK_SIZE, tile_size=PLAN_TILE_SIZE):
+	"""
+	Builds and persists the plan view rasters and tile pyramid of a point cloud file.
+
+	Args:
+		file_path (str): Path to the point cloud file.
+		cell_size (float): Grid cell side in the cloud units; 0 fits PLAN_SIZE cells on
+			the longest side.
+		point_cloud (np.ndarray, optional): Already loaded data of file_path.
+		chunk_points (int): Points binned at a time.
+		tile_size (int): Side of the PNG tiles in pixels.
+
+	Returns:
+		dict: The plan view description (see load_plan_view).
+
+	Raises:
+		PlanViewError: If cell_size gives a grid larger than PLAN_MAX_SIZE cells per side.
+	"""
+	if point_cloud is None:
+		point_cloud = load_point_cloud(file_path)
+	info = point_cloud_info(point_cloud, chunk_points) if len(point_cloud) else None
+	if info is not None:
+		bbox = [[info["rango_x"][0], info["rango_y"][0]], [info["rango_x"][1], info["rango_y"][1]]]
+		height_range, intensity_range = list(info["rango_z"]), list(info["rango_intensidad"])
+	else:
+		bbox, height_range, intensity_range = [[0.0, 0.0], [0.0, 0.0]], [0.0, 0.0], [0.0, 0.0]
+	extent = np.subtract(bbox[1], bbox[0])
+	if cell_size <= 0:
+		cell_size = max(float(extent.max()) / PLAN_SIZE, 1e-9)
+	width, height = np.maximum(np.ceil(extent / cell_size), 1).astype(np.int64).tolist()
+	if max(width, height) > PLAN_MAX_SIZE:
+		raise PlanViewError(f"cell_size {cell_size} gives a {width}x{height} grid (maximum {PLAN_MAX_SIZE} per side).")
+
+	# Origen en la esquina noroeste: x mínimo, y máximo
+	origin = (bbox[0][0], bbox[1][1])
+	count, max_z, intensity_sum = _bin_points(point_cloud, origin, cell_size, width, height, chunk_points)
+	ranges = {"height": height_range, "intensity": intensity_range, "count": [0, int(count.max()) if count.size else 0]}
+
+	destination = plan_dir(file_path)
+	temporary = temporary_path(destination)
+	os.makedirs(temporary)
+	try:
+		empty = count == 0
+		with np.errstate(invalid="ignore", divide="ignore"):
+			np.save(os.path.join(temporary, "max_z.npy"), np.where(empty, np.nan, max_z).astype(np.float32))
+			np.save(os.path.join(temporary, "intensity.npy"), np.where(empty, np.nan, intensity_sum / count).astype(np.float32))
+		np.save(os.path.join(temporary, "count.npy"), count.astype(np.uint32))
+
+		# Pirámide desde la resolución completa (último nivel) hasta una sola tesela (nivel 0)
+		num_levels = int(np.ceil(np.log2(max(width, height) / tile_size))) + 1 if max(width, height) > tile_size else 1
+		levels = [None] * num_levels
+		for level in range(num_levels - 1, -1, -1):
+			tiles = _write_tiles(temporary, level, count, max_z, intensity_sum, ranges, tile_size)
+			levels[level] = {
+				"level": level,
+				"width": int(count.shape[1]),
+				"height": int(count.shape[0]),
+				"cell_size": cell_size * 2 ** (num_levels - 1 - level),
+				"tiles": list(tiles),
+			}
+			if level:
+				count, max_z, intensity_sum = _downsample(count, max_z, intensity_sum)
+
+		plan = {
+			"version": PLAN_VERSION,
+			"points": int(len(point_cloud)),
+			"bbox": bbox,
+			"cell_size": cell_size,
+			"width": width,
+			"height": height,
+			"tile_size": tile_size,
+			"layers": {layer: {"colormap": colormap, "range": ranges[layer]} for layer, colormap in PLAN_LAYERS.items()},
+			"levels": levels,
+		}
+		with open(os.path.join(temporary, "plan.json"), "w") as f:
+			json.dump(plan, f)
+
+		publish_directory(temporary, destination, lambda path: _read_plan(path, cell_size) is not None)
+	finally:
+		shutil.rmtree(temporary, ignore_errors=True)
+	remove_stale(file_path, "plan", "")
+	print(f"Vista en planta de {file_path}: {width}x{height} celdas de {cell_size:.3f}, {num_levels} niveles")
+	return plan
+
+
+def _read_plan(directory, cell_size=None):
+	"""Returns the plan view stored in directory, or None if it is missing, from another PLAN_VERSION or of another cell_size."""
+	try:
+		with open(os.path.join(directory, "plan.json")) as f:
+			plan = json.load(f)
+	except (OSError, ValueError):
+		return None
+	if plan.get("version") != PLAN_VERSION or (cell_size and not np.isclose(plan["cell_size"], cell_size)):
+		return None
+	return plan
+
+
+def load_plan_view(file_path, cell_size=None, build=True):
+	"""
+	Returns the plan view description of file_path, building it first if needed.
+
+	The description is a dict with the point count, the x-y "bbox", the grid "cell_size",
+	"width" and "height", the "layers" with their colormap and value range, and the tile
+	pyramid "levels" (from level 0, a single tile, to the full grid resolution) with their
+	size, cell size and number of tiles per axis.
+
+	Args:
+		file_path (str): Path to the point cloud file.
+		cell_size (float, optional): Required grid cell size; a plan view built with
+			another cell size is rebuilt.
+		build (bool): Whether to build the plan view when it is missing.
+
+	Returns:
+		dict: The description, or None when it does not exist and build is False.
+	"""
+	plan = _read_plan(plan_dir(file_path), cell_size)
+	if plan is not None:
+		record_cache("plan", True)
+		return plan
+	record_cache("plan", False)
+	return build_plan_view(file_path, cell_size or 0.0) if build else None
+
+
+def plan_raster_path(file_path, name):
+	"""
+	Returns the path of one full-resolution raster of the plan view ("max_z", "intensity" or "count").
+
+	Raises:
+		PlanViewError: If the raster name is not recognized.
+		KeyError: If the plan view has not been built.
+	"""
+	if name not in ("max_z", "intensity", "count"):
+		raise PlanViewError(f"Unknown plan raster: {name}")
+	path = os.path.join(plan_dir(file_path), f"{name}.npy")
+	if not os.path.exists(path):
+		raise KeyError(f"Plan view not built: {file_path}")
+	return path
+
+
+def load_plan_raster(file_path, name):
+	"""Memory-maps one full-resolution raster of the plan view (see plan_raster_path)."""
+	return np.load(plan_raster_path(file_path, name), mmap_mode="r")
+
+
+def plan_tile_path(file_path, layer, level, x, y):
+	"""
+	Returns the path of one PNG tile of the plan view.
+
+	Raises:
+		PlanViewError: If the layer or a tile coordinate is malformed.
+		KeyError: If the tile does not exist.
+	"""
+	if layer not in PLAN_LAYERS:
+		raise PlanViewError(f"Unknown plan layer: {layer}")
+	if not all(TILE_PATTERN.match(str(value)) for value in (level, x, y)):
+		raise PlanViewError("Tile level, x and y must be non-negative integers.")
+	path = os.path.join(plan_dir(file_path), layer, str(int(level)), f"{int(x)}_{int(y)}.png")
+	if not os.path.exists(path):
+		raise KeyError(f"Plan tile not found: {layer}/{level}/{x}_{y}")
+	return path
@@ -1,6 +1,12 @@
+import io
+import os
+import warnings
 import numpy as np
 import open3d as o3d
-import matplotlib.pyplot as plt
+
+from .colormap import apply_colormap, normalize_values
+from .cache import cache_path, load_array, remove_stale, save_array
+from .metrics import increment, record_cache, span, timed
 
 # Puntos de nube: Representación digital tridimensional compuesta por múltiples puntos coordenados (X, Y, Z), cada uno con atributos adicionales como color e intensidad. Estos datos se obtienen típicamente mediante escáneres láser 3D, LiDAR u otros sistemas de captura, y se utilizan en cartografía, modelado 3D, ingeniería inversa y análisis espacial.
 # Atributos particulares: [x, y, z, intensidad, r, g, b]
@@ -21,15 +27,183 @@ class UnsupportedFileFormatError(Exception):
     """Raised when the file format is not supported."""
     pass
 
-def load_point_cloud(file_path):
+# Columnas esperadas por fila en un archivo .pts: x, y, z, intensidad, r, g, b
+PTS_COLUMNS = 7
+
+# Tamaño de bloque (bytes) leído por el parser de .pts
+PTS_BLOCK_SIZE = 4 * 1024 * 1024
+
+# Puntos por bloque en el procesamiento por bloques (~56 MB en float64)
+POINT_CHUNK_SIZE = 1_000_000
+
+# Tokenizador de los bloques de .pts: "vectorized" (np.fromstring sobre el bloque completo) o
+# "loadtxt". Desde numpy 1.23 np.loadtxt tiene su propio tokenizador en C, más rápido que
+# np.fromstring (ver benchmarks/bench_load_point_cloud.py); antes era Python puro por fila.
+PTS_TOKENIZER = os.environ.get("PTS_TOKENIZER") or (
+	"loadtxt" if tuple(int(part) for part in np.__version__.split(".")[:2]) >= (1, 23) else "vectorized"
+)
+
+def _parse_pts_header(line):
+	"""Returns the point count declared in a .pts header line, or None."""
+	tokens = line.split()
+	if len(tokens) != 1:
+		return None
+	try:
+		count = int(tokens[0])
+	except ValueError:
+		return None
+	return count if count >= 0 else None
+
+def _tokenize_pts_block(block, dtype):
+	"""
+	Vectorized tokenizer of a block of .pts lines.
+
+	Converts every whitespace separated number of the block in a single np.fromstring
+	call and reshapes the result into rows, checking that each line had exactly 7 numbers.
+
+	Args:
+		block (bytes): Whole lines of whitespace separated numbers.
+		dtype (np.dtype): Output floating point type.
+
+	Returns:
+		np.ndarray | None: The (n, 7) rows, or None if the block has non numeric tokens,
+			blank lines or rows without 7 columns.
+	"""
+	with warnings.catch_warnings():
+		# numpy < 2 advierte (en vez de fallar) cuando un token no es numérico
+		warnings.simplefilter("error", DeprecationWarning)
+		try:
+			values = np.fromstring(block, dtype=dtype, sep=" ")
+		except (ValueError, DeprecationWarning):
+			return None
+	# Tokens por línea: inicios de token (espacio seguido de otro carácter) antes de cada salto de línea
+	buffer = np.frombuffer(block, dtype=np.uint8)
+	space = buffer <= 32
+	starts = np.flatnonzero(space[:-1] > space[1:])
+	line_ends = np.flatnonzero(buffer == 10)
+	if not block.endswith(b"\n"):
+		line_ends = np.append(line_ends, len(buffer))
+	per_line = np.diff(np.searchsorted(starts, line_ends), prepend=0)
+	if len(per_line):
+		per_line[0] += not space[0]
+	if values.size != len(per_line) * PTS_COLUMNS or np.any(per_line != PTS_COLUMNS):
+		return None
+	return values.reshape(len(per_line), PTS_COLUMNS)
+
+def _parse_pts_block(block, dtype, tokenizer=None):
+	"""
+	Parses a block of complete .pts lines into an (n, 7) array.
+
+	Args:
+		block (bytes): Whole lines of whitespace separated numbers.
+		dtype (np.dtype): Output floating point type.
+		tokenizer (str): "vectorized" or "loadtxt"; PTS_TOKENIZER by default.
+
+	Returns:
+		np.ndarray: Parsed rows.
+
+	Raises:
+		InvalidPointCloudError: If the block has non numeric tokens or rows without 7 columns.
+	"""
+	if (tokenizer or PTS_TOKENIZER) == "vectorized":
+		rows = _tokenize_pts_block(block, dtype)
+		if rows is not None:
+			return rows
+	# Bloques con líneas en blanco o filas inválidas: np.loadtxt las acepta o da el error preciso
+	try:
+		rows = np.loadtxt(io.BytesIO(block), dtype=dtype, ndmin=2)
+	except ValueError as e:
+		raise InvalidPointCloudError(f"Failed to load point cloud data: {e}")
+	if rows.shape[1] != PTS_COLUMNS:
+		raise InvalidPointCloudError("Point cloud data must have exactly 7 columns.")
+	return rows
+
+def _iter_pts_blocks(f, expected, dtype, block_size):
+	"""
+	Yields the rows of an open .pts file, positioned after its header, block by block.
+
+	Raises:
+		InvalidPointCloudError: If a block is invalid or the total row count differs
+			from expected (when expected is not None).
+	"""
+	filled = 0
+	while True:
+		block = f.read(block_size)
+		if not block:
+			break
+		# Completa la última línea del bloque para no partir una fila
+		block += f.readline()
+		if not block.strip():
+			continue
+		rows = _parse_pts_block(block, dtype)
+		filled += len(rows)
+		if expected is not None and filled > expected:
+			raise InvalidPointCloudError(
+				f"Point cloud has more points than the {expected} declared in its header."
+			)
+		yield rows
+	if expected is not None and filled != expected:
+		raise InvalidPointCloudError(
+			f"Point cloud has {filled} points but its header declares {expected}."
+		)
+
+def read_pts(file_path, dtype=np.float64, block_size=PTS_BLOCK_SIZE):
+	"""
+	Parses a FARO .pts file in large byte blocks.
+
+	The header line holds the point count, which is used to preallocate a single
+	(N, 7) array that is filled block by block, so peak memory is the output plus
+	one block instead of the growing row buffers and final copy of a whole-file
+	np.loadtxt (or its per-token Python objects on numpy < 1.23).
+	Files whose first line is not a point count are still accepted; their blocks
+	are concatenated at the end.
+
+	Args:
+		file_path (str): Path to the .pts file.
+		dtype (np.dtype): Output floating point type (float64 or float32).
+		block_size (int): Number of bytes read per block.
+
+	Returns:
+		np.ndarray: An (N, 7) array of the point cloud data.
+
+	Raises:
+		InvalidPointCloudError: If the data is not numeric, does not have 7 columns
+			or does not match the point count declared in the header.
+	"""
+	with open(file_path, "rb") as f:
+		expected = _parse_pts_header(f.readline())
+		blocks = _iter_pts_blocks(f, expected, dtype, block_size)
+
+		if expected is None:
+			rows = list(blocks)
+			if not rows:
+				raise InvalidPointCloudError("Point cloud file has no points.")
+			return np.concatenate(rows) if len(rows) > 1 else rows[0]
+
+		output = np.empty((expected, PTS_COLUMNS), dtype=dtype)
+		filled = 0
+		for rows in blocks:
+			output[filled:filled + len(rows)] = rows
+			filled += len(rows)
+	return output
+
+@timed("load_point_cloud")
+def load_point_cloud(file_path, dtype=np.float64, use_cache=True):
     """
     Loads a point cloud from a file and validates its structure.
 
+    The first parse of a file is stored as a binary .npy sidecar (see api/utils/cache.py),
+    keyed by the file path, size and modification time. Later loads memory-map that
+    sidecar read-only, so repeated loads skip the text parser and concurrent requests
+    for the same file share the OS page cache instead of holding private copies.
+
     Args:
         file_path (str): Path to the point cloud file.
+        dtype (np.dtype): Floating point type of the returned array.
+        use_cache (bool): Whether to read and write the binary sidecar cache.
 
     Returns:
-        np.ndarray: A numpy array of the point cloud data.
+        np.ndarray: A numpy array of the point cloud data (a read-only memmap when cached).
 
     Raises:
         UnsupportedFileFormatError: If the file format is not supported.
@@ -38,77 +212,321 @@ def load_point_cloud(file_path):
     if not is_point_cloud(file_path):
         raise UnsupportedFileFormatError("The provided file is not a supported point cloud format.")
 
+    kind = f"points-{np.dtype(dtype).name}"
+    cached_path = None
+    if use_cache:
+        try:
+            cached_path = cache_path(file_path, kind, ".npy")
+            point_cloud = load_array(cached_path)
+        except (OSError, ValueError):
+            point_cloud = None
+        if point_cloud is not None and point_cloud.ndim == 2 and point_cloud.shape[1] == PTS_COLUMNS:
+            record_cache("points", True)
+            increment("points_processed_total", len(point_cloud), stage="load_point_cloud")
+            return point_cloud
+        record_cache("points", False)
+
     try:
-        point_cloud = np.loadtxt(file_path, skiprows=1)
+        with span("parse_pts"):
+            point_cloud = read_pts(file_path, dtype=dtype)
+        increment("bytes_total", os.path.getsize(file_path), direction="read", format="pts")
+    except InvalidPointCloudError:
+        raise
     except Exception as e:
         raise InvalidPointCloudError(f"Failed to load point cloud data: {e}")
 
-    if point_cloud.shape[1] != 7:
+    if point_cloud.ndim != 2 or point_cloud.shape[1] != PTS_COLUMNS:
         raise InvalidPointCloudError("Point cloud data must have exactly 7 columns.")
-    
+
+    if cached_path:
+        try:
+            save_array(cached_path, point_cloud)
+            remove_stale(file_path, kind, ".npy")
+            point_cloud = load_array(cached_path)
+        except OSError as e:
+            print(f"No se pudo guardar la caché de {file_path}: {e}")
+
+    increment("points_processed_total", len(point_cloud), stage="load_point_cloud")
     return point_cloud
 
-def point_cloud_info(point_cloud):
-	# Lectura de datos
-	x, y, z = (
-		point_cloud[:, 0],
-		point_cloud[:, 1],
-		point_cloud[:, 2],
-	)  # Coordenadas
-	intensidad = point_cloud[:, 3]  # Intensidad
-	r, g, b = (
-		point_cloud[:, 4],
-		point_cloud[:, 5],
-		point_cloud[:, 6],
-	)  # Colores
-
-	# Análisis de datos
-	info = {
-		"numero_puntos": point_cloud.shape[0],
-		"ejemplo_fila": point_cloud[:5].tolist(),
-		"rango_x": (x.min(), x.max()),
-		"rango_y": (y.min(), y.max()),
-		"rango_z": (z.min(), z.max()),
-		"rango_r": (r.min(), r.max()),
-		"rango_g": (g.min(), g.max()),
-		"rango_b": (b.min(), b.max()),
-		"rango_intensidad": (intensidad.min(), intensidad.max()),
-		"media_intensidad": intensidad.mean(),
-		"desviacion_estandar_intensidad": intensidad.std(),
-	}
-	return info
-
-def generate_cloud(point_cloud):
+def iter_point_cloud_chunks(file_path, chunk_points=POINT_CHUNK_SIZE, dtype=np.float64):
+	"""
+	Yields a point cloud file as consecutive (chunk_points, 7) blocks.
 
-	# Gráfico de nube de puntos
-	# Coordenadas x, y, z
-	coordenadas = point_cloud[:, :3]
+	Only one block (plus one parser block) is held in memory at a time, so scans larger
+	than RAM can be reduced chunk by chunk. When the binary cache of load_point_cloud
+	already exists the blocks are read from its memory map instead of the text file.
+	The last block may be shorter.
+
+	Args:
+		file_path (str): Path to the point cloud file.
+		chunk_points (int): Number of points per yielded block.
+		dtype (np.dtype): Floating point type of the yielded blocks.
+
+	Yields:
+		np.ndarray: Blocks of at most chunk_points rows.
 
-	# Crear objeto Open3D PointCloud
+	Raises:
+		UnsupportedFileFormatError: If the file format is not supported.
+		InvalidPointCloudError: If the point cloud data is invalid.
+	"""
+	if not is_point_cloud(file_path):
+		raise UnsupportedFileFormatError("The provided file is not a supported point cloud format.")
+	if chunk_points < 1:
+		raise ValueError("chunk_points must be a positive integer.")
+
+	try:
+		cached = load_array(cache_path(file_path, f"points-{np.dtype(dtype).name}", ".npy"))
+	except (OSError, ValueError):
+		cached = None
+	if cached is not None:
+		for start in range(0, len(cached), chunk_points):
+			yield np.asarray(cached[start:start + chunk_points])
+		return
+
+	try:
+		with open(file_path, "rb") as f:
+			expected = _parse_pts_header(f.readline())
+			pending = []
+			pending_points = 0
+			for rows in _iter_pts_blocks(f, expected, dtype, PTS_BLOCK_SIZE):
+				pending.append(rows)
+				pending_points += len(rows)
+				while pending_points >= chunk_points:
+					merged = np.concatenate(pending) if len(pending) > 1 else pending[0]
+					yield merged[:chunk_points]
+					rest = merged[chunk_points:]
+					pending = [rest] if len(rest) else []
+					pending_points = len(rest)
+			if pending_points:
+				yield np.concatenate(pending) if len(pending) > 1 else pending[0]
+	except InvalidPointCloudError:
+		raise
+	except Exception as e:
+		raise InvalidPointCloudError(f"Failed to load point cloud data: {e}")
+
+class PointCloudStats:
+	"""
+	Single-pass reducer of per-column statistics of a point cloud.
+
+	Blocks are folded in with update(); per-column min, max, mean and variance are
+	merged with the parallel form of Welford's algorithm (Chan et al.), so the result
+	does not depend on how the cloud was split and two partial reducers can be
+	combined with merge().
+	"""
+
+	def __init__(self, columns=PTS_COLUMNS, sample_rows=5):
+		self.count = 0
+		self.min = np.full(columns, np.inf)
+		self.max = np.full(columns, -np.inf)
+		self.mean = np.zeros(columns)
+		self.m2 = np.zeros(columns)
+		self.sample_rows = sample_rows
+		self.sample = []
+
+	def update(self, block):
+		"""Folds an (n, columns) block into the statistics."""
+		block = np.asarray(block)
+		n = len(block)
+		if n == 0:
+			return self
+		if len(self.sample) < self.sample_rows:
+			self.sample.extend(block[:self.sample_rows - len(self.sample)].tolist())
+		block_mean = block.mean(axis=0, dtype=np.float64)
+		block_m2 = ((block - block_mean) ** 2).sum(axis=0, dtype=np.float64)
+		self._combine(n, block.min(axis=0), block.max(axis=0), block_mean, block_m2)
+		return self
+
+	def merge(self, other):
+		"""Folds the statistics of another reducer into this one."""
+		if other.count:
+			if len(self.sample) < self.sample_rows:
+				self.sample.extend(other.sample[:self.sample_rows - len(self.sample)])
+			self._combine(other.count, other.min, other.max, other.mean, other.m2)
+		return self
+
+	def _combine(self, n, block_min, block_max, block_mean, block_m2):
+		total = self.count + n
+		delta = block_mean - self.mean
+		self.mean = self.mean + delta * (n / total)
+		self.m2 = self.m2 + block_m2 + delta ** 2 * (self.count * n / total)
+		self.min = np.minimum(self.min, block_min)
+		self.max = np.maximum(self.max, block_max)
+		self.count = total
+
+	@property
+	def std(self):
+		"""Population standard deviation per column (as np.std)."""
+		return np.sqrt(self.m2 / self.count) if self.count else np.full_like(self.m2, np.nan)
+
+	def info(self):
+		"""Returns the statistics in the format of point_cloud_info."""
+		if not self.count:
+			raise InvalidPointCloudError("Point cloud has no points.")
+		ranges = [(float(low), float(high)) for low, high in zip(self.min, self.max)]
+		return {
+			"numero_puntos": self.count,
+			"ejemplo_fila": self.sample,
+			"rango_x": ranges[0],
+			"rango_y": ranges[1],
+			"rango_z": ranges[2],
+			"rango_r": ranges[4],
+			"rango_g": ranges[5],
+			"rango_b": ranges[6],
+			"rango_intensidad": ranges[3],
+			"media_intensidad": float(self.mean[3]),
+			"desviacion_estandar_intensidad": float(self.std[3]),
+		}
+
+def point_cloud_info(point_cloud, chunk_points=POINT_CHUNK_SIZE):
+	# Una sola pasada por bloques: los temporales quedan acotados al tamaño del bloque
+	stats = PointCloudStats(point_cloud.shape[1])
+	for start in range(0, len(point_cloud), chunk_points):
+		stats.update(point_cloud[start:start + chunk_points])
+	return stats.info()
+
+class CloudDescriptor:
+	"""
+	Statistics and normalized intensity of a loaded point cloud, computed once per load.
+
+	Mesh generation needs the column statistics (to print them), the intensity range and
+	the normalized intensity (for colors and the threshold filter). The statistics come
+	from a single chunked pass over all columns; the normalized intensity is written
+	chunk by chunk into one float32 array the first time it is requested. Pass the
+	descriptor to generate_cloud and create_threshold_mesh instead of letting each one
+	scan the intensity column again.
+	"""
+
+	def __init__(self, point_cloud, chunk_points=POINT_CHUNK_SIZE):
+		self.point_cloud = point_cloud
+		self.chunk_points = chunk_points
+		self.stats = PointCloudStats(point_cloud.shape[1])
+		for start in range(0, len(point_cloud), chunk_points):
+			self.stats.update(point_cloud[start:start + chunk_points])
+		self._info = None
+		self._normalized_intensity = None
+
+	def info(self):
+		"""Returns the statistics in the format of point_cloud_info."""
+		if self._info is None:
+			self._info = self.stats.info()
+		return self._info
+
+	@property
+	def intensity_range(self):
+		"""(min, max) of the intensity column."""
+		return self.info()["rango_intensidad"]
+
+	@property
+	def normalized_intensity(self):
+		"""Intensity mapped to [0, 1] as a float32 array (all zeros for a constant intensity)."""
+		if self._normalized_intensity is None:
+			normalized = np.empty(len(self.point_cloud), dtype=np.float32)
+			for start in range(0, len(self.point_cloud), self.chunk_points):
+				stop = start + self.chunk_points
+				normalize_values(self.point_cloud[start:stop, 3], self.intensity_range, out=normalized[start:stop])
+			self._normalized_intensity = normalized
+		return self._normalized_intensity
+
+def streaming_point_cloud_info(file_path, chunk_points=POINT_CHUNK_SIZE):
+	"""
+	Computes point_cloud_info of a file without loading it whole.
+
+	Args:
+		file_path (str): Path to the point cloud file.
+		chunk_points (int): Number of points held in memory at a time.
+
+	Returns:
+		dict: The same statistics as point_cloud_info.
+	"""
+	stats = PointCloudStats()
+	for block in iter_point_cloud_chunks(file_path, chunk_points):
+		stats.update(block)
+	return stats.info()
+
+def to_vector3d(array):
+	"""
+	Converts an (N, 3) array to an o3d.utility.Vector3dVector.
+
+	Open3D copies C-contiguous float64 input in one pass, but converts any other dtype
+	element by element (about 40x slower for float32), so other inputs are first
+	converted by numpy. Strided views such as point_cloud[:, :3] are packed at the
+	same time.
+	"""
+	return o3d.utility.Vector3dVector(np.ascontiguousarray(array, dtype=np.float64))
+
+@timed("generate_cloud")
+def generate_cloud(point_cloud, descriptor=None):
+	# descriptor: CloudDescriptor de point_cloud, evita recalcular la intensidad normalizada
+
+	# Gráfico de nube de puntos
+	# Crear objeto Open3D PointCloud con las coordenadas x, y, z
 	cloud = o3d.geometry.PointCloud()
-	cloud.points = o3d.utility.Vector3dVector(
-		coordenadas
-	)  
+	cloud.points = to_vector3d(point_cloud[:, :3])
 
 	# Normaliza la intensidad
-	intensidad = point_cloud[:, 3]
-	intensidad_normalizada = (intensidad - intensidad.min()) / (
-		intensidad.max() - intensidad.min()
-	)
+	if descriptor is not None:
+		intensidad_normalizada = descriptor.normalized_intensity
+	else:
+		intensidad_normalizada = normalize_values(point_cloud[:, 3])
 
-	# Aplica la paleta inferno
-	cmap = plt.cm.inferno
-	colores_intensidad = cmap(intensidad_normalizada)[
-		:, :3
-	]  # Extrae solo los valores RGB
+	# Aplica la paleta inferno: RGB float64 en 0-1, escrito directamente en el formato que copia Open3D
+	colores_intensidad = apply_colormap(intensidad_normalizada, "inferno", np.float64)
 
 	# Asigna colores al gráfico
-	cloud.colors = o3d.utility.Vector3dVector(colores_intensidad)
+	cloud.colors = to_vector3d(colores_intensidad)
 
 	# Se retorna la nube de puntos lista para visualización
 	return cloud
 
 	
+def estimate_cloud_normals(cloud, file_path=None, radius=0.1, max_nn=30, variant=""):
+	"""
+	Estimates the normals of an Open3D cloud, reusing them from the cache when possible.
+
+	Normal estimation (a KD-tree neighbor search per point) is the most expensive step
+	before a Poisson reconstruction, and parameter sweeps repeat it on the same cloud.
+	The normals are cached as float32 next to the binary point cache of file_path, keyed
+	by the file version, radius, max_nn and variant (which must identify any processing
+	applied to the cloud after loading).
+
+	Args:
+		cloud (o3d.geometry.PointCloud): Cloud built from file_path; normals are set in place.
+		file_path (str, optional): Source file of the cloud. Without it nothing is cached.
+		radius (float): Neighbor search radius.
+		max_nn (int): Maximum number of neighbors.
+		variant (str): Identifier of the processing applied to the cloud.
+
+	Returns:
+		bool: True if the normals came from the cache.
+	"""
+	path = None
+	if file_path:
+		kind = f"normals{'-' + variant if variant else ''}-r{radius:g}-nn{max_nn}"
+		try:
+			path = cache_path(file_path, kind, ".npy")
+			cached = load_array(path)
+		except (OSError, ValueError):
+			path, cached = None, None
+		if cached is not None and cached.shape == (len(cloud.points), 3):
+			record_cache("normals", True)
+			cloud.normals = to_vector3d(cached)
+			return True
+		record_cache("normals", False)
+
+	with span("estimate_normals"):
+		cloud.estimate_normals(
+			search_param=o3d.geometry.KDTreeSearchParamHybrid(radius=radius, max_nn=max_nn)
+		)
+	increment("points_processed_total", len(cloud.points), stage="estimate_normals")
+	if path:
+		try:
+			save_array(path, np.asarray(cloud.normals, dtype=np.float32))
+			remove_stale(file_path, kind, ".npy")
+		except OSError as e:
+			print(f"No se pudo guardar la caché de normales de {file_path}: {e}")
+	return False
+
 def plot_cloud(cloud, file_path):
 
 	# Visualización de nube de puntos
@@ -0,0 +1,267 @@
+import os
+
+from .point_cloud import load_point_cloud, generate_cloud, estimate_cloud_normals, CloudDescriptor
+from .mesh_3d import MESH_FORMATS, load_3d_mesh, mesh_3d_info, create_delaunay_mesh, create_poisson_mesh, create_threshold_mesh, simplify_poisson_mesh
+from .tiled_poisson import create_tiled_poisson_mesh
+from .applications import is_deterministic, preprocess_cloud, preprocessing_stages, preprocessing_signature, UnknownStageError
+from .mesh_cache import mesh_cache_key, find_cached_mesh, store_cached_mesh
+from .mesh_lod import build_mesh_lod
+from .metrics import record_cache, span
+
+# Postprocesamiento de las mallas de Poisson (ver simplify_poisson_mesh): se elimina el 5% de
+# vértices de menor densidad (superficies que Poisson inventa donde no hay puntos) y, si se pide
+# un número de triángulos o un error máximo, se decima la malla. 0 desactiva cada etapa.
+POISSON_POSTPROCESSING = {"density_quantile": 0.05, "target_triangles": 0, "max_error": 0.0}
+
+# Algoritmos de generación de mallas y sus parámetros por defecto.
+# Los parámetros de cada solicitud se combinan con estos valores (ver mesh_parameters).
+MESH_ALGORITHMS = {
+	"delaunay": {"alpha": 1.0},
+	"poisson": {"radius": 0.025, "max_nn": 30, "depth": 9, **POISSON_POSTPROCESSING},
+	"threshold": {"threshold": 0.5, "alpha": 1.0},
+	# Poisson por teselas en paralelo (ver api/utils/tiled_poisson.py); tile_size 0 = automático
+	"poisson_tiled": {
+		"radius": 0.025, "max_nn": 30, "depth": 9, "tile_size": 0.0, "overlap": 0.1, **POISSON_POSTPROCESSING,
+	},
+}
+
+
+class UnknownAlgorithmError(ValueError):
+	"""Raised when a mesh algorithm or one of its parameters is not recognized."""
+	pass
+
+
+def mesh_output_format(output_format=None):
+	"""
+	Validates the file format of a generated mesh.
+
+	Returns:
+		str: One of MESH_FORMATS, "obj" when output_format is empty.
+
+	Raises:
+		UnknownAlgorithmError: If the format is not supported.
+	"""
+	output_format = output_format or "obj"
+	if output_format not in MESH_FORMATS:
+		raise UnknownAlgorithmError(f"Unknown mesh format: {output_format}")
+	return output_format
+
+
+def mesh_parameters(algorithm, params=None):
+	"""
+	Merges the parameters of a request with the defaults of an algorithm.
+
+	Args:
+		algorithm (str): One of MESH_ALGORITHMS.
+		params (dict, optional): Parameters overriding the defaults.
+
+	Returns:
+		dict: The full parameter set, with the types of the defaults.
+
+	Raises:
+		UnknownAlgorithmError: If the algorithm or a parameter is not recognized.
+	"""
+	if algorithm not in MESH_ALGORITHMS:
+		raise UnknownAlgorithmError(f"Unknown mesh algorithm: {algorithm}")
+	defaults = MESH_ALGORITHMS[algorithm]
+	merged = dict(defaults)
+	for name, value in (params or {}).items():
+		if name not in defaults:
+			raise UnknownAlgorithmError(f"Unknown parameter for {algorithm}: {name}")
+		merged[name] = type(defaults[name])(value)
+	return merged
+
+
+def _generate_mesh(file_path, algorithm, params, preprocessing, output_path):
+	"""Returns (mesh, output, preprocessing report, postprocessing report)."""
+	with span("generate_mesh", algorithm=algorithm):
+		return _run_algorithm(file_path, algorithm, params, preprocessing, output_path)
+
+
+def _run_algorithm(file_path, algorithm, params, preprocessing, output_path):
+	if algorithm == "poisson_tiled":
+		# Cada tesela lee sus puntos desde el índice espacial: la nube no se carga completa
+		print("Generando malla con Poisson por teselas...")
+		mesh, output, report, postprocessing = create_tiled_poisson_mesh(
+			file_path, output_path=output_path, preprocessing=preprocessing, **params
+		)
+		print(mesh_3d_info(mesh))
+		return mesh, output, report, postprocessing
+
+	# Carga de nube de puntos, salta la primera fila (contiene metadatos)
+	point_cloud = load_point_cloud(file_path)
+
+	# Estadísticas e intensidad normalizada, calculadas una sola vez para toda la generación
+	descriptor = CloudDescriptor(point_cloud)
+
+	# Muestra de datos
+	print(descriptor.info())
+
+	# Etapas de preprocesamiento elegidas en la solicitud, aplicadas antes de generar la malla
+	report = []
+	def preprocess(cloud):
+		cloud, stages_report = preprocess_cloud(cloud, preprocessing)
+		report.extend(stages_report)
+		return cloud
+
+	# Generación de malla 3D en base al algoritmo entregado
+	postprocessing = []
+	if algorithm == "delaunay":
+		print("Generando malla con Triangulación Delaunay...")
+		cloud = preprocess(generate_cloud(point_cloud, descriptor))
+		mesh, output = create_delaunay_mesh(cloud, file_path, output_path=output_path, **params)
+	elif algorithm == "poisson":
+		print("Generando malla con Poisson...")
+		cloud = preprocess(generate_cloud(point_cloud, descriptor))
+		if not cloud.has_normals():
+			variant = preprocessing_signature(preprocessing)
+			# Tras una etapa aleatoria la nube cambia en cada ejecución: sus normales no se cachean
+			normals_file = file_path if is_deterministic(preprocessing) else None
+			if estimate_cloud_normals(cloud, normals_file, radius=params["radius"], max_nn=params["max_nn"], variant=variant):
+				print("Normales obtenidas de la caché")
+		# Recorte por densidad y decimación antes de guardar la malla
+		poisson_params = {name: params[name] for name in ("radius", "max_nn", "depth")}
+		simplify_params = {name: params[name] for name in POISSON_POSTPROCESSING}
+		def postprocess(mesh, densities):
+			mesh, stages_report = simplify_poisson_mesh(mesh, densities, **simplify_params)
+			postprocessing.extend(stages_report)
+			return mesh
+		mesh, output, densities = create_poisson_mesh(
+			cloud, file_path, output_path=output_path, postprocess=postprocess, **poisson_params
+		)
+	else:
+		mesh, output = create_threshold_mesh(
+			point_cloud, file_path, descriptor.normalized_intensity, output_path=output_path,
+			preprocess=preprocess if preprocessing else None, **params
+		)
+
+	# Muestra de información
+	print(mesh_3d_info(mesh))
+	return mesh, output, report, postprocessing
+
+
+def _build_lod(output, mesh):
+	# La pirámide LOD se construye junto con la malla; si falla, se construye en la primera consulta
+	try:
+		build_mesh_lod(output, mesh)
+	except (OSError, ValueError) as e:
+		print(f"No se pudo construir la pirámide LOD de {output}: {e}")
+
+
+def _reconstruct(file_path, algorithm, params, preprocessing, use_cache, output_format):
+	"""Returns (mesh, result); mesh is None when the result comes from the cache."""
+	params = mesh_parameters(algorithm, params)
+	preprocessing = preprocessing_stages(preprocessing)
+	output_format = mesh_output_format(output_format)
+	# Tras una etapa aleatoria (ver NONDETERMINISTIC_STAGES) la malla no se guarda ni se busca en la caché
+	use_cache = use_cache and is_deterministic(preprocessing)
+
+	if not use_cache:
+		# Junto al archivo de entrada; .obj conserva los nombres de cada función create_*_mesh
+		output_path = None if output_format == "obj" else file_path.replace(".pts", f"_{algorithm}.{output_format}")
+		mesh, output, report, postprocessing = _generate_mesh(file_path, algorithm, params, preprocessing, output_path)
+		_build_lod(output, mesh)
+		return mesh, {
+			"output": output,
+			"mesh_info": mesh_3d_info(mesh),
+			"preprocessing": report,
+			"postprocessing": postprocessing,
+			"cached": False,
+		}
+
+	key = mesh_cache_key(
+		file_path, algorithm, {"params": params, "preprocessing": preprocessing, "format": output_format}
+	)
+	entry = find_cached_mesh(file_path, key)
+	record_cache("mesh", entry is not None)
+	if entry is not None:
+		print(f"Malla {algorithm} obtenida de la caché: {entry['output']}")
+		return None, {
+			"output": entry["output"],
+			"mesh_info": entry["mesh_info"],
+			"preprocessing": entry.get("preprocessing", []),
+			"postprocessing": entry.get("postprocessing", []),
+			"cached": True,
+		}
+
+	report, postprocessing = [], []
+	def build(directory):
+		stem = os.path.splitext(os.path.basename(file_path))[0]
+		output_path = os.path.join(directory, f"{stem}_{algorithm}.{output_format}")
+		mesh, output, stages_report, postprocessing_report = _generate_mesh(
+			file_path, algorithm, params, preprocessing, output_path
+		)
+		report.extend(stages_report)
+		postprocessing.extend(postprocessing_report)
+		return mesh, output, mesh_3d_info(mesh)
+
+	mesh, entry = store_cached_mesh(
+		file_path, key, build,
+		{"algorithm": algorithm, "params": params, "preprocessing": report, "postprocessing": postprocessing},
+	)
+	_build_lod(entry["output"], mesh)
+	return mesh, {
+		"output": entry["output"],
+		"mesh_info": entry["mesh_info"],
+		"preprocessing": report,
+		"postprocessing": postprocessing,
+		"cached": False,
+	}
+
+
+def reconstruct_mesh(file_path, algorithm, params=None, preprocessing=None, use_cache=True, output_format=None):
+	"""
+	Loads a point cloud and generates its mesh with the given algorithm.
+
+	Results are stored in the content-addressed mesh cache (see api/utils/mesh_cache.py):
+	an identical request (same file content, algorithm and parameters) reuses the stored
+	mesh, and each parameter set is written to its own file. Each generated mesh also gets
+	its LOD pyramid (see api/utils/mesh_lod.py).
+
+	Args:
+		file_path (str): Path to the point cloud file.
+		algorithm (str): One of MESH_ALGORITHMS.
+		params (dict, optional): Parameters overriding the algorithm defaults.
+		preprocessing (list, optional): Preprocessing stages applied to the cloud before
+			meshing (see api/utils/applications.py).
+		use_cache (bool): Whether to use the mesh cache. Without it, or after a
+			nondeterministic preprocessing stage such as segment_plane, the mesh is written
+			next to the input file, as "<name>_<algorithm>.<format>".
+		output_format (str, optional): Mesh file format, "obj" (default) or "glb" (binary
+			glTF, see api/utils/gltf.py).
+
+	Returns:
+		tuple: (mesh, output) with the o3d.geometry.TriangleMesh and the path it was saved to.
+
+	Raises:
+		UnknownAlgorithmError: If the algorithm, a parameter or the format is not recognized.
+		UnknownStageError: If a preprocessing stage or parameter is not recognized.
+	"""
+	mesh, result = _reconstruct(file_path, algorithm, params, preprocessing, use_cache, output_format)
+	if mesh is None:
+		mesh = load_3d_mesh(result["output"])
+	return mesh, result["output"]
+
+
+def mesh_result(file_path, algorithm, params=None, preprocessing=None, use_cache=True, output_format=None):
+	"""
+	Same as reconstruct_mesh, but returns only the output path and mesh information,
+	so cache hits do not read the mesh geometry.
+
+	Returns:
+		dict: {"output", "mesh_info", "preprocessing", "postprocessing", "cached"}, where
+		"preprocessing" is the timing and point count report of each preprocessing stage and
+		"postprocessing" the timing and vertex/triangle count report of the Poisson density
+		trimming and decimation (empty for the other algorithms).
+	"""
+	return _reconstruct(file_path, algorithm, params, preprocessing, use_cache, output_format)[1]
+
+
+def run_mesh_job(file_path, algorithm, params=None, preprocessing=None, output_format=None):
+	"""
+	Entry point of mesh generation in worker processes (see api/jobs.py).
+
+	Returns:
+		dict: Picklable result with the output path and the mesh information.
+	"""
+	return mesh_result(file_path, algorithm, params, preprocessing, output_format=output_format)
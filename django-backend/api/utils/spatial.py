@@ -0,0 +1,334 @@
+import json
+import os
+import shutil
+
+import numpy as np
+
+from .cache import cache_path, publish_directory, remove_stale, temporary_path
+from .metrics import record_cache, timed
+from .point_cloud import PTS_COLUMNS, POINT_CHUNK_SIZE, load_point_cloud, point_cloud_info
+
+# Índice espacial de una nube de puntos para consultas por región.
+#
+# La nube se divide en una grilla regular sobre su bounding box, con unos
+# GRID_CELL_POINTS puntos por celda en promedio, y los puntos se guardan ordenados por
+# celda (índice lineal (ix * ny + iy) * nz + iz) junto con el desplazamiento de inicio de
+# cada celda. Las celdas de una misma columna (ix, iy) quedan contiguas, de modo que una
+# consulta por caja lee un tramo contiguo del archivo por columna que la intersecta y
+# luego filtra los puntos exactos; el resto del archivo no se toca.
+#
+# El índice se guarda en la caché del archivo (ver api/utils/cache.py) como un directorio
+# "grid" con grid.json, offsets.npy (int64, celdas + 1) y points.npy (float32, (N, 7)), con
+# x, y, z relativas a la esquina mínima del bounding box para conservar la precisión de
+# coordenadas georreferenciadas grandes. Se construye por bloques con un ordenamiento por
+# conteo, sin ordenar la nube completa.
+
+GRID_CELL_POINTS = 4096
+GRID_MAX_CELLS = 1 << 21
+GRID_VERSION = 2
+
+
+class SpatialQueryError(ValueError):
+	"""Raised when a spatial query is malformed."""
+	pass
+
+
+def grid_dir(file_path):
+	"""Returns the cache directory of the spatial index of file_path."""
+	return cache_path(file_path, "grid", "")
+
+
+def _grid_shape(bbox_min, bbox_max, num_points, cell_points):
+	"""Cells per axis, proportional to the extents, for about cell_points points per cell."""
+	extent = np.maximum(bbox_max - bbox_min, 0.0)
+	target = int(np.clip(num_points // max(cell_points, 1), 1, GRID_MAX_CELLS))
+	# Los ejes sin extensión (p. ej. una nube plana) tienen una sola celda
+	active = extent > max(extent.max(), 1e-9) * 1e-6
+	if not active.any():
+		return np.ones(3, dtype=np.int64)
+	cell_size = (np.prod(extent[active]) / target) ** (1.0 / active.sum())
+	shape = np.where(active, np.ceil(extent / cell_size), 1).astype(np.int64)
+	return np.maximum(shape, 1)
+
+
+def _cell_ids(xyz, origin, cell_size, shape):
+	cells = np.floor((xyz - origin) / cell_size).astype(np.int64)
+	np.clip(cells, 0, shape - 1, out=cells)
+	return (cells[:, 0] * shape[1] + cells[:, 1]) * shape[2] + cells[:, 2]
+
+
+def _relative(xyz, origin):
+	"""Coordinates relative to origin, computed in float64 and stored as float32."""
+	return (np.asarray(xyz, dtype=np.float64) - origin).astype(np.float32)
+
+
+@timed("build_spatial_index")
+def build_spatial_index(file_path, point_cloud=None, cell_points=GRID_CELL_POINTS, chunk_points=POINT_CHUNK_SIZE):
+	"""
+	Builds and persists the grid index of a point cloud file.
+
+	Args:
+		file_path (str): Path to the point cloud file.
+		point_cloud (np.ndarray, optional): Already loaded data of file_path.
+		cell_points (int): Average number of points per grid cell.
+		chunk_points (int): Points processed at a time.
+
+	Returns:
+		dict: The grid description (see load_spatial_index).
+	"""
+	if point_cloud is None:
+		point_cloud = load_point_cloud(file_path)
+	num_points = len(point_cloud)
+	if num_points:
+		info = point_cloud_info(point_cloud, chunk_points)
+		bbox_min = [info["rango_x"][0], info["rango_y"][0], info["rango_z"][0]]
+		bbox_max = [info["rango_x"][1], info["rango_y"][1], info["rango_z"][1]]
+		intensity_range = list(info["rango_intensidad"])
+	else:
+		bbox_min = bbox_max = np.zeros(3)
+		intensity_range = [0.0, 0.0]
+	bbox_min = np.asarray(bbox_min, dtype=np.float64)
+	bbox_max = np.asarray(bbox_max, dtype=np.float64)
+	shape = _grid_shape(bbox_min, bbox_max, num_points, cell_points)
+	cell_size = np.maximum((bbox_max - bbox_min) / shape, 1e-9)
+	num_cells = int(np.prod(shape))
+
+	destination = grid_dir(file_path)
+	temporary = temporary_path(destination)
+	os.makedirs(temporary)
+	try:
+		# Primera pasada: celda de cada punto y número de puntos por celda
+		cells = np.empty(num_points, dtype=np.int64 if num_cells >= 2 ** 32 else np.uint32)
+		counts = np.zeros(num_cells, dtype=np.int64)
+		for start in range(0, num_points, chunk_points):
+			# Las celdas se asignan con las coordenadas relativas float32 guardadas, las mismas que filtran las consultas
+			xyz = _relative(point_cloud[start:start + chunk_points, :3], bbox_min).astype(np.float64)
+			ids = _cell_ids(xyz, 0.0, cell_size, shape)
+			cells[start:start + len(ids)] = ids
+			counts += np.bincount(ids, minlength=num_cells)
+		offsets = np.zeros(num_cells + 1, dtype=np.int64)
+		np.cumsum(counts, out=offsets[1:])
+
+		# Segunda pasada: cada bloque se ordena por celda y se copia a la posición libre de cada celda
+		points = np.lib.format.open_memmap(
+			os.path.join(temporary, "points.npy"), mode="w+", dtype=np.float32, shape=(num_points, PTS_COLUMNS)
+		)
+		cursor = offsets[:-1].copy()
+		for start in range(0, num_points, chunk_points):
+			ids = cells[start:start + chunk_points].astype(np.int64)
+			order = np.argsort(ids, kind="stable")
+			sorted_ids = ids[order]
+			first = np.searchsorted(sorted_ids, sorted_ids, side="left")
+			positions = cursor[sorted_ids] + (np.arange(len(ids)) - first)
+			block = np.asarray(point_cloud[start:start + chunk_points])[order]
+			points[positions, 3:] = block[:, 3:]
+			points[positions, :3] = _relative(block[:, :3], bbox_min)
+			cursor += np.bincount(ids, minlength=num_cells)
+		points.flush()
+		del points, cells
+		np.save(os.path.join(temporary, "offsets.npy"), offsets)
+
+		grid = {
+			"version": GRID_VERSION,
+			"points": int(num_points),
+			"bbox": [bbox_min.tolist(), bbox_max.tolist()],
+			"intensity_range": intensity_range,
+			"shape": shape.tolist(),
+			"cell_size": cell_size.tolist(),
+		}
+		with open(os.path.join(temporary, "grid.json"), "w") as f:
+			json.dump(grid, f)
+
+		publish_directory(temporary, destination, lambda path: _read_grid(path) is not None)
+	finally:
+		shutil.rmtree(temporary, ignore_errors=True)
+	remove_stale(file_path, "grid", "")
+	print(f"Índice espacial de {file_path}: {num_cells} celdas {tuple(shape.tolist())}")
+	return grid
+
+
+def _read_grid(directory):
+	"""Returns the grid stored in directory, or None if it is missing or from another GRID_VERSION."""
+	try:
+		with open(os.path.join(directory, "grid.json")) as f:
+			grid = json.load(f)
+	except (OSError, ValueError):
+		return None
+	return grid if grid.get("version") == GRID_VERSION else None
+
+
+def load_spatial_index(file_path, build=True):
+	"""
+	Returns the grid description of file_path, building the index first if needed.
+
+	The description is a dict with the point count, the bounding box, the global
+	intensity range, the grid "shape" (cells per axis) and "cell_size".
+
+	Returns:
+		dict: The grid, or None when it does not exist and build is False.
+	"""
+	grid = _read_grid(grid_dir(file_path))
+	if grid is not None:
+		record_cache("spatial_index", True)
+		return grid
+	record_cache("spatial_index", False)
+	return build_spatial_index(file_path) if build else None
+
+
+def parse_box(text):
+	"""Parses "minx,miny,minz,maxx,maxy,maxz" into ((min), (max)) arrays."""
+	try:
+		values = np.array([float(value) for value in text.split(",")])
+	except ValueError:
+		raise SpatialQueryError("bbox must be six comma-separated numbers.")
+	if len(values) != 6 or np.any(values[:3] > values[3:]):
+		raise SpatialQueryError("bbox must be minx,miny,minz,maxx,maxy,maxz with min <= max.")
+	return values[:3], values[3:]
+
+
+def parse_sphere(text):
+	"""Parses "x,y,z,radius" into (center, radius)."""
+	try:
+		values = np.array([float(value) for value in text.split(",")])
+	except ValueError:
+		raise SpatialQueryError("sphere must be four comma-separated numbers.")
+	if len(values) != 4 or values[3] < 0:
+		raise SpatialQueryError("sphere must be x,y,z,radius with a non-negative radius.")
+	return values[:3], float(values[3])
+
+
+def query_points(file_path, box=None, sphere=None, max_points=None, offset=0, limit=None):
+	"""
+	Returns the points of a cloud inside a box and/or a sphere, read through the grid index.
+
+	Only the grid columns intersecting the query region are read from disk, and cells
+	entirely inside the region are not filtered. With max_points, the matches are counted
+	first (cells inside the region from the cell offsets alone, the boundary cells by
+	filtering them) and every stride-th match is returned, so the result is thinned evenly
+	over the region to about max_points points. Results keep the index order (by cell),
+	so offset and limit page through them consistently, and the reading stops once
+	offset + limit points have been collected.
+
+	Args:
+		file_path (str): Path to the point cloud file.
+		box (tuple, optional): (min xyz, max xyz) of an axis-aligned box.
+		sphere (tuple, optional): (center xyz, radius).
+		max_points (int, optional): Budget of returned points; larger regions are thinned
+			evenly over the whole region.
+		offset (int): Number of matching points skipped (after thinning).
+		limit (int, optional): Maximum number of points returned (after thinning).
+
+	Returns:
+		tuple: (points, matches) with the (M, 7) float64 points and the number of points
+		in the region before thinning and paging, or None when it is unknown because the
+		reading stopped early at limit.
+
+	Raises:
+		SpatialQueryError: If the arguments are invalid.
+	"""
+	if max_points is not None and max_points < 1:
+		raise SpatialQueryError("max_points must be a positive integer.")
+	if offset < 0 or (limit is not None and limit < 0):
+		raise SpatialQueryError("offset and limit must not be negative.")
+
+	grid = load_spatial_index(file_path)
+	directory = grid_dir(file_path)
+	points = np.load(os.path.join(directory, "points.npy"), mmap_mode="r")
+	offsets = np.load(os.path.join(directory, "offsets.npy"), mmap_mode="r")
+
+	# La consulta se evalúa en las coordenadas del índice, relativas a la esquina mínima
+	origin = np.asarray(grid["bbox"][0], dtype=np.float64)
+	# Región de celdas a leer: la consulta dentro del bounding box, con un margen de una celda
+	# para los puntos cuyas coordenadas float32 quedaron justo fuera de este
+	cell_size = np.asarray(grid["cell_size"], dtype=np.float64)
+	low = -cell_size
+	high = np.asarray(grid["bbox"][1], dtype=np.float64) - origin + cell_size
+	if box is not None:
+		box = (np.asarray(box[0], dtype=np.float64) - origin, np.asarray(box[1], dtype=np.float64) - origin)
+		low, high = np.maximum(low, box[0]), np.minimum(high, box[1])
+	if sphere is not None:
+		center, radius = np.asarray(sphere[0], dtype=np.float64) - origin, sphere[1]
+		low, high = np.maximum(low, center - radius), np.minimum(high, center + radius)
+
+	shape = np.asarray(grid["shape"], dtype=np.int64)
+	# Holgura de las comparaciones de celdas, por el redondeo de las coordenadas float32
+	tolerance = 1e-6 * float(np.max(cell_size))
+
+	def inside(ix, iy, z0, z1):
+		"""Whether every point of the cells (ix, iy, z0..z1) is in the query region."""
+		first_cell, last_cell = np.array([ix, iy, z0]), np.array([ix, iy, z1])
+		# Las celdas del borde de la grilla también contienen los puntos recortados a ella
+		cell_low = np.where(first_cell == 0, -np.inf, first_cell * cell_size - tolerance)
+		cell_high = np.where(last_cell == shape - 1, np.inf, (last_cell + 1) * cell_size + tolerance)
+		if box is not None and not (np.all(cell_low >= box[0]) and np.all(cell_high <= box[1])):
+			return False
+		if sphere is not None:
+			farthest = np.maximum(np.abs(cell_low - center), np.abs(cell_high - center))
+			if np.sum(farthest ** 2) > radius ** 2:
+				return False
+		return True
+
+	def region_mask(block):
+		xyz = block[:, :3]
+		mask = np.ones(len(block), dtype=bool)
+		if box is not None:
+			mask &= np.all((xyz >= box[0]) & (xyz <= box[1]), axis=1)
+		if sphere is not None:
+			mask &= np.sum((xyz - center) ** 2, axis=1) <= radius ** 2
+		return mask
+
+	# Tramos contiguos a leer, por columna (ix, iy): la celda inferior, las intermedias y la
+	# superior de first[2] a last[2]. Un tramo cuyas celdas quedan dentro de la región no se
+	# filtra: todos sus puntos coinciden. Con una región vacía o fuera de la nube no hay tramos
+	spans = []
+	if len(points) and np.all(low <= high):
+		first = np.clip(np.floor(low / cell_size).astype(np.int64), 0, shape - 1)
+		last = np.clip(np.floor(high / cell_size).astype(np.int64), 0, shape - 1)
+		layers = sorted({(first[2], first[2]), (first[2] + 1, last[2] - 1), (last[2], last[2])})
+		for ix in range(first[0], last[0] + 1):
+			for iy in range(first[1], last[1] + 1):
+				column = (ix * shape[1] + iy) * shape[2]
+				for z0, z1 in layers:
+					if z0 > z1:
+						continue
+					start, stop = int(offsets[column + z0]), int(offsets[column + z1 + 1])
+					if stop > start:
+						spans.append((start, stop, inside(ix, iy, z0, z1)))
+
+	# Coincidencias: los tramos interiores se cuentan por sus offsets, los del borde se filtran.
+	# Con max_points se cuentan antes de leer los puntos, para ralear sobre las coincidencias
+	matches = None
+	if all(whole for _, _, whole in spans):
+		matches = sum(stop - start for start, stop, _ in spans)
+	elif max_points is not None:
+		matches = sum(
+			stop - start if whole else int(np.count_nonzero(region_mask(np.asarray(points[start:stop]))))
+			for start, stop, whole in spans
+		)
+	stride = max(1, -(-matches // max_points)) if max_points is not None else 1
+
+	# Se toma cada stride-ésima coincidencia (por su posición global) hasta reunir offset + limit
+	wanted = None if limit is None else offset + limit
+	parts, found, position, complete = [], 0, 0, True
+	for start, stop, whole in spans:
+		if wanted is not None and found >= wanted:
+			complete = False
+			break
+		skip = (-position) % stride
+		if whole:
+			block = np.asarray(points[start + skip:stop:stride])
+			position += stop - start
+		else:
+			block = np.asarray(points[start:stop])
+			block = block[region_mask(block)]
+			position += len(block)
+			block = block[skip::stride]
+		parts.append(block)
+		found += len(block)
+
+	result = np.concatenate(parts) if parts else np.empty((0, PTS_COLUMNS), dtype=np.float32)
+	result = np.array(result[offset:wanted], dtype=np.float64)
+	result[:, :3] += origin
+	if matches is None and complete:
+		matches = found
+	return result, matches
@@ -0,0 +1,305 @@
+import os
+import struct
+import sys
+import zlib
+
+import numpy as np
+
+from .cache import cache_path, remove_stale, temporary_path
+from .colormap import apply_colormap, normalize_values
+from .mesh_3d import decimate_mesh, is_3d_mesh, load_3d_mesh
+from .mesh_lod import load_mesh_lod, mesh_lod_path
+from .metrics import record_cache, span
+from .point_cloud import is_point_cloud, load_point_cloud
+
+# Vistas previas (PNG) de nubes de puntos y mallas, renderizadas por software con numpy.
+#
+# Los servidores no tienen pantalla ni GPU, y o3d.visualization.draw_geometries bloquea la
+# solicitud hasta que se cierra una ventana. En su lugar se proyectan los puntos o triángulos
+# con una cámara ortográfica fija (azimut THUMBNAIL_AZIMUTH y elevación THUMBNAIL_ELEVATION,
+# eje z hacia arriba) ajustada al bounding box, con un z-buffer:
+# - Nubes de puntos: una submuestra uniforme de hasta THUMBNAIL_POINTS puntos, coloreados con
+#   la paleta inferno según la intensidad (como generate_cloud), en cuadrados de point_size px.
+# - Mallas: el nivel de la pirámide LOD (ver api/utils/mesh_lod.py) más detallado con hasta
+#   THUMBNAIL_TRIANGLES triángulos, rasterizado con sombreado plano. Sin pirámide (no se
+#   construye al renderizar) se usa la malla original decimada en memoria.
+#
+# Cada vista previa se guarda en la caché del archivo como "thumbnail-<tamaño>.png", de modo
+# que los listados pueden mostrarla sin volver a leer la geometría. Las imágenes son RGBA con
+# fondo transparente y se codifican con zlib (sin dependencias de imágenes).
+
+THUMBNAIL_SIZE = 256
+THUMBNAIL_MAX_SIZE = 1024
+THUMBNAIL_POINTS = 250_000
+THUMBNAIL_TRIANGLES = 200_000
+THUMBNAIL_AZIMUTH = -45.0
+THUMBNAIL_ELEVATION = 30.0
+THUMBNAIL_MARGIN = 0.05
+
+# Sin pantalla (o con HEADLESS_RENDERING=1) las vistas de prueba retornan vistas previas
+# en lugar de abrir ventanas de Open3D
+HEADLESS_RENDERING = os.environ.get("HEADLESS_RENDERING", "") not in ("", "0") or (
+	sys.platform.startswith("linux") and not os.environ.get("DISPLAY")
+)
+
+# Candidatos (píxel, triángulo) evaluados a la vez en la rasterización
+_RASTER_BATCH = 1 << 20
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def encode_png(image):
+	"""
+	Encodes an 8-bit RGB or RGBA image as PNG.
+
+	Args:
+		image (np.ndarray): (H, W, 3) or (H, W, 4) uint8 array.
+
+	Returns:
+		bytes: The PNG file content.
+	"""
+	image = np.ascontiguousarray(image, dtype=np.uint8)
+	height, width, channels = image.shape
+	color_type = {3: 2, 4: 6}[channels]
+
+	def chunk(kind, data):
+		return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+	# Cada fila lleva el byte de filtro 0 (sin filtro)
+	rows = np.zeros((height, width * channels + 1), dtype=np.uint8)
+	rows[:, 1:] = image.reshape(height, -1)
+	return b"".join([
+		PNG_SIGNATURE,
+		chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0)),
+		chunk(b"IDAT", zlib.compress(rows.tobytes(), 6)),
+		chunk(b"IEND", b""),
+	])
+
+
+class OrthographicCamera:
+	"""Fixed-angle orthographic camera framing a bounding box in a square image."""
+
+	def __init__(self, bbox_min, bbox_max, size, azimuth=THUMBNAIL_AZIMUTH, elevation=THUMBNAIL_ELEVATION,
+		margin=THUMBNAIL_MARGIN):
+		azimuth, elevation = np.radians(azimuth), np.radians(elevation)
+		# Ejes de pantalla (derecha, arriba) y dirección hacia el observador
+		self.right = np.array([-np.sin(azimuth), np.cos(azimuth), 0.0])
+		self.up = np.array([-np.sin(elevation) * np.cos(azimuth), -np.sin(elevation) * np.sin(azimuth), np.cos(elevation)])
+		self.forward = np.array([np.cos(elevation) * np.cos(azimuth), np.cos(elevation) * np.sin(azimuth), np.sin(elevation)])
+		self.size = size
+
+		bbox_min, bbox_max = np.asarray(bbox_min, dtype=np.float64), np.asarray(bbox_max, dtype=np.float64)
+		corners = np.array([[x, y, z] for x in (0, 1) for y in (0, 1) for z in (0, 1)])
+		corners = bbox_min + corners * (bbox_max - bbox_min)
+		screen = corners @ np.column_stack([self.right, self.up])
+		self.center = (screen.min(axis=0) + screen.max(axis=0)) / 2
+		extent = max(float(np.max(screen.max(axis=0) - screen.min(axis=0))), 1e-9)
+		self.scale = size * (1 - 2 * margin) / extent
+
+	def project(self, xyz):
+		"""Returns (N, 3) [column, row, depth] of points; larger depths are closer to the camera."""
+		xyz = np.asarray(xyz, dtype=np.float64)
+		screen = np.empty((len(xyz), 3))
+		screen[:, 0] = (xyz @ self.right - self.center[0]) * self.scale + self.size / 2
+		screen[:, 1] = self.size / 2 - (xyz @ self.up - self.center[1]) * self.scale
+		screen[:, 2] = xyz @ self.forward
+		return screen
+
+
+def _compose(size, pixels, depths, colors):
+	"""Keeps the closest candidate of each pixel and paints it on a transparent image."""
+	image = np.zeros((size * size, 4), dtype=np.uint8)
+	if len(pixels):
+		order = np.lexsort((-depths, pixels))
+		pixels = pixels[order]
+		first = np.flatnonzero(np.r_[True, pixels[1:] != pixels[:-1]])
+		image[pixels[first], :3] = np.clip(np.rint(colors[order[first]] * 255), 0, 255)
+		image[pixels[first], 3] = 255
+	return image.reshape(size, size, 4)
+
+
+def render_points(xyz, colors, size=THUMBNAIL_SIZE, point_size=2, camera=None):
+	"""
+	Renders points as point_size x point_size squares with a z-buffer.
+
+	Args:
+		xyz (np.ndarray): (N, 3) coordinates.
+		colors (np.ndarray): (N, 3) colors in [0, 1].
+		size (int): Image side in pixels.
+		point_size (int): Side of each point square in pixels.
+		camera (OrthographicCamera, optional): Defaults to one framing the points.
+
+	Returns:
+		np.ndarray: (size, size, 4) RGBA uint8 image.
+	"""
+	xyz = np.asarray(xyz, dtype=np.float64)
+	if not len(xyz):
+		return np.zeros((size, size, 4), dtype=np.uint8)
+	camera = camera or OrthographicCamera(xyz.min(axis=0), xyz.max(axis=0), size)
+	screen = camera.project(xyz)
+	columns = np.floor(screen[:, 0]).astype(np.int64)
+	rows = np.floor(screen[:, 1]).astype(np.int64)
+
+	pixels, depths, sources = [], [], []
+	indices = np.arange(len(xyz))
+	offset = (point_size - 1) // 2
+	for dy in range(point_size):
+		for dx in range(point_size):
+			column, row = columns + dx - offset, rows + dy - offset
+			inside = (column >= 0) & (column < size) & (row >= 0) & (row < size)
+			pixels.append(row[inside] * size + column[inside])
+			depths.append(screen[inside, 2])
+			sources.append(indices[inside])
+	sources = np.concatenate(sources)
+	return _compose(size, np.concatenate(pixels), np.concatenate(depths), np.asarray(colors, dtype=np.float64)[sources])
+
+
+def render_mesh(vertices, triangles, colors=None, size=THUMBNAIL_SIZE, camera=None):
+	"""
+	Rasterizes a triangle mesh with a z-buffer and flat two-sided Lambert shading.
+
+	Triangles are grouped by the size of their screen bounding box, and each group is
+	rasterized at once by testing the barycentric coordinates of every pixel center of
+	its (padded) bounding boxes.
+
+	Args:
+		vertices (np.ndarray): (V, 3) coordinates.
+		triangles (np.ndarray): (T, 3) vertex indices.
+		colors (np.ndarray, optional): (V, 3) vertex colors in [0, 1]; light gray by default.
+		size (int): Image side in pixels.
+		camera (OrthographicCamera, optional): Defaults to one framing the mesh.
+
+	Returns:
+		np.ndarray: (size, size, 4) RGBA uint8 image.
+	"""
+	vertices = np.asarray(vertices, dtype=np.float64)
+	triangles = np.asarray(triangles, dtype=np.int64)
+	if not len(vertices) or not len(triangles):
+		return np.zeros((size, size, 4), dtype=np.uint8)
+	camera = camera or OrthographicCamera(vertices.min(axis=0), vertices.max(axis=0), size)
+
+	# Color de cada cara, sombreado según el ángulo con la dirección de la cámara
+	corners = vertices[triangles]
+	normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+	lengths = np.linalg.norm(normals, axis=1)
+	shade = 0.35 + 0.65 * np.abs(normals @ camera.forward) / np.maximum(lengths, 1e-30)
+	if colors is not None and len(colors):
+		face_colors = np.asarray(colors, dtype=np.float64)[triangles].mean(axis=1)
+	else:
+		face_colors = np.full((len(triangles), 3), 0.8)
+	face_colors *= shade[:, None]
+
+	screen = camera.project(vertices)[triangles]
+	# Píxeles candidatos: centros (i + 0.5) dentro del bounding box de cada triángulo
+	low = np.clip(np.ceil(screen[:, :, :2].min(axis=1) - 0.5), 0, size).astype(np.int64)
+	high = np.clip(np.floor(screen[:, :, :2].max(axis=1) - 0.5), -1, size - 1).astype(np.int64)
+	extent = np.max(high - low + 1, axis=1)
+	(x0, y0), (x1, y1), (x2, y2) = screen[:, 0, :2].T, screen[:, 1, :2].T, screen[:, 2, :2].T
+	area = (x1 - x0) * (y2 - y0) - (y1 - y0) * (x2 - x0)
+	visible = (extent > 0) & (np.abs(area) > 1e-12)
+
+	pixels, depths, faces = [], [], []
+	bucket = np.zeros(len(triangles), dtype=np.int64)
+	bucket[visible] = np.ceil(np.log2(extent[visible])).astype(np.int64)
+	for level in np.unique(bucket[visible]):
+		side = 1 << int(level)
+		selected = np.flatnonzero(visible & (bucket == level))
+		dy, dx = np.divmod(np.arange(side * side), side)
+		step = max(1, _RASTER_BATCH // (side * side))
+		for start in range(0, len(selected), step):
+			index = selected[start:start + step]
+			column = low[index, 0, None] + dx
+			row = low[index, 1, None] + dy
+			px, py = column + 0.5, row + 0.5
+			sx, sy, sz = screen[index, :, 0], screen[index, :, 1], screen[index, :, 2]
+			# Coordenadas baricéntricas de cada centro de píxel
+			w0 = ((sx[:, 1, None] - px) * (sy[:, 2, None] - py) - (sy[:, 1, None] - py) * (sx[:, 2, None] - px))
+			w1 = ((sx[:, 2, None] - px) * (sy[:, 0, None] - py) - (sy[:, 2, None] - py) * (sx[:, 0, None] - px))
+			w0 /= area[index, None]
+			w1 /= area[index, None]
+			w2 = 1 - w0 - w1
+			inside = (
+				(w0 >= -1e-9) & (w1 >= -1e-9) & (w2 >= -1e-9)
+				& (column <= high[index, 0, None]) & (row <= high[index, 1, None])
+			)
+			depth = w0 * sz[:, 0, None] + w1 * sz[:, 1, None] + w2 * sz[:, 2, None]
+			pixels.append((row * size + column)[inside])
+			depths.append(depth[inside])
+			faces.append(np.broadcast_to(index[:, None], inside.shape)[inside])
+
+	if not pixels:
+		return np.zeros((size, size, 4), dtype=np.uint8)
+	faces = np.concatenate(faces)
+	return _compose(size, np.concatenate(pixels), np.concatenate(depths), face_colors[faces])
+
+
+def point_cloud_image(file_path, size=THUMBNAIL_SIZE, max_points=THUMBNAIL_POINTS):
+	"""Renders the preview image of a point cloud file from an even subsample of its points."""
+	point_cloud = load_point_cloud(file_path)
+	step = max(1, -(-len(point_cloud) // max_points))
+	sample = np.asarray(point_cloud[::step])
+	colors = apply_colormap(normalize_values(sample[:, 3]), "inferno", np.float64)
+	return render_points(sample[:, :3], colors, size)
+
+
+def mesh_image(file_path, size=THUMBNAIL_SIZE, max_triangles=THUMBNAIL_TRIANGLES):
+	"""Renders the preview image of a mesh file from its most detailed LOD level within max_triangles."""
+	pyramid = load_mesh_lod(file_path, build=False)
+	if pyramid is None:
+		mesh, _ = decimate_mesh(load_3d_mesh(file_path), target_triangles=max_triangles)
+	else:
+		levels = pyramid["levels"]
+		level = next((level["level"] for level in levels if level["triangles"] <= max_triangles), levels[-1]["level"])
+		mesh = load_3d_mesh(mesh_lod_path(file_path, level))
+	colors = np.asarray(mesh.vertex_colors) if mesh.has_vertex_colors() else None
+	return render_mesh(np.asarray(mesh.vertices), np.asarray(mesh.triangles), colors, size)
+
+
+def thumbnail_path(file_path, size=THUMBNAIL_SIZE):
+	"""Returns the cache path of the size x size preview of file_path."""
+	return cache_path(file_path, f"thumbnail-{size}", ".png")
+
+
+def render_thumbnail(file_path, size=THUMBNAIL_SIZE):
+	"""
+	Returns the path of the cached PNG preview of a point cloud or mesh file, rendering it
+	first if needed.
+
+	Args:
+		file_path (str): Path to the point cloud or mesh file.
+		size (int): Image side in pixels, at most THUMBNAIL_MAX_SIZE.
+
+	Returns:
+		str: Path of the PNG file.
+
+	Raises:
+		ValueError: If the size or the file format is not supported.
+	"""
+	if not 16 <= size <= THUMBNAIL_MAX_SIZE:
+		raise ValueError(f"Thumbnail size must be between 16 and {THUMBNAIL_MAX_SIZE} pixels.")
+	path = thumbnail_path(file_path, size)
+	if os.path.exists(path):
+		record_cache("thumbnail", True)
+		return path
+	record_cache("thumbnail", False)
+
+	with span("render_thumbnail"):
+		if is_point_cloud(file_path):
+			image = point_cloud_image(file_path, size)
+		elif is_3d_mesh(file_path):
+			image = mesh_image(file_path, size)
+		else:
+			raise ValueError(f"Unsupported file format: {file_path}")
+
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+	temporary = temporary_path(path)
+	try:
+		with open(temporary, "wb") as f:
+			f.write(encode_png(image))
+		os.replace(temporary, path)
+	finally:
+		if os.path.exists(temporary):
+			os.remove(temporary)
+	remove_stale(file_path, f"thumbnail-{size}", ".png")
+	print(f"Vista previa de {file_path} guardada en: {path}")
+	return path
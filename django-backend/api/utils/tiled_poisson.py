@@ -0,0 +1,211 @@
+import os
+
+import numpy as np
+import open3d as o3d
+
+from .applications import preprocess_cloud
+from .colormap import apply_colormap, normalize_values
+from .mesh_3d import decimate_mesh, save_mesh, trim_low_density
+from .point_cloud import to_vector3d
+from .spatial import load_spatial_index, query_points
+from .workers import process_pool, worker_budget
+
+# Reconstrucción de Poisson por teselas, para nubes demasiado grandes para una sola reconstrucción.
+#
+# La nube se divide en teselas en el plano x-y (los escaneos de edificios son extensos en planta
+# y bajos en altura), de unos TILE_POINTS puntos cada una. Cada tesela se reconstruye en un
+# proceso del pool con sus puntos más un margen de solapamiento (overlap, fracción del tamaño de
+# la tesela), que da contexto a Poisson en los bordes. Luego se recorta al núcleo de la tesela:
+# se conservan los triángulos cuyo centroide cae dentro de él, de modo que cada zona de la nube
+# queda cubierta por exactamente una tesela, y las submallas se concatenan en una sola.
+#
+# Los puntos de cada tesela se leen desde el índice espacial (ver api/utils/spatial.py), así
+# que cada proceso lee solo su región del disco; el tiempo y la memoria dependen del tamaño de
+# la tesela y no del escaneo. Las costuras entre teselas no quedan soldadas: los bordes de dos
+# teselas vecinas vienen de reconstrucciones distintas.
+#
+# El recorte por densidad (ver trim_low_density) se aplica en cada tesela con sus propias
+# densidades, antes del recorte al núcleo; la decimación se aplica a la malla unida.
+#
+# El pool de teselas se crea con los núcleos del proceso que lo llama: dentro de un trabajo de
+# malla (ver api/jobs.py) es la parte de ese trabajo, no todos los núcleos (ver worker_budget).
+
+TILE_POINTS = 500_000
+MIN_TILE_POINTS = 100
+# 0: los núcleos del proceso que reconstruye (ver worker_budget)
+TILED_POISSON_WORKERS = int(os.environ.get("TILED_POISSON_WORKERS") or 0)
+
+
+def plan_tiles(grid, tile_size=0.0, tile_points=TILE_POINTS):
+	"""
+	Splits the x-y extent of a cloud into a regular grid of tiles.
+
+	Args:
+		grid (dict): Spatial index description (see load_spatial_index).
+		tile_size (float): Tile side length; 0 picks it for about tile_points points per tile.
+		tile_points (int): Target points per tile when tile_size is 0.
+
+	Returns:
+		tuple: (tiles, tile_size) where tiles is a list of ((x0, y0), (x1, y1)) tile cores.
+		The outer cores extend to infinity, so every triangle belongs to one tile.
+	"""
+	low, high = np.asarray(grid["bbox"][0][:2]), np.asarray(grid["bbox"][1][:2])
+	extent = np.maximum(high - low, 1e-9)
+	if tile_size <= 0:
+		density = max(grid["points"], 1) / (extent[0] * extent[1])
+		tile_size = float(np.sqrt(tile_points / density))
+	counts = np.maximum(np.ceil(extent / tile_size), 1).astype(np.int64)
+
+	edges = []
+	for axis in range(2):
+		axis_edges = np.linspace(low[axis], high[axis], counts[axis] + 1)
+		axis_edges[0], axis_edges[-1] = -np.inf, np.inf
+		edges.append(axis_edges)
+	tiles = [
+		((edges[0][i], edges[1][j]), (edges[0][i + 1], edges[1][j + 1]))
+		for i in range(counts[0]) for j in range(counts[1])
+	]
+	return tiles, tile_size
+
+
+def reconstruct_tile(file_path, core, margin, radius, max_nn, depth, intensity_range, preprocessing=None,
+	density_quantile=0.0):
+	"""
+	Reconstructs one tile, trims its low-density vertices and then trims it to its core
+	(runs in the worker processes).
+
+	Returns:
+		dict: "vertices" (V, 3), "triangles" (T, 3), "colors" (V, 3), "points", the
+		preprocessing "report" and the density "trim" report of the tile (None when the
+		tile has too few points).
+	"""
+	(x0, y0), (x1, y1) = core
+	box = (np.array([x0 - margin, y0 - margin, -np.inf]), np.array([x1 + margin, y1 + margin, np.inf]))
+	points, _ = query_points(file_path, box=box)
+	empty = {
+		"vertices": np.empty((0, 3)), "triangles": np.empty((0, 3), dtype=np.int32),
+		"colors": np.empty((0, 3)), "points": len(points), "report": [], "trim": None,
+	}
+	if len(points) < MIN_TILE_POINTS:
+		return empty
+
+	cloud = o3d.geometry.PointCloud()
+	cloud.points = to_vector3d(points[:, :3])
+	# Colores con el rango de intensidad de toda la nube, para que las teselas coincidan
+	cloud.colors = to_vector3d(apply_colormap(normalize_values(points[:, 3], intensity_range), "inferno", np.float64))
+	del points
+	cloud, report = preprocess_cloud(cloud, preprocessing)
+	if len(cloud.points) < MIN_TILE_POINTS:
+		return {**empty, "report": report}
+	if not cloud.has_normals():
+		cloud.estimate_normals(search_param=o3d.geometry.KDTreeSearchParamHybrid(radius=radius, max_nn=max_nn))
+	mesh, densities = o3d.geometry.TriangleMesh.create_from_point_cloud_poisson(cloud, depth=depth)
+	trim = trim_low_density(mesh, np.asarray(densities), density_quantile)
+
+	vertices = np.asarray(mesh.vertices)
+	triangles = np.asarray(mesh.triangles)
+	colors = np.asarray(mesh.vertex_colors) if mesh.has_vertex_colors() else np.zeros_like(vertices)
+
+	# Recorte al núcleo: triángulos con el centroide dentro de [x0, x1) x [y0, y1)
+	centroids = vertices[triangles].mean(axis=1)
+	keep = (
+		(centroids[:, 0] >= x0) & (centroids[:, 0] < x1)
+		& (centroids[:, 1] >= y0) & (centroids[:, 1] < y1)
+	)
+	triangles = triangles[keep]
+	used, remapped = np.unique(triangles, return_inverse=True)
+	return {
+		"vertices": vertices[used],
+		"triangles": remapped.reshape(-1, 3).astype(np.int32),
+		"colors": colors[used],
+		"points": len(cloud.points),
+		"report": report,
+		"trim": trim,
+	}
+
+
+def _merge_reports(reports):
+	"""Adds up the counts and durations of per-tile stage reports, stage by stage."""
+	merged = []
+	for report in reports:
+		for index, stage in enumerate(report):
+			if index == len(merged):
+				merged.append({name: value for name, value in stage.items() if name in ("stage", "params")})
+			for name, value in stage.items():
+				if name not in ("stage", "params"):
+					merged[index][name] = merged[index].get(name, 0) + value
+	for stage in merged:
+		stage["seconds"] = round(stage["seconds"], 4)
+	return merged
+
+
+def create_tiled_poisson_mesh(file_path, radius=0.025, max_nn=30, depth=9, tile_size=0.0, overlap=0.1,
+	density_quantile=0.0, target_triangles=0, max_error=0.0, output_path=None, preprocessing=None, workers=None):
+	"""
+	Reconstructs a large point cloud with Poisson, one overlapping x-y tile at a time.
+
+	Args:
+		file_path (str): Path to the point cloud file.
+		radius (float): Neighbor search radius of the normal estimation.
+		max_nn (int): Maximum neighbors of the normal estimation.
+		depth (int): Poisson octree depth, applied to each tile.
+		tile_size (float): Tile side length; 0 picks it for about TILE_POINTS points per tile.
+		overlap (float): Margin around each tile, as a fraction of tile_size.
+		density_quantile (float): Fraction of lowest-density vertices removed in each tile.
+		target_triangles (int): Triangle count of the decimated mesh (0 = no target).
+		max_error (float): Maximum quadric error of the decimation (0 = no limit).
+		output_path (str, optional): Where to save the mesh. Defaults to file_path with
+			"_poisson_tiled.obj".
+		preprocessing (list, optional): Normalized preprocessing stages, applied per tile.
+		workers (int, optional): Worker processes. Defaults to TILED_POISSON_WORKERS, or the
+			core budget of the calling process (see worker_budget).
+
+	Returns:
+		tuple: (mesh, output, report, postprocessing) with the stitched
+		o3d.geometry.TriangleMesh, the path it was saved to, the preprocessing report summed
+		over the tiles and the density trimming (summed over the tiles) and decimation report.
+
+	Raises:
+		ValueError: If no tile produced a surface (every tile is empty or has fewer than
+			MIN_TILE_POINTS points).
+	"""
+	grid = load_spatial_index(file_path)
+	tiles, tile_size = plan_tiles(grid, tile_size)
+	margin = overlap * tile_size
+	arguments = [
+		(file_path, core, margin, radius, max_nn, depth, grid["intensity_range"], preprocessing, density_quantile)
+		for core in tiles
+	]
+	print(f"Poisson por teselas: {len(tiles)} teselas de {tile_size:.2f} con margen {margin:.2f}")
+
+	workers = min(workers or TILED_POISSON_WORKERS or worker_budget(), len(tiles))
+	if workers > 1:
+		with process_pool(workers) as pool:
+			results = list(pool.map(reconstruct_tile, *zip(*arguments)))
+	else:
+		results = [reconstruct_tile(*args) for args in arguments]
+
+	if not any(len(result["triangles"]) for result in results):
+		raise ValueError(
+			f"No tile produced a surface: every tile of {file_path} is empty or has fewer than "
+			f"{MIN_TILE_POINTS} points (tile size {tile_size:.2f})."
+		)
+
+	# Unión de las submallas, desplazando los índices de cada una
+	offsets = np.cumsum([0] + [len(result["vertices"]) for result in results])
+	mesh = o3d.geometry.TriangleMesh()
+	mesh.vertices = to_vector3d(np.concatenate([result["vertices"] for result in results]))
+	mesh.vertex_colors = to_vector3d(np.concatenate([result["colors"] for result in results]))
+	mesh.triangles = o3d.utility.Vector3iVector(np.ascontiguousarray(np.concatenate([
+		result["triangles"] + offset for result, offset in zip(results, offsets)
+	]), dtype=np.int32))
+	mesh.remove_duplicated_vertices()
+	mesh, decimation = decimate_mesh(mesh, target_triangles, max_error)
+	mesh.compute_vertex_normals()
+
+	output = output_path or file_path.replace(".pts", "_poisson_tiled.obj")
+	save_mesh(mesh, output)
+	print(f"Malla Poisson por teselas guardada en: {output}")
+	trims = [[result["trim"]] for result in results if result["trim"] is not None]
+	postprocessing = _merge_reports(trims) + [decimation]
+	return mesh, output, _merge_reports([result["report"] for result in results]), postprocessing
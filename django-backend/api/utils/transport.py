@@ -0,0 +1,195 @@
+import struct
+import zlib
+
+import numpy as np
+
+# Formato binario de transporte de nubes de puntos hacia el frontend.
+#
+# Cabecera (16 bytes, little-endian):
+#   magic      4s   b"PTSB"
+#   version    u16  1
+#   stride     u16  bytes por punto (16)
+#   count      u32  número de puntos
+#   reserved   u32  0
+#
+# Seguida de `count` registros entrelazados de 16 bytes:
+#   x, y, z    3 x float32
+#   r, g, b    3 x uint8
+#   intensidad uint8 (normalizada a 0-255)
+#
+# En el navegador los registros se leen sin copias:
+#   new Float32Array(buffer, 16)   -> posiciones con stride de 4 floats
+#   new Uint8Array(buffer, 16)     -> colores en los bytes 12-15 de cada registro
+
+BINARY_MAGIC = b"PTSB"
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct("<4sHHII")
+BINARY_POINT = np.dtype([("xyz", "<f4", (3,)), ("rgb", "u1", (3,)), ("intensity", "u1")])
+
+# Puntos codificados por fragmento de la respuesta (~1.6 MB por fragmento)
+TRANSPORT_CHUNK_POINTS = 100_000
+
+# Formato cuantizado y comprimido.
+#
+# Cabecera (48 bytes, little-endian):
+#   magic      4s   b"PTSQ"
+#   version    u16  1
+#   xyz_bytes  u16  bytes por coordenada cuantizada (2 = uint16, 4 = uint32)
+#   count      u32  número de puntos
+#   reserved   u32  0
+#   precision  f64  tamaño del paso de cuantización (p. ej. 0.001 = 1 mm)
+#   origin     3 x f64  esquina mínima del bounding box
+#
+# Seguida de 7 canales, en orden x, y, z, r, g, b, intensidad. Cada canal es un u32 con
+# su largo en bytes y luego sus valores comprimidos con zlib (DecompressionStream("deflate")
+# en el navegador). Los valores de cada canal son diferencias entre puntos consecutivos
+# con aritmética modular del tipo entero del canal; se reconstruyen con una suma acumulada.
+# Las coordenadas valen origin + q * precision, con un error máximo de precision / 2.
+
+QUANTIZED_MAGIC = b"PTSQ"
+QUANTIZED_VERSION = 1
+QUANTIZED_HEADER = struct.Struct("<4sHHIIdddd")
+QUANTIZED_CHANNEL = struct.Struct("<I")
+
+# Precisión por defecto de la cuantización (metros)
+QUANTIZATION_PRECISION = 0.001
+
+
+def binary_points_size(num_points):
+	"""Returns the size in bytes of a binary point payload, header included."""
+	return BINARY_HEADER.size + num_points * BINARY_POINT.itemsize
+
+
+def normalize_to_uint8(values, value_range):
+	"""Linearly maps values within value_range = (min, max) to 0-255."""
+	low, high = value_range
+	scale = 255.0 / (high - low) if high > low else 0.0
+	return np.clip(np.rint((values - low) * scale), 0, 255).astype(np.uint8)
+
+
+def encode_points_binary(point_cloud, intensity_range=None, chunk_points=TRANSPORT_CHUNK_POINTS):
+	"""
+	Encodes a point cloud in the binary transport format, one chunk at a time.
+
+	Args:
+		point_cloud (np.ndarray): (N, 7) array [x, y, z, intensity, r, g, b].
+		intensity_range (tuple, optional): (min, max) intensity used for normalization.
+			Computed from the data when omitted.
+		chunk_points (int): Number of points encoded per yielded chunk.
+
+	Yields:
+		bytes: The header followed by chunks of interleaved point records.
+	"""
+	if intensity_range is None:
+		intensity = point_cloud[:, 3]
+		intensity_range = (intensity.min(), intensity.max()) if len(intensity) else (0.0, 0.0)
+
+	yield BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, BINARY_POINT.itemsize, len(point_cloud), 0)
+
+	for start in range(0, len(point_cloud), chunk_points):
+		block = point_cloud[start:start + chunk_points]
+		records = np.empty(len(block), dtype=BINARY_POINT)
+		records["xyz"] = block[:, :3]
+		records["rgb"] = np.clip(block[:, 4:7], 0, 255)
+		records["intensity"] = normalize_to_uint8(block[:, 3], intensity_range)
+		yield records.tobytes()
+
+
+def decode_points_binary(payload):
+	"""
+	Decodes a binary transport payload (the inverse of encode_points_binary).
+
+	Returns:
+		np.ndarray: Structured array with fields "xyz", "rgb" and "intensity".
+
+	Raises:
+		ValueError: If the payload is not a valid binary point payload.
+	"""
+	magic, version, stride, count, _ = BINARY_HEADER.unpack_from(payload)
+	if magic != BINARY_MAGIC or version != BINARY_VERSION or stride != BINARY_POINT.itemsize:
+		raise ValueError("Unsupported binary point cloud payload.")
+	return np.frombuffer(payload, dtype=BINARY_POINT, count=count, offset=BINARY_HEADER.size)
+
+
+def _delta_encode(values):
+	"""Differences between consecutive values, wrapping around in the values' integer type."""
+	deltas = np.empty_like(values)
+	if len(values):
+		deltas[0] = values[0]
+		np.subtract(values[1:], values[:-1], out=deltas[1:])
+	return deltas
+
+
+def encode_points_quantized(point_cloud, bbox_min, bbox_max, precision=QUANTIZATION_PRECISION, level=6):
+	"""
+	Encodes a point cloud in the quantized, delta and zlib compressed transport format.
+
+	Args:
+		point_cloud (np.ndarray): (N, 7) array [x, y, z, intensity, r, g, b].
+		bbox_min (sequence): Minimum x, y, z of the cloud, used as quantization origin.
+		bbox_max (sequence): Maximum x, y, z of the cloud.
+		precision (float): Quantization step in the units of the coordinates.
+		level (int): zlib compression level (1-9).
+
+	Returns:
+		bytes: The encoded payload.
+
+	Raises:
+		ValueError: If precision is not positive or too fine for the cloud extent.
+	"""
+	if not precision > 0:
+		raise ValueError("precision must be a positive number.")
+	origin = np.asarray(bbox_min, dtype=np.float64)
+	steps = int(np.ceil(np.max(np.asarray(bbox_max, dtype=np.float64) - origin) / precision)) if len(point_cloud) else 0
+	if steps >= 2 ** 32:
+		raise ValueError("precision is too fine for the extent of the point cloud.")
+	xyz_type = np.uint16 if steps < 2 ** 16 else np.uint32
+
+	channels = []
+	for axis in range(3):
+		quantized = np.rint((point_cloud[:, axis] - origin[axis]) / precision)
+		channels.append(np.clip(quantized, 0, steps).astype(xyz_type))
+	for column in (4, 5, 6):
+		channels.append(np.clip(point_cloud[:, column], 0, 255).astype(np.uint8))
+	intensity = point_cloud[:, 3]
+	intensity_range = (intensity.min(), intensity.max()) if len(intensity) else (0.0, 0.0)
+	channels.append(normalize_to_uint8(intensity, intensity_range))
+
+	parts = [QUANTIZED_HEADER.pack(
+		QUANTIZED_MAGIC, QUANTIZED_VERSION, np.dtype(xyz_type).itemsize, len(point_cloud), 0, precision, *origin
+	)]
+	for channel in channels:
+		deltas = _delta_encode(channel).astype(channel.dtype.newbyteorder("<"), copy=False)
+		compressed = zlib.compress(deltas.tobytes(), level)
+		parts.append(QUANTIZED_CHANNEL.pack(len(compressed)))
+		parts.append(compressed)
+	return b"".join(parts)
+
+
+def decode_points_quantized(payload):
+	"""
+	Decodes a quantized payload (the inverse of encode_points_quantized).
+
+	Returns:
+		tuple: (xyz float64 (N, 3), rgb uint8 (N, 3), intensity uint8 (N,)).
+
+	Raises:
+		ValueError: If the payload is not a valid quantized point payload.
+	"""
+	magic, version, xyz_bytes, count, _, precision, *origin = QUANTIZED_HEADER.unpack_from(payload)
+	if magic != QUANTIZED_MAGIC or version != QUANTIZED_VERSION or xyz_bytes not in (2, 4):
+		raise ValueError("Unsupported quantized point cloud payload.")
+	xyz_type = np.dtype("<u2" if xyz_bytes == 2 else "<u4")
+
+	channels = []
+	offset = QUANTIZED_HEADER.size
+	for index in range(7):
+		(length,) = QUANTIZED_CHANNEL.unpack_from(payload, offset)
+		offset += QUANTIZED_CHANNEL.size
+		data = zlib.decompress(payload[offset:offset + length])
+		offset += length
+		deltas = np.frombuffer(data, dtype=xyz_type if index < 3 else np.uint8, count=count)
+		channels.append(np.cumsum(deltas, dtype=deltas.dtype))
+
+	xyz = np.column_stack(channels[:3]).astype(np.float64) * precision + np.asarray(origin)
+	return xyz, np.column_stack(channels[3:6]), channels[6]
@@ -0,0 +1,49 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Pools de procesos para el trabajo pesado (reconstrucciones, lectura de archivos).
+# Se usa el método "spawn" para no heredar hilos ni conexiones del servidor, y cada
+# proceso limita los hilos de OpenMP/BLAS para que N procesos no usen N veces todos los núcleos.
+# Cada proceso de un pool recibe además su parte de los núcleos (ver worker_budget), de modo
+# que un pool creado dentro de él (p. ej. las teselas de Poisson en un trabajo de malla) se
+# dimensiona con esa parte y no con todos los núcleos del equipo.
+
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+WORKER_CORES_VAR = "POOL_WORKER_CORES"
+
+
+def default_workers(limit=None):
+	"""Returns the number of CPU cores, optionally capped at limit."""
+	cores = os.cpu_count() or 1
+	return max(1, min(cores, limit) if limit else cores)
+
+
+def worker_budget():
+	"""Returns the cores of the current process: its share inside a pool worker, else all cores."""
+	return max(1, int(os.environ.get(WORKER_CORES_VAR) or default_workers()))
+
+
+def limit_worker_threads(threads):
+	"""Process initializer: caps native thread pools before open3d/numpy are imported."""
+	for name in (*THREAD_ENV_VARS, WORKER_CORES_VAR):
+		os.environ[name] = str(threads)
+
+
+def process_pool(max_workers):
+	"""
+	Creates a bounded process pool whose workers share the CPU cores between them.
+
+	Args:
+		max_workers (int): Number of worker processes.
+
+	Returns:
+		ProcessPoolExecutor: The pool.
+	"""
+	threads = max(1, worker_budget() // max_workers)
+	return ProcessPoolExecutor(
+		max_workers=max_workers,
+		mp_context=multiprocessing.get_context("spawn"),
+		initializer=limit_worker_threads,
+		initargs=(threads,),
+	)
@@ -1,14 +1,85 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.settings import api_settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 import os
 from dotenv import load_dotenv
-from .utils.point_cloud import is_point_cloud, load_point_cloud, point_cloud_info, generate_cloud, plot_cloud
-from .utils.mesh_3d import is_3d_mesh, load_3d_mesh, mesh_3d_info, plot_3d_mesh, create_delaunay_mesh, create_poisson_mesh, create_threshold_mesh
+from .utils.point_cloud import is_point_cloud, load_point_cloud, point_cloud_info, generate_cloud, plot_cloud, CloudDescriptor
+from .utils.mesh_3d import MESH_CONTENT_TYPES, is_3d_mesh, load_3d_mesh, mesh_3d_info, mesh_format, plot_3d_mesh
+from .utils.reconstruction import MESH_ALGORITHMS, UnknownAlgorithmError, reconstruct_mesh, mesh_result
+from .utils.transport import encode_points_binary, binary_points_size, encode_points_quantized, QUANTIZATION_PRECISION
+from .utils.applications import UnknownStageError
+from .utils.metadata import cached_metadata
+from .utils.spatial import load_spatial_index, query_points, parse_box, parse_sphere, SpatialQueryError
+from .utils.lod import load_lod_hierarchy, load_lod_node
+from .utils.mesh_lod import load_mesh_lod, mesh_lod_path
+from .utils.thumbnail import HEADLESS_RENDERING, THUMBNAIL_SIZE, render_thumbnail
+from .utils.plan_view import load_plan_view, plan_raster_path, plan_tile_path, PlanViewError
+from .utils import metrics
+from .renderers import PointCloudBinaryRenderer, PointCloudQuantizedRenderer
+from .models import MeshJob, Scan
+from .catalog import list_scans, SCAN_PAGE_SIZE
+from .jobs import mesh_jobs
 #import matplotlib.pyplot as plt
 
 load_dotenv()
 
+LOCAL_ADDRESSES = ("127.0.0.1", "::1")
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def catalog_page(request, file_format):
+	"""Page of the scan catalog selected by `?page=`, `?page_size=` and `?search=`."""
+	# Solo lee el catálogo: los archivos FARO* se registran en segundo plano (ver api/catalog.py)
+	return list_scans(
+		file_format,
+		page=request.GET.get("page") or 1,
+		page_size=request.GET.get("page_size") or SCAN_PAGE_SIZE,
+		search=request.GET.get("search"),
+	)
+
+
+def thumbnail_response(file_path, size=THUMBNAIL_SIZE):
+	"""PNG preview of a point cloud or mesh file, rendered by software and cached."""
+	return FileResponse(open(render_thumbnail(file_path, size), "rb"), content_type="image/png", status=status.HTTP_200_OK)
+
+
+def spatial_query(request):
+	"""Arguments of query_points from the query string, or None when no spatial filter is given."""
+	params = request.GET
+	if not any(params.get(name) for name in ("bbox", "sphere", "max_points", "offset", "limit")):
+		return None
+	try:
+		return {
+			"box": parse_box(params["bbox"]) if params.get("bbox") else None,
+			"sphere": parse_sphere(params["sphere"]) if params.get("sphere") else None,
+			"max_points": int(params["max_points"]) if params.get("max_points") else None,
+			"offset": int(params.get("offset") or 0),
+			"limit": int(params["limit"]) if params.get("limit") else None,
+		}
+	except ValueError as e:
+		raise SpatialQueryError(str(e))
+
+
+def quantization_bbox(file_path, data, query):
+	"""Bounding box of the points of a qbin response, without another pass over them when it is known."""
+	if query is not None:
+		# Región de la consulta dentro del bounding box del índice espacial
+		low, high = load_spatial_index(file_path)["bbox"]
+		if query["box"] is not None:
+			low = [max(value, limit) for value, limit in zip(low, query["box"][0])]
+			high = [min(value, limit) for value, limit in zip(high, query["box"][1])]
+		return low, high
+	metadata = cached_metadata(file_path)
+	if metadata is not None and metadata.get("bbox"):
+		return metadata["bbox"]
+	info = point_cloud_info(data)
+	return (
+		[info["rango_x"][0], info["rango_y"][0], info["rango_z"][0]],
+		[info["rango_x"][1], info["rango_y"][1], info["rango_z"][1]],
+	)
+
 
 #Clases a ser llamadas desde ThunderClient (Test backend)
 class PointCloudBackendView(APIView):
@@ -22,52 +93,27 @@ class PointCloudBackendView(APIView):
 			algorithm = request.data["algorithm"]
 			print(f"Algoritmo a usar: {algorithm}")
 
-			# Carga de nube de puntos, salta la primera fila (contiene metadatos)
-			point_cloud = load_point_cloud(file_path)
-
-			# Muestra de datos
-			print(point_cloud_info(point_cloud))
+			if algorithm not in MESH_ALGORITHMS:
+				return Response("Algoritmo no reconocido", status=status.HTTP_400_BAD_REQUEST)
 
-			# Normaliza la intensidad
-			intensidad = point_cloud[:, 3]
-			intensidad_normalizada = (intensidad - intensidad.min()) / (
-				intensidad.max() - intensidad.min()
+			# Carga de nube de puntos y generación de malla 3D en base al algoritmo entregado
+			mesh, output = reconstruct_mesh(
+				file_path, algorithm, request.data.get("params"), request.data.get("preprocessing"),
+				output_format=request.data.get("output_format"),
 			)
 
-			# Aplica la paleta inferno
-			#cmap = plt.cm.inferno
-
-			# Generación de nube de puntos
-			cloud = generate_cloud(point_cloud)
-
-			# Generación de malla 3D en base al algoritmo entregado
-			if algorithm == "delaunay":
-				print("Generando malla con Triangulación Delaunay...")
-				mesh, output = create_delaunay_mesh(cloud, file_path, alpha=1.0)
-			elif algorithm == "poisson":
-				print("Generando malla con Poisson...")
-				mesh, output, densities = create_poisson_mesh(cloud, file_path, radius=0.025, max_nn=30, depth=9)
-			elif algorithm == "threshold":
-				print("Generando malla con Algoritmos de Umbrales...")
-				mesh, output = create_threshold_mesh(point_cloud, file_path, intensidad_normalizada, threshold=0.5, alpha=1.0)
+			# Visualización (sin pantalla se genera una vista previa en lugar de abrir una ventana)
+			result = {
+				"message": "Nube de puntos procesada y malla generada.",
+				"output": output,
+				"mesh_info": mesh_3d_info(mesh),
+			}
+			if HEADLESS_RENDERING:
+				result["thumbnail"] = render_thumbnail(output)
 			else:
-				return Response("Algoritmo no reconocido", status=status.HTTP_400_BAD_REQUEST)
+				plot_3d_mesh(mesh)
 
-			# Muestra de información
-			print(mesh_3d_info(mesh))
-
-			# Visualización
-			plot_3d_mesh(mesh, output)
-
-			return Response(
-				{
-					"message": "Nube de puntos procesada y malla generada.",
-					"output": output,
-					#"mesh_info": print_3d_mesh_info(mesh),
-					"mesh": mesh,
-				},
-				status=status.HTTP_201_CREATED,
-			)
+			return Response(result, status=status.HTTP_201_CREATED)
 			# return Response("Nube de puntos visualizada correctamente", status=status.HTTP_200_OK)
 		except Exception as e:
 			return Response("Exception: " + str(e), status=status.HTTP_400_BAD_REQUEST)
@@ -85,14 +131,21 @@ class PointCloudBackendView(APIView):
 				# Carga de información nube de puntos, salta la primera fila (contiene metadatos)
 				point_cloud = load_point_cloud(file_path)
 
+				# Estadísticas e intensidad normalizada, calculadas una sola vez
+				descriptor = CloudDescriptor(point_cloud)
+
 				# Muestra de datos
-				print(point_cloud_info(point_cloud))
+				print(descriptor.info())
+
+				# Sin pantalla se retorna una vista previa PNG en lugar de abrir una ventana
+				if HEADLESS_RENDERING:
+					return thumbnail_response(file_path)
 
 				# Generar nube de puntos
-				cloud = generate_cloud(point_cloud)
+				cloud = generate_cloud(point_cloud, descriptor)
 
 				# Visualización
-				plot_cloud(file_path, cloud)
+				plot_cloud(cloud, file_path)
 
 				# Respuesta HTTP
 				return Response(
@@ -106,16 +159,19 @@ class PointCloudBackendView(APIView):
 				)
 		else:  # Caso contrario, se muestran todos los archivos de nube de puntos disponibles en el directorio
 			try:
-				routes = {
-					key: value for key, value in os.environ.items() if "FARO" in key and is_point_cloud(value)
-				}
-				# Se aplica la carga, muestra de datos y visualización a cada archivo
-				for key, value in routes.items():
-					print(f"{key}: {value}")
-					point_cloud = load_point_cloud(value)
-					print(point_cloud_info(point_cloud))
-					cloud = generate_cloud(point_cloud)
-					plot_cloud(value, point_cloud)
+				# Archivos de las variables FARO* ya registrados en el catálogo (ver api/catalog.py)
+				scans = Scan.objects.filter(format=Scan.POINT_CLOUD, error="").exclude(key="")
+				# Muestra de datos desde el catálogo y visualización de cada archivo
+				thumbnails = {}
+				for scan in scans:
+					print(f"{scan.key}: {scan.as_dict()}")
+					if HEADLESS_RENDERING:
+						thumbnails[scan.key] = render_thumbnail(scan.path)
+					else:
+						point_cloud = load_point_cloud(scan.path)
+						plot_cloud(generate_cloud(point_cloud, CloudDescriptor(point_cloud)), scan.path)
+				if HEADLESS_RENDERING:
+					return Response({"thumbnails": thumbnails}, status=status.HTTP_200_OK)
 				return Response(
 					"Nubes de puntos visualizada correctamente",
 					status=status.HTTP_200_OK,
@@ -142,8 +198,12 @@ class Mesh3DBackendView(APIView):
 				# Muestra de datos
 				print(mesh_3d_info(mesh))
 
+				# Sin pantalla se retorna una vista previa PNG en lugar de abrir una ventana
+				if HEADLESS_RENDERING:
+					return thumbnail_response(file_path)
+
 				# Visualización
-				plot_3d_mesh(file_path)
+				plot_3d_mesh(mesh)
 
 				# Respuesta HTTP
 				return Response(
@@ -156,15 +216,18 @@ class Mesh3DBackendView(APIView):
 				)
 		else:  # Caso contrario, se muestran todos los archivos de malla 3D disponibles en el directorio
 			try:
-				routes = {
-					key: value for key, value in os.environ.items() if "FARO" in key and is_3d_mesh(value)
-				}
-				# Se aplica la carga, muestra de datos y visualización a cada archivo
-				for key, value in routes.items():
-					print(f"{key}: {value}")
-					mesh = load_3d_mesh(value)
-					print(mesh_3d_info(mesh))
-					plot_3d_mesh(value)
+				# Archivos de las variables FARO* ya registrados en el catálogo (ver api/catalog.py)
+				scans = Scan.objects.filter(format=Scan.MESH, error="").exclude(key="")
+				# Muestra de datos desde el catálogo y visualización de cada archivo
+				thumbnails = {}
+				for scan in scans:
+					print(f"{scan.key}: {scan.as_dict()}")
+					if HEADLESS_RENDERING:
+						thumbnails[scan.key] = render_thumbnail(scan.path)
+					else:
+						plot_3d_mesh(load_3d_mesh(scan.path))
+				if HEADLESS_RENDERING:
+					return Response({"thumbnails": thumbnails}, status=status.HTTP_200_OK)
 				return Response(
 					"Archivos de malla 3D visualizados correctamente",
 					status=status.HTTP_200_OK,
@@ -176,6 +239,9 @@ class Mesh3DBackendView(APIView):
 
 #Clases a ser llamadas desde el frontend
 class PointCloudView(APIView):
+	# `?format=bin` y `?format=qbin` (o su tipo en `Accept`) seleccionan los formatos binarios
+	renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, PointCloudBinaryRenderer, PointCloudQuantizedRenderer]
+
 	def post(self, request):
 		try:
 			# Path a la nube de puntos
@@ -186,49 +252,20 @@ class PointCloudView(APIView):
 			algorithm = request.data["algorithm"]
 			print(f"Algoritmo a usar: {algorithm}")
 
-			# Carga de nube de puntos, salta la primera fila (contiene metadatos)
-			point_cloud = load_point_cloud(file_path)
-
-			# Muestra de datos
-			print(point_cloud_info(point_cloud))
-
-			# Normaliza la intensidad
-			intensidad = point_cloud[:, 3]
-			intensidad_normalizada = (intensidad - intensidad.min()) / (
-				intensidad.max() - intensidad.min()
-			)
-
-			# Aplica la paleta inferno
-			#cmap = plt.cm.inferno
-
-			# Generación de nube de puntos
-			cloud = generate_cloud(point_cloud)
-
-			# Generación de malla 3D en base al algoritmo entregado
-			if algorithm == "delaunay":
-				print("Generando malla con Triangulación Delaunay...")
-				mesh, output = create_delaunay_mesh(cloud, file_path, alpha=1.0)
-			elif algorithm == "poisson":
-				print("Generando malla con Poisson...")
-				mesh, output, densities = create_poisson_mesh(cloud, file_path, radius=0.025, max_nn=30, depth=9)
-			elif algorithm == "threshold":
-				print("Generando malla con Algoritmos de Umbrales...")
-				mesh, output = create_threshold_mesh(point_cloud, file_path, intensidad_normalizada, threshold=0.5, alpha=1.0)
-			else:
+			if algorithm not in MESH_ALGORITHMS:
 				return Response("Algoritmo no reconocido", status=status.HTTP_400_BAD_REQUEST)
 
-			# Muestra de información
-			print(mesh_3d_info(mesh))
-
-			# Visualización
-			plot_3d_mesh(mesh, output)
+			# Carga de nube de puntos y generación de malla 3D (o reutilización desde la caché)
+			# `output_format`: "obj" (por defecto) o "glb" (glTF binario, más liviano y rápido de leer)
+			result = mesh_result(
+				file_path, algorithm, request.data.get("params"), request.data.get("preprocessing"),
+				output_format=request.data.get("output_format"),
+			)
 
 			return Response(
 				{
 					"message": "Nube de puntos procesada y malla generada.",
-					"output": output,
-					#"mesh_info": print_3d_mesh_info(mesh),
-					"mesh": mesh,
+					**result,
 				},
 				status=status.HTTP_201_CREATED,
 			)
@@ -247,10 +284,48 @@ class PointCloudView(APIView):
 			try:
 				print(f"Cargando nube de punto desde: {file_path}")
 
+				# Consulta espacial (`?bbox=`, `?sphere=`, `?max_points=`, `?offset=`, `?limit=`):
+				# solo se leen las celdas del índice de grilla que intersectan la región
+				query = spatial_query(request)
+				if query is not None:
+					data, matches = query_points(file_path, **query)
+					intensity_range = load_spatial_index(file_path)["intensity_range"]
+				else:
+					data = load_point_cloud(file_path)
+					matches = len(data)
+					intensity_range = None
+
+				# Formato binario: xyz float32 + rgb/intensidad uint8 entrelazados, enviados por fragmentos
+				if request.accepted_renderer.format == PointCloudBinaryRenderer.format:
+					if intensity_range is None:
+						intensity_range = point_cloud_info(data)["rango_intensidad"]
+					response = StreamingHttpResponse(
+						encode_points_binary(data, intensity_range),
+						content_type=PointCloudBinaryRenderer.media_type,
+						status=status.HTTP_200_OK,
+					)
+					response["Content-Length"] = binary_points_size(len(data))
+					if matches is not None:
+						response["X-Matching-Points"] = matches
+					return response
+
+				# Formato cuantizado: xyz relativo al bounding box con `?precision=` metros, comprimido por canal
+				if request.accepted_renderer.format == PointCloudQuantizedRenderer.format:
+					precision = float(request.GET.get("precision") or QUANTIZATION_PRECISION)
+					bbox_min, bbox_max = quantization_bbox(file_path, data, query)
+					response = HttpResponse(
+						encode_points_quantized(data, bbox_min, bbox_max, precision),
+						content_type=PointCloudQuantizedRenderer.media_type,
+						status=status.HTTP_200_OK,
+					)
+					if matches is not None:
+						response["X-Matching-Points"] = matches
+					return response
+
 				# Carga de información nube de puntos, salta la primera fila (contiene metadatos)
 				point_cloud = {
 					"name": file_path,
-					"point_cloud": load_point_cloud(file_path),	
+					"point_cloud": data,
 				}
 
 				point_clouds.append(point_cloud)
@@ -260,34 +335,28 @@ class PointCloudView(APIView):
 					{
 						"message": "Nube de puntos leída correctamente",
 						"point_clouds": point_clouds,
+						"matches": matches,
 					},
 					#Retornar la nube de puntos
 					status=status.HTTP_200_OK,
 				)
+			except SpatialQueryError as e:
+				return Response("Consulta espacial inválida: " + str(e), status=status.HTTP_400_BAD_REQUEST)
 			except Exception as e: # Excepción en caso de error
 				return Response(
 					"Exception: " + str(e), status=status.HTTP_400_BAD_REQUEST
 				)
 		else:  # Caso contrario, se muestran todos los archivos de nube de puntos disponibles en el directorio
 			try:
-				routes = {
-					key: value for key, value in os.environ.items() if "FARO" in key and is_point_cloud(value)
-				}
-				# Se aplica la carga, muestra de datos y visualización a cada archivo
-				for key, value in routes.items():
-					print(f"{key}: {value}")
-					point_cloud = {
-						#"key": key,
-						"value": value,
-						"point_cloud": load_point_cloud(value),
-					}
-
-					#cloud = generate_cloud(point_cloud) # En duda si realmente es necesario para el frontend
+				# Página del catálogo con el resumen de cada archivo (puntos, bounding box, intensidad),
+				# no los datos completos; los puntos de cada archivo se piden luego con `?filepath=`
+				page = catalog_page(request, Scan.POINT_CLOUD)
 
 				return Response(
 					{
 						"message": "Nubes de puntos leídos correctamente",
-						"point_clouds": point_clouds,
+						"point_clouds": page.pop("results"),
+						**page,
 					},
 					status=status.HTTP_200_OK,
 				)
@@ -308,10 +377,13 @@ class Mesh3DView(APIView):
 			try:
 				print(f"Cargando malla 3D desde: {file_path}")
 
-				# Carga de información malla 3D
+				# Información de la malla 3D y sus niveles de detalle; la geometría de cada
+				# nivel se pide a 3d-mesh/lod (un TriangleMesh no se puede serializar en JSON).
+				# La lectura no construye la pirámide: "lod" es null si aún no existe
 				mesh = {
 					"name": file_path,
-					"meshs": load_3d_mesh(file_path),
+					"mesh_info": mesh_3d_info(load_3d_mesh(file_path)),
+					"lod": load_mesh_lod(file_path, build=False),
 				}
 
 				meshs.append(mesh)
@@ -330,21 +402,13 @@ class Mesh3DView(APIView):
 				)
 		else:  # Caso contrario, se muestran todos los archivos de malla 3D disponibles en el directorio
 			try:
-				routes = {
-					key: value for key, value in os.environ.items() if "FARO" in key and is_3d_mesh(value)
-				}
-				# Se cargan nubes de punto al array
-				for key, value in routes.items():
-					mesh = {
-						#"key": key,
-						"value": value,
-						"mesh": load_3d_mesh(value),
-					}
-					meshs.append(mesh)
+				# Página del catálogo con el resumen de cada archivo (vértices, triángulos, bounding box)
+				page = catalog_page(request, Scan.MESH)
 				return Response(
 					{
 						"message": "Archivos de malla 3D leídos correctamente",
-						"meshs": meshs,
+						"meshs": page.pop("results"),
+						**page,
 					},
 					status=status.HTTP_200_OK,
 				)
@@ -352,4 +416,270 @@ class Mesh3DView(APIView):
 				return Response(
 					"Exception: " + str(e), status=status.HTTP_400_BAD_REQUEST
 				)
-			
\ No newline at end of file
+
+
+class PointCloudLODView(APIView):
+	"""
+	Niveles de detalle (octree) de una nube de puntos para visualización progresiva.
+
+	- `?filepath=` retorna la jerarquía de nodos (se construye la primera vez).
+	- `?filepath=&node=r04` retorna los puntos de un nodo, en JSON o en los formatos
+	  binarios `bin`/`qbin` de PointCloudView.
+	"""
+	renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, PointCloudBinaryRenderer, PointCloudQuantizedRenderer]
+
+	def get(self, request):
+		file_path = request.GET.get("filepath") or None
+		node_id = request.GET.get("node") or None
+		if not file_path:
+			return Response("Se requiere filepath", status=status.HTTP_400_BAD_REQUEST)
+
+		try:
+			hierarchy = load_lod_hierarchy(file_path)
+			if not node_id:
+				return Response(
+					{
+						"message": "Jerarquía LOD leída correctamente",
+						"hierarchy": hierarchy,
+					},
+					status=status.HTTP_200_OK,
+				)
+
+			if node_id not in hierarchy["nodes"]:
+				return Response("Nodo LOD no encontrado", status=status.HTTP_404_NOT_FOUND)
+			points = load_lod_node(file_path, node_id, hierarchy)
+
+			if request.accepted_renderer.format == PointCloudBinaryRenderer.format:
+				response = StreamingHttpResponse(
+					encode_points_binary(points, hierarchy["intensity_range"]),
+					content_type=PointCloudBinaryRenderer.media_type,
+					status=status.HTTP_200_OK,
+				)
+				response["Content-Length"] = binary_points_size(len(points))
+				return response
+			if request.accepted_renderer.format == PointCloudQuantizedRenderer.format:
+				precision = float(request.GET.get("precision") or QUANTIZATION_PRECISION)
+				bbox = hierarchy["nodes"][node_id]["bbox"]
+				return HttpResponse(
+					encode_points_quantized(points, bbox[0], bbox[1], precision),
+					content_type=PointCloudQuantizedRenderer.media_type,
+					status=status.HTTP_200_OK,
+				)
+
+			return Response(
+				{
+					"message": "Nodo LOD leído correctamente",
+					"node": node_id,
+					"points": points,
+				},
+				status=status.HTTP_200_OK,
+			)
+		except Exception as e: # Excepción en caso de error
+			return Response(
+				"Exception: " + str(e), status=status.HTTP_400_BAD_REQUEST
+			)
+
+
+class PointCloudPlanView(APIView):
+	"""
+	Vista en planta de una nube de puntos: rásters de altura máxima, intensidad media y
+	número de puntos por celda (se construyen la primera vez, ver api/utils/plan_view.py).
+
+	- `?filepath=` (y opcionalmente `&cell_size=`) retorna la descripción: bounding box,
+	  capas con su rango de valores y niveles de la pirámide de teselas.
+	- `?filepath=&layer=height&level=0&x=0&y=0` retorna una tesela PNG (capas height,
+	  intensity y count).
+	- `?filepath=&raster=max_z` retorna el ráster completo en formato .npy (max_z,
+	  intensity o count).
+	"""
+
+	def get(self, request):
+		file_path = request.GET.get("filepath") or None
+		if not file_path:
+			return Response("Se requiere filepath", status=status.HTTP_400_BAD_REQUEST)
+		if not is_point_cloud(file_path) or not os.path.exists(file_path):
+			return Response("Archivo de nube de puntos no encontrado", status=status.HTTP_404_NOT_FOUND)
+
+		try:
+			cell_size = float(request.GET["cell_size"]) if request.GET.get("cell_size") else None
+			plan = load_plan_view(file_path, cell_size)
+			if request.GET.get("layer"):
+				path = plan_tile_path(
+					file_path, request.GET["layer"],
+					request.GET.get("level", ""), request.GET.get("x", ""), request.GET.get("y", ""),
+				)
+				return FileResponse(open(path, "rb"), content_type="image/png", status=status.HTTP_200_OK)
+			if request.GET.get("raster"):
+				path = plan_raster_path(file_path, request.GET["raster"])
+				return FileResponse(open(path, "rb"), content_type="application/octet-stream", status=status.HTTP_200_OK)
+			return Response(
+				{
+					"message": "Vista en planta leída correctamente",
+					"plan": plan,
+				},
+				status=status.HTTP_200_OK,
+			)
+		except KeyError:
+			return Response("Tesela no encontrada", status=status.HTTP_404_NOT_FOUND)
+		except (PlanViewError, ValueError) as e:
+			return Response("Vista en planta inválida: " + str(e), status=status.HTTP_400_BAD_REQUEST)
+		except Exception as e: # Excepción en caso de error
+			return Response(
+				"Exception: " + str(e), status=status.HTTP_400_BAD_REQUEST
+			)
+
+
+class Mesh3DLODView(APIView):
+	"""
+	Niveles de detalle (pirámide de decimación) de una malla 3D.
+
+	- `?filepath=` retorna la pirámide: vértices, triángulos y bytes de cada nivel, desde la
+	  malla completa (nivel 0) hasta la más gruesa (se construye la primera vez).
+	- `?filepath=&level=2` retorna el archivo de ese nivel, en el formato de la malla (.obj o
+	  .glb); `level=0` es el archivo original.
+	"""
+
+	def get(self, request):
+		file_path = request.GET.get("filepath") or None
+		level = request.GET.get("level") or None
+		if not file_path:
+			return Response("Se requiere filepath", status=status.HTTP_400_BAD_REQUEST)
+		if not is_3d_mesh(file_path) or not os.path.exists(file_path):
+			return Response("Archivo de malla 3D no encontrado", status=status.HTTP_404_NOT_FOUND)
+
+		try:
+			pyramid = load_mesh_lod(file_path)
+			if level is None:
+				return Response(
+					{
+						"message": "Pirámide LOD leída correctamente",
+						"lod": pyramid,
+					},
+					status=status.HTTP_200_OK,
+				)
+
+			try:
+				path = mesh_lod_path(file_path, level)
+			except KeyError:
+				return Response("Nivel LOD no encontrado", status=status.HTTP_404_NOT_FOUND)
+			return FileResponse(
+				open(path, "rb"), content_type=MESH_CONTENT_TYPES[mesh_format(path)], status=status.HTTP_200_OK
+			)
+		except Exception as e: # Excepción en caso de error
+			return Response(
+				"Exception: " + str(e), status=status.HTTP_400_BAD_REQUEST
+			)
+
+
+class ThumbnailView(APIView):
+	"""
+	Vista previa PNG de una nube de puntos o malla (`?filepath=`, `?size=` en píxeles),
+	renderizada por software y guardada en la caché del archivo.
+	"""
+
+	def get(self, request):
+		file_path = request.GET.get("filepath") or None
+		if not file_path:
+			return Response("Se requiere filepath", status=status.HTTP_400_BAD_REQUEST)
+		if not (is_point_cloud(file_path) or is_3d_mesh(file_path)) or not os.path.exists(file_path):
+			return Response("Archivo no encontrado", status=status.HTTP_404_NOT_FOUND)
+		try:
+			return thumbnail_response(file_path, int(request.GET.get("size") or THUMBNAIL_SIZE))
+		except Exception as e: # Excepción en caso de error
+			return Response(
+				"Exception: " + str(e), status=status.HTTP_400_BAD_REQUEST
+			)
+
+
+class MetricsView(APIView):
+	"""
+	Métricas del proceso en el formato de texto de Prometheus (ver api/utils/metrics.py):
+	duración de cada etapa, puntos y bytes procesados, aciertos y fallos de las cachés y
+	peticiones HTTP. Solo se sirven a clientes locales, salvo con METRICS_ALLOW_REMOTE=1.
+	"""
+
+	def get(self, request):
+		if request.META.get("REMOTE_ADDR") not in LOCAL_ADDRESSES and os.environ.get("METRICS_ALLOW_REMOTE") != "1":
+			return HttpResponse("Forbidden", status=status.HTTP_403_FORBIDDEN, content_type="text/plain")
+		return HttpResponse(metrics.registry.render(), content_type=METRICS_CONTENT_TYPE, status=status.HTTP_200_OK)
+
+
+#Generación de mallas en segundo plano
+class MeshJobView(APIView):
+	def post(self, request):
+		try:
+			file_path = request.data["filepath"]
+			algorithm = request.data["algorithm"]
+			if not is_point_cloud(file_path) or not os.path.exists(file_path):
+				return Response("Archivo de nube de puntos no encontrado", status=status.HTTP_400_BAD_REQUEST)
+
+			# Se registra el trabajo y se retorna de inmediato su identificador
+			job = mesh_jobs.submit(
+				file_path, algorithm, request.data.get("params"), request.data.get("preprocessing"),
+				request.data.get("output_format"),
+			)
+			print(f"Trabajo {job.id} en cola: {algorithm} sobre {file_path}")
+			return Response(
+				{
+					"message": "Generación de malla en cola.",
+					"job": job.as_dict(),
+				},
+				status=status.HTTP_202_ACCEPTED,
+			)
+		except UnknownAlgorithmError as e:
+			return Response("Algoritmo no reconocido: " + str(e), status=status.HTTP_400_BAD_REQUEST)
+		except UnknownStageError as e:
+			return Response("Etapa de preprocesamiento no reconocida: " + str(e), status=status.HTTP_400_BAD_REQUEST)
+		except Exception as e:
+			return Response("Exception: " + str(e), status=status.HTTP_400_BAD_REQUEST)
+
+	def get(self, request):
+		# Últimos trabajos registrados, opcionalmente filtrados por estado
+		jobs = MeshJob.objects.all()
+		if request.GET.get("status"):
+			jobs = jobs.filter(status=request.GET["status"])
+		return Response(
+			{"jobs": [job.as_dict() for job in jobs[:100]]},
+			status=status.HTTP_200_OK,
+		)
+
+
+class MeshJobDetailView(APIView):
+	def get(self, request, job_id):
+		job = MeshJob.objects.filter(id=job_id).first()
+		if job is None:
+			return Response("Trabajo no encontrado", status=status.HTTP_404_NOT_FOUND)
+		return Response({"job": job.as_dict()}, status=status.HTTP_200_OK)
+
+
+class MeshJobResultView(APIView):
+	def get(self, request, job_id):
+		job = MeshJob.objects.filter(id=job_id).first()
+		if job is None:
+			return Response("Trabajo no encontrado", status=status.HTTP_404_NOT_FOUND)
+		if job.status == MeshJob.SUCCEEDED:
+			return Response(
+				{
+					"message": "Nube de puntos procesada y malla generada.",
+					"output": job.output,
+					"mesh_info": job.result["mesh_info"],
+					"postprocessing": job.result.get("postprocessing", []),
+				},
+				status=status.HTTP_200_OK,
+			)
+		if job.status in MeshJob.FINISHED:
+			return Response({"job": job.as_dict()}, status=status.HTTP_409_CONFLICT)
+		# Aún en cola o en ejecución
+		return Response({"job": job.as_dict()}, status=status.HTTP_202_ACCEPTED)
+
+
+class MeshJobCancelView(APIView):
+	def post(self, request, job_id):
+		if not MeshJob.objects.filter(id=job_id).exists():
+			return Response("Trabajo no encontrado", status=status.HTTP_404_NOT_FOUND)
+		if not mesh_jobs.cancel(job_id):
+			return Response("El trabajo ya había terminado", status=status.HTTP_409_CONFLICT)
+		return Response(
+			{"job": MeshJob.objects.get(id=job_id).as_dict()},
+			status=status.HTTP_200_OK,
+		)
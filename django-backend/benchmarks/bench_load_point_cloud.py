@@ -0,0 +1,103 @@
+"""
+Benchmark del parser de archivos .pts.
+
+Compara np.loadtxt (implementación anterior de load_point_cloud) con read_pts
+sobre escaneos sintéticos (ver synthetic.py) de 1M y 10M de puntos, compara los dos
+tokenizadores de bloques de read_pts (ver PTS_TOKENIZER) y mide la carga repetida desde
+la caché binaria de load_point_cloud.
+
+Uso (desde django-backend/):
+	python benchmarks/bench_load_point_cloud.py
+	python benchmarks/bench_load_point_cloud.py --sizes 1000000 --skip-loadtxt
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from api.utils import point_cloud  # noqa: E402
+from api.utils.point_cloud import load_point_cloud, read_pts  # noqa: E402
+from synthetic import write_synthetic_scan  # noqa: E402
+
+
+def measure(function, *args, **kwargs):
+	"""
+	Retorna (resultado, segundos, pico de memoria en MB) de function.
+
+	El tiempo y la memoria se miden en ejecuciones separadas porque tracemalloc
+	distorsiona los tiempos de np.loadtxt.
+	"""
+	start = time.perf_counter()
+	result = function(*args, **kwargs)
+	elapsed = time.perf_counter() - start
+	del result
+	tracemalloc.start()
+	result = function(*args, **kwargs)
+	_, peak = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	return result, elapsed, peak / 1e6
+
+
+def measure_tokenizers(file_path):
+	"""Retorna {tokenizador: segundos} de read_pts con cada tokenizador de bloques."""
+	default = point_cloud.PTS_TOKENIZER
+	times = {}
+	try:
+		for tokenizer in ("loadtxt", "vectorized"):
+			point_cloud.PTS_TOKENIZER = tokenizer
+			_, times[tokenizer], _ = measure(read_pts, file_path)
+	finally:
+		point_cloud.PTS_TOKENIZER = default
+	return times
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000, 10_000_000])
+	parser.add_argument("--skip-loadtxt", action="store_true", help="No ejecutar np.loadtxt (muy lento en 10M)")
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as directory:
+		for size in args.sizes:
+			file_path = os.path.join(directory, f"synthetic_{size}.pts")
+			write_synthetic_scan(file_path, size)
+			megabytes = os.path.getsize(file_path) / 1e6
+
+			fast, fast_time, fast_peak = measure(read_pts, file_path)
+			_, fast32_time, fast32_peak = measure(read_pts, file_path, dtype=np.float32)
+			line = (
+				f"{size:>11,} puntos ({megabytes:,.0f} MB): "
+				f"read_pts {fast_time:.2f}s / {fast_peak:,.0f} MB, "
+				f"read_pts float32 {fast32_time:.2f}s / {fast32_peak:,.0f} MB"
+			)
+
+			if not args.skip_loadtxt:
+				slow, slow_time, slow_peak = measure(np.loadtxt, file_path, skiprows=1)
+				assert np.allclose(slow, fast)
+				line += (
+					f", np.loadtxt {slow_time:.2f}s / {slow_peak:,.0f} MB "
+					f"({slow_time / fast_time:.1f}x tiempo, {slow_peak / fast_peak:.1f}x memoria)"
+				)
+			print(line)
+
+			tokenizers = measure_tokenizers(file_path)
+			print(
+				f"{'':>11} tokenizador np.loadtxt {tokenizers['loadtxt']:.2f}s, vectorizado (np.fromstring) "
+				f"{tokenizers['vectorized']:.2f}s ({tokenizers['vectorized'] / tokenizers['loadtxt']:.2f}x); "
+				f"por defecto con numpy {np.__version__}: {point_cloud.PTS_TOKENIZER}"
+			)
+
+			_, cold_time, _ = measure(load_point_cloud, file_path, use_cache=True)
+			_, warm_time, warm_peak = measure(load_point_cloud, file_path, use_cache=True)
+			print(f"{'':>11} load_point_cloud con caché: {warm_time * 1000:.1f} ms / {warm_peak:,.1f} MB (primera carga {cold_time:.2f}s)")
+
+
+if __name__ == "__main__":
+	main()
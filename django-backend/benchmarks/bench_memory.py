@@ -0,0 +1,76 @@
+"""
+Benchmark de memoria de la generación de mallas.
+
+Mide el pico de memoria residente (RSS) de cada etapa sobre un escaneo .pts
+sintético (ver synthetic.py): carga desde el texto, carga desde la caché binaria,
+construcción de la nube Open3D (estadísticas, colores) y generación de la malla. Cada etapa se ejecuta
+en un proceso nuevo y se reporta el pico de RSS por sobre la memoria del proceso tras
+importar numpy y Open3D (en Linux el pico se reinicia tras las importaciones).
+
+Uso (desde django-backend/):
+	python benchmarks/bench_memory.py
+	python benchmarks/bench_memory.py --sizes 200000 1000000 --algorithm delaunay
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from harness import measure_call, measure_in_process  # noqa: E402
+from synthetic import write_synthetic_scan  # noqa: E402
+
+STAGES = ["load", "load-cached", "cloud", "mesh"]
+
+
+def _stage(stage, file_path, algorithm):
+	from api.utils.point_cloud import CloudDescriptor, generate_cloud, load_point_cloud
+	from api.utils.reconstruction import reconstruct_mesh
+
+	if stage == "load":
+		load_point_cloud(file_path, use_cache=False)
+	elif stage == "load-cached":
+		load_point_cloud(file_path)
+	elif stage == "cloud":
+		point_cloud = load_point_cloud(file_path)
+		generate_cloud(point_cloud, CloudDescriptor(point_cloud))
+	else:
+		reconstruct_mesh(file_path, algorithm, use_cache=False)
+
+
+def run_stage(stage, file_path, algorithm):
+	"""Ejecuta una etapa en el proceso actual y retorna (segundos, pico de RSS adicional en MB)."""
+	_, seconds, peak = measure_call(_stage, stage, file_path, algorithm)
+	return seconds, peak
+
+
+def measure_stage(stage, file_path, algorithm):
+	return measure_in_process(run_stage, stage, file_path, algorithm)
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000])
+	parser.add_argument("--algorithm", default="poisson", choices=["delaunay", "poisson", "threshold"])
+	parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES)
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as directory:
+		os.environ["POINT_CLOUD_CACHE_DIR"] = os.path.join(directory, "cache")
+		for size in args.sizes:
+			file_path = os.path.join(directory, f"synthetic_{size}.pts")
+			write_synthetic_scan(file_path, size)
+			# Calienta la caché binaria para las etapas que la usan
+			measure_stage("load-cached", file_path, args.algorithm)
+
+			print(f"{size:>11,} puntos ({size * 56 / 1e6:,.0f} MB como float64):")
+			for stage in args.stages:
+				seconds, peak = measure_stage(stage, file_path, args.algorithm)
+				label = f"{stage} ({args.algorithm})" if stage == "mesh" else stage
+				print(f"{'':>11} {label:<18} {seconds:>7.2f}s  pico RSS +{peak:,.0f} MB")
+
+
+if __name__ == "__main__":
+	main()
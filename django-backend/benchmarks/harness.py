@@ -0,0 +1,173 @@
+"""
+Medición de tiempo y memoria de los benchmarks, resultados en JSON y comparación con una
+línea base.
+
+Cada medición corre en un proceso nuevo ("spawn") para que la memoria y las cachés de una
+etapa no afecten a la siguiente. Se reporta el tiempo de la función medida (sin su
+preparación) y el pico de RSS por sobre la memoria del proceso tras la preparación; en Linux
+el pico se reinicia con /proc/self/clear_refs, fuera de Linux se usa ru_maxrss.
+"""
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+RESULTS_VERSION = 1
+
+
+def _memory_status(field):
+	"""Lee un campo de /proc/self/status en MB (None fuera de Linux)."""
+	try:
+		with open("/proc/self/status") as f:
+			for line in f:
+				if line.startswith(field + ":"):
+					return int(line.split()[1]) / 1024
+	except OSError:
+		pass
+	return None
+
+
+def reset_peak_rss():
+	# En Linux, escribir 5 en clear_refs reinicia el pico de RSS (VmHWM), que las importaciones elevan
+	try:
+		with open("/proc/self/clear_refs", "w") as f:
+			f.write("5")
+	except OSError:
+		pass
+
+
+def peak_rss_mb():
+	peak = _memory_status("VmHWM")
+	# ru_maxrss está en KB en Linux
+	return peak if peak is not None else resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def current_rss_mb():
+	current = _memory_status("VmRSS")
+	return current if current is not None else peak_rss_mb()
+
+
+def measure_call(function, *args, **kwargs):
+	"""Ejecuta function en el proceso actual y retorna (resultado, segundos, pico de RSS adicional en MB)."""
+	reset_peak_rss()
+	baseline = current_rss_mb()
+	start = time.perf_counter()
+	result = function(*args, **kwargs)
+	return result, time.perf_counter() - start, peak_rss_mb() - baseline
+
+
+def measure_in_process(function, *args):
+	"""
+	Ejecuta function(*args) en un proceso nuevo y retorna su resultado. function debe ser
+	importable desde el proceso hijo.
+	"""
+	context = multiprocessing.get_context("spawn")
+	with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+		return pool.submit(function, *args).result()
+
+
+def environment():
+	"""Versiones y máquina en la que se tomaron los resultados."""
+	import numpy as np
+	import open3d as o3d
+
+	try:
+		commit = subprocess.run(
+			["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+			cwd=os.path.dirname(os.path.abspath(__file__)),
+		).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		commit = None
+	return {
+		"python": platform.python_version(),
+		"numpy": np.__version__,
+		"open3d": o3d.__version__,
+		"platform": platform.platform(),
+		"machine": platform.machine(),
+		"cpu_count": os.cpu_count(),
+		"commit": commit,
+	}
+
+
+def summarize(case, points, runs, extra=None):
+	"""Resultado de un caso: mediana de tiempo y máximo pico de memoria de sus repeticiones."""
+	return {
+		"case": case,
+		"points": points,
+		"seconds": round(statistics.median(seconds for seconds, _ in runs), 6),
+		"peak_rss_mb": round(max(peak for _, peak in runs), 2),
+		"runs": [round(seconds, 6) for seconds, _ in runs],
+		**({"extra": extra} if extra else {}),
+	}
+
+
+def write_results(path, results):
+	document = {"version": RESULTS_VERSION, "environment": environment(), "results": results}
+	with open(path, "w") as f:
+		json.dump(document, f, indent=1)
+	return document
+
+
+def load_results(path):
+	with open(path) as f:
+		document = json.load(f)
+	if document.get("version") != RESULTS_VERSION:
+		raise ValueError(f"Unsupported benchmark results version in {path}: {document.get('version')}")
+	return document
+
+
+def compare(results, baseline, tolerance=0.25, min_seconds=0.01, memory_tolerance=0.25, min_megabytes=5.0):
+	"""
+	Compara los resultados con una línea base, caso por caso.
+
+	Un caso es una regresión si tarda más de `tolerance` (fracción) sobre la línea base y la
+	diferencia supera min_seconds, o si su pico de memoria supera al de la línea base en más
+	de `memory_tolerance` y en más de min_megabytes. Los umbrales absolutos evitan reportar
+	el ruido del reloj y del asignador de memoria en los casos pequeños.
+
+	Retorna una lista con un dict por caso presente en ambos: "case", "points", "seconds",
+	"baseline_seconds", "ratio", "peak_rss_mb", "baseline_peak_rss_mb" y "regression"
+	(None, "time" o "memory").
+	"""
+	reference = {(result["case"], result["points"]): result for result in baseline}
+	comparison = []
+	for result in results:
+		base = reference.get((result["case"], result["points"]))
+		if base is None:
+			continue
+		ratio = result["seconds"] / base["seconds"] if base["seconds"] > 0 else float("inf")
+		regression = None
+		if ratio > 1 + tolerance and result["seconds"] - base["seconds"] > min_seconds:
+			regression = "time"
+		elif (
+			result["peak_rss_mb"] > base["peak_rss_mb"] * (1 + memory_tolerance)
+			and result["peak_rss_mb"] - base["peak_rss_mb"] > min_megabytes
+		):
+			regression = "memory"
+		comparison.append({
+			"case": result["case"],
+			"points": result["points"],
+			"seconds": result["seconds"],
+			"baseline_seconds": base["seconds"],
+			"ratio": round(ratio, 3),
+			"peak_rss_mb": result["peak_rss_mb"],
+			"baseline_peak_rss_mb": base["peak_rss_mb"],
+			"regression": regression,
+		})
+	return comparison
+
+
+def print_comparison(comparison, file=sys.stdout):
+	for row in comparison:
+		flag = f"  REGRESIÓN ({row['regression']})" if row["regression"] else ""
+		print(
+			f"{row['case']:<26} {row['points']:>11,}  {row['seconds']:>9.3f}s vs {row['baseline_seconds']:>9.3f}s"
+			f"  x{row['ratio']:<6.2f} {row['peak_rss_mb']:>8.1f} MB vs {row['baseline_peak_rss_mb']:>8.1f} MB{flag}",
+			file=file,
+		)
@@ -0,0 +1,150 @@
+"""
+Suite de benchmarks de la carga de nubes de puntos y la generación de mallas.
+
+Mide el tiempo y el pico de memoria de load_point_cloud (parseo del texto y carga desde la
+caché binaria), point_cloud_info, generate_cloud y cada create_*_mesh sobre escaneos
+sintéticos deterministas (ver synthetic.py) de distintos tamaños. Cada caso corre
+--repeat veces, cada vez en un proceso nuevo (ver harness.py); se reporta la mediana del
+tiempo y el máximo pico de RSS.
+
+Los resultados se escriben en JSON (--output) y se comparan con una línea base
+(--baseline, por defecto benchmarks/baseline.json si existe): un caso más de --tolerance
+más lento, o con más memoria, se marca como regresión y el programa termina con código 1.
+--update-baseline guarda los resultados como nueva línea base; la línea base depende de la
+máquina, así que debe regenerarse en la máquina donde se compara.
+
+Los escaneos sintéticos se guardan en --data-dir y se reutilizan entre ejecuciones (el de 50M
+de puntos ocupa unos 2 GB y tarda un par de minutos en escribirse). Las mallas se omiten
+sobre --max-mesh-points.
+
+Uso (desde django-backend/):
+	python benchmarks/run_suite.py
+	python benchmarks/run_suite.py --sizes 10000 1000000 50000000 --cases load_point_cloud point_cloud_info
+	python benchmarks/run_suite.py --sizes 10000 100000 --output results.json --update-baseline
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from harness import compare, load_results, measure_call, measure_in_process, print_comparison, summarize, write_results  # noqa: E402
+from synthetic import synthetic_scan  # noqa: E402
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_DATA_DIR = os.environ.get("BENCHMARK_DATA_DIR") or os.path.join(tempfile.gettempdir(), "pts-benchmarks")
+MAX_MESH_POINTS = 1_000_000
+
+LOAD_CASES = ["load_point_cloud", "load_point_cloud_cached", "point_cloud_info", "generate_cloud"]
+MESH_CASES = ["create_delaunay_mesh", "create_poisson_mesh", "create_threshold_mesh", "create_tiled_poisson_mesh"]
+CASES = LOAD_CASES + MESH_CASES
+
+
+def _prepare(case, file_path):
+	"""Preparación de un caso (no se mide). Retorna la función medida y sus argumentos."""
+	from api.utils.mesh_3d import create_delaunay_mesh, create_poisson_mesh, create_threshold_mesh
+	from api.utils.point_cloud import CloudDescriptor, generate_cloud, load_point_cloud, point_cloud_info
+	from api.utils.reconstruction import MESH_ALGORITHMS
+	from api.utils.spatial import load_spatial_index
+	from api.utils.tiled_poisson import create_tiled_poisson_mesh
+
+	output_dir = os.path.join(os.environ["POINT_CLOUD_CACHE_DIR"], "meshes")
+	os.makedirs(output_dir, exist_ok=True)
+	output = os.path.join(output_dir, f"{case}.obj")
+	if case == "load_point_cloud":
+		return load_point_cloud, (file_path,), {"use_cache": False}
+	if case == "create_tiled_poisson_mesh":
+		load_spatial_index(file_path)
+		params = {name: MESH_ALGORITHMS["poisson_tiled"][name] for name in ("radius", "max_nn", "depth")}
+		return create_tiled_poisson_mesh, (file_path,), {"output_path": output, **params}
+
+	point_cloud = load_point_cloud(file_path)
+	if case == "load_point_cloud_cached":
+		return load_point_cloud, (file_path,), {}
+	if case == "point_cloud_info":
+		return point_cloud_info, (point_cloud,), {}
+	if case == "generate_cloud":
+		return generate_cloud, (point_cloud,), {}
+	descriptor = CloudDescriptor(point_cloud)
+	if case == "create_threshold_mesh":
+		params = MESH_ALGORITHMS["threshold"]
+		return create_threshold_mesh, (point_cloud, file_path, descriptor.normalized_intensity), {"output_path": output, **params}
+	cloud = generate_cloud(point_cloud, descriptor)
+	if case == "create_delaunay_mesh":
+		return create_delaunay_mesh, (cloud, file_path), {"output_path": output, **MESH_ALGORITHMS["delaunay"]}
+	params = {name: MESH_ALGORITHMS["poisson"][name] for name in ("radius", "max_nn", "depth")}
+	return create_poisson_mesh, (cloud, file_path), {"output_path": output, **params}
+
+
+def run_case(case, file_path):
+	"""Ejecuta un caso en el proceso actual y retorna (segundos, pico de RSS en MB, datos adicionales)."""
+	function, args, kwargs = _prepare(case, file_path)
+	result, seconds, peak = measure_call(function, *args, **kwargs)
+	extra = {}
+	if case in MESH_CASES:
+		mesh = result[0]
+		extra = {"vertices": len(mesh.vertices), "triangles": len(mesh.triangles)}
+	return seconds, peak, extra
+
+
+def run_suite(sizes, cases, repeat=3, seed=0, data_dir=DEFAULT_DATA_DIR, max_mesh_points=MAX_MESH_POINTS):
+	"""Mide cada caso en cada tamaño y retorna la lista de resultados (ver harness.summarize)."""
+	results = []
+	with tempfile.TemporaryDirectory() as cache:
+		# Cachés binarias, índices y mallas de la suite en un directorio temporal, heredado por los procesos
+		os.environ["POINT_CLOUD_CACHE_DIR"] = cache
+		for size in sizes:
+			file_path = synthetic_scan(data_dir, size, seed)
+			print(f"{size:>11,} puntos ({os.path.getsize(file_path) / 1e6:,.1f} MB): {file_path}")
+			for case in cases:
+				if case in MESH_CASES and size > max_mesh_points:
+					print(f"{'':>11} {case:<26} omitido (más de {max_mesh_points:,} puntos)")
+					continue
+				runs, extra = [], None
+				for _ in range(repeat):
+					seconds, peak, extra = measure_in_process(run_case, case, file_path)
+					runs.append((seconds, peak))
+				result = summarize(case, size, runs, extra)
+				results.append(result)
+				print(f"{'':>11} {case:<26} {result['seconds']:>9.3f}s  pico RSS +{result['peak_rss_mb']:,.1f} MB")
+	return results
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+	parser.add_argument("--cases", nargs="+", default=CASES, choices=CASES)
+	parser.add_argument("--repeat", type=int, default=3)
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="Directorio de los escaneos sintéticos")
+	parser.add_argument("--max-mesh-points", type=int, default=MAX_MESH_POINTS)
+	parser.add_argument("--output", help="Archivo JSON de resultados")
+	parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Línea base con la que comparar")
+	parser.add_argument("--update-baseline", action="store_true", help="Guardar los resultados como línea base")
+	parser.add_argument("--tolerance", type=float, default=0.25, help="Fracción de tiempo o memoria tolerada sobre la línea base")
+	args = parser.parse_args()
+
+	results = run_suite(args.sizes, args.cases, args.repeat, args.seed, args.data_dir, args.max_mesh_points)
+	if args.output:
+		write_results(args.output, results)
+		print(f"Resultados guardados en {args.output}")
+
+	regressions = []
+	if os.path.exists(args.baseline) and not args.update_baseline:
+		comparison = compare(results, load_results(args.baseline)["results"], args.tolerance, memory_tolerance=args.tolerance)
+		print(f"\nComparación con {args.baseline}:")
+		print_comparison(comparison)
+		regressions = [row for row in comparison if row["regression"]]
+	if args.update_baseline:
+		write_results(args.baseline, results)
+		print(f"Línea base guardada en {args.baseline}")
+	if regressions:
+		print(f"\n{len(regressions)} regresiones")
+		sys.exit(1)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,162 @@
+"""
+Generador determinista de escaneos .pts sintéticos con la estructura de un escaneo FARO.
+
+Simula una sala de ROOM_SIZE metros escaneada desde el centro: piso, cielo y cuatro muros
+(planos), columnas (cilindros) y un porcentaje de puntos de ruido dispersos en el volumen
+(reflejos, personas, polvo). Cada superficie tiene su intensidad y color base, con ruido
+gaussiano, y la intensidad cae con la distancia al escáner como en un escaneo real. Las
+columnas del archivo son las de un .pts de FARO: x y z intensidad r g b, con la intensidad
+entera en [-2048, 2047].
+
+Los puntos se generan por bloques de GENERATOR_CHUNK con una semilla derivada de (seed,
+bloque), de modo que el archivo depende solo de (num_points, seed) y se escribe con memoria
+acotada incluso para 50M de puntos.
+
+Uso (desde django-backend/):
+	python benchmarks/synthetic.py salida.pts 1000000 --seed 0
+"""
+import argparse
+import os
+
+import numpy as np
+
+GENERATOR_CHUNK = 1_000_000
+ROOM_SIZE = (20.0, 12.0, 3.0)
+COLUMN_RADIUS = 0.3
+# Columnas: centros x-y, en fracciones de la sala
+COLUMN_CENTERS = ((0.25, 0.33), (0.5, 0.33), (0.75, 0.33), (0.25, 0.67), (0.5, 0.67), (0.75, 0.67))
+NOISE_FRACTION = 0.02
+SURFACE_NOISE = 0.003
+ROW_FORMAT = "%.4f %.4f %.4f %d %d %d %d\n"
+
+# Intensidad y color base de cada tipo de superficie
+SURFACES = {
+	"floor": (900, (120, 110, 100)),
+	"ceiling": (1300, (235, 235, 230)),
+	"wall": (1100, (200, 190, 170)),
+	"column": (600, (150, 150, 155)),
+	"noise": (-1500, (40, 40, 40)),
+}
+
+
+def _surface_weights():
+	"""Names and sampling probabilities of the surfaces, proportional to their area."""
+	width, depth, height = ROOM_SIZE
+	areas = [
+		("floor", width * depth),
+		("ceiling", width * depth),
+		("wall_x0", depth * height),
+		("wall_x1", depth * height),
+		("wall_y0", width * height),
+		("wall_y1", width * height),
+	] + [(f"column_{index}", 2 * np.pi * COLUMN_RADIUS * height) for index in range(len(COLUMN_CENTERS))]
+	names = [name for name, _ in areas] + ["noise"]
+	total = sum(area for _, area in areas)
+	weights = [(1 - NOISE_FRACTION) * area / total for _, area in areas] + [NOISE_FRACTION]
+	return names, np.array(weights)
+
+
+def synthetic_points(num_points, seed=0, chunk_index=0):
+	"""
+	Generates one block of synthetic scan points.
+
+	Args:
+		num_points (int): Points of the block.
+		seed (int): Seed of the scan.
+		chunk_index (int): Index of the block inside the scan.
+
+	Returns:
+		np.ndarray: (num_points, 7) array [x, y, z, intensity, r, g, b].
+	"""
+	rng = np.random.default_rng([seed, chunk_index])
+	width, depth, height = ROOM_SIZE
+	names, weights = _surface_weights()
+	surface = rng.choice(len(names), size=num_points, p=weights)
+	u, v = rng.random(num_points), rng.random(num_points)
+
+	xyz = np.empty((num_points, 3))
+	intensity = np.empty(num_points)
+	rgb = np.empty((num_points, 3))
+	for index, name in enumerate(names):
+		mask = surface == index
+		a, b = u[mask], v[mask]
+		if name in ("floor", "ceiling"):
+			points = np.column_stack([a * width, b * depth, np.full(len(a), 0.0 if name == "floor" else height)])
+		elif name.startswith("wall_x"):
+			points = np.column_stack([np.full(len(a), 0.0 if name == "wall_x0" else width), a * depth, b * height])
+		elif name.startswith("wall_y"):
+			points = np.column_stack([a * width, np.full(len(a), 0.0 if name == "wall_y0" else depth), b * height])
+		elif name.startswith("column"):
+			cx, cy = COLUMN_CENTERS[int(name.split("_")[1])]
+			angle = a * 2 * np.pi
+			points = np.column_stack([
+				cx * width + COLUMN_RADIUS * np.cos(angle), cy * depth + COLUMN_RADIUS * np.sin(angle), b * height,
+			])
+		else:
+			points = rng.random((len(a), 3)) * ROOM_SIZE
+		kind = name.split("_")[0]
+		base_intensity, base_color = SURFACES[kind]
+		xyz[mask] = points
+		intensity[mask] = base_intensity
+		rgb[mask] = base_color
+
+	xyz += rng.normal(scale=SURFACE_NOISE, size=xyz.shape)
+	# Caída de la intensidad con la distancia al escáner, en el centro de la sala a 1.5 m de altura
+	distance = np.linalg.norm(xyz - np.array([width / 2, depth / 2, 1.5]), axis=1)
+	intensity = intensity - 60 * distance + rng.normal(scale=80, size=num_points)
+	rgb += rng.normal(scale=12, size=rgb.shape)
+	return np.column_stack([
+		xyz,
+		np.clip(np.rint(intensity), -2048, 2047),
+		np.clip(np.rint(rgb), 0, 255),
+	])
+
+
+def write_synthetic_scan(file_path, num_points, seed=0):
+	"""
+	Writes a deterministic synthetic .pts scan (see the module docstring).
+
+	Args:
+		file_path (str): Output path.
+		num_points (int): Number of points.
+		seed (int): Seed; the same (num_points, seed) always gives the same file.
+	"""
+	temporary = f"{file_path}.tmp-{os.getpid()}"
+	try:
+		with open(temporary, "w") as f:
+			f.write(f"{num_points}\n")
+			for chunk_index, start in enumerate(range(0, num_points, GENERATOR_CHUNK)):
+				count = min(GENERATOR_CHUNK, num_points - start)
+				block = synthetic_points(count, seed, chunk_index)
+				# Formato de texto de toda la fila en una sola operación: unas 2 veces más rápido que np.savetxt
+				f.write((ROW_FORMAT * count) % tuple(block.ravel().tolist()))
+		os.replace(temporary, file_path)
+	finally:
+		if os.path.exists(temporary):
+			os.remove(temporary)
+
+
+def synthetic_scan(directory, num_points, seed=0):
+	"""
+	Returns the path of the synthetic scan of (num_points, seed) inside directory,
+	writing it only if it does not exist yet.
+	"""
+	file_path = os.path.join(directory, f"synthetic_{num_points}_s{seed}.pts")
+	if not os.path.exists(file_path):
+		os.makedirs(directory, exist_ok=True)
+		write_synthetic_scan(file_path, num_points, seed)
+	return file_path
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("output")
+	parser.add_argument("points", type=int)
+	parser.add_argument("--seed", type=int, default=0)
+	args = parser.parse_args()
+	write_synthetic_scan(args.output, args.points, args.seed)
+	print(f"{args.points:,} puntos escritos en {args.output} ({os.path.getsize(args.output) / 1e6:,.1f} MB)")
+
+
+if __name__ == "__main__":
+	main()
@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_backend.settings')
 
 application = get_wsgi_application()
+
+# Recupera los trabajos de malla que quedaron pendientes o interrumpidos (ver api/jobs.py) y
+# registra en segundo plano los escaneos de las variables FARO* (ver api/catalog.py)
+from api.catalog import start_environment_refresh  # noqa: E402
+from api.jobs import mesh_jobs  # noqa: E402
+
+mesh_jobs.start()
+start_environment_refresh()